@@ -2,10 +2,14 @@
 # Developed by Rebecca Shalfield for The RISC OS Community
 # Copyright (c) Rebecca Shalfield 2002-2013
 
-import cherrypy, Cookie, hashlib, re, os, pymongo, riscosspider, sha, sys, time, urllib, urllib2, urlparse, zipfile
+import cgi, cherrypy, copy, hashlib, json, re, os, pymongo, riscosapi, riscosautocomplete, riscosexport, riscospage, riscosspider, sha, threading, time, urllib, urllib2, urlparse, zipfile
+from cherrypy.lib import cptools, httputil
+from cherrypy.process import plugins
+from collections import OrderedDict
 from pymongo import Connection
-from bson import ObjectId
-from random import randint
+from bson import ObjectId, json_util
+from random import randint, random
+from string import Template
 
 class riscos:
 
@@ -38,6 +42,19 @@ class riscos:
         # Connect to 'quarantine' collection
         self.quarantineCollection = db['quarantine']
         
+        # Connect to 'stats' collection, holding materialised statistics
+        self.statsCollection = db['stats']
+        
+        # Connect to 'filetypes' collection, the spider's reverse index from filetype to apps
+        self.filetypesCollection = db['filetypes']
+        
+        # Connect to 'websites' collection, the spider's home page per domain
+        self.websitesCollection = db['websites']
+        
+        # Connect to 'query_log' collection, an append-only log of generic searches
+        self.queryLogCollection = db['query_log']
+        self.queryLogCollection.ensure_index('timestamp')
+        
         self.mirror = 'www.shalfield.com/riscos'
         self.mirrors = ['84.92.157.78/riscos','www.shalfield.com/riscos','192.168.88.1:8081/riscos']
         
@@ -143,7 +160,15 @@ class riscos:
                                     ('Parent URL','parent_url',''),
                                     ('Last Scanned','last_scanned',''),
                                     ('Next Scan','next_scan','')
-                                    ]        
+                                    ]
+
+        # Attributes fetched when loading documents for display, over and above those displayed
+        self.displayedFields = ['advert_url','arc_file','domain','embed','icon_url','image_url','rescan_count','spark_file','spk_file','superseded_by','zip_file']
+        for (externalAttribute,internalAttribute,image) in self.displayedAttributes:
+            if not internalAttribute in self.displayedFields:
+                self.displayedFields.append(internalAttribute)
+            #endif
+        #endfor
         
         self.searchableAttributes = [
                                      ('Absolutes','absolutes','The name of an ARM code file'),
@@ -276,10 +301,37 @@ class riscos:
                                    ])
                           ]
                 
+        # MongoDB allows 64 indexes per collection, _id included, so the searchable attributes get what the others leave
+        self.maximumIndexes = 64
+        
+        # Free text only ever matched by unanchored regexes, gaining little from an index of its own
+        self.unindexedAttributes = ['description','glossary_definition','help','syndicated_feed_item_description','syndicated_feed_item_title']
+                
         try:
-            print 'Ensuring '+str(len(self.searchableAttributes))+' indexes have been created...'
+            indexes = []
+            # Normalised attributes set by the spider for the filter, plus its random sample value
+            for filterAttribute in ['addressing_modes','min_riscos_versions','year','rand']:
+                indexes.append([(filterAttribute,pymongo.ASCENDING)])
+            #endfor
+            # Newest first by date, separating syndicated feed items from other records
+            indexes.append([('date',pymongo.DESCENDING),('syndicated_feed',pymongo.ASCENDING)])
+            # Newest first by date with a unique tie-break, for paging through search results
+            indexes.append([('date',pymongo.DESCENDING),('_id',pymongo.DESCENDING)])
+            # Taxonomy category paths set by the spider at ingest
+            indexes.append([('category_paths',pymongo.ASCENDING)])
             for (externalAttribute,internalAttribute,key) in self.searchableAttributes:
-                self.riscosCollection.ensure_index(internalAttribute)
+                if internalAttribute in self.unindexedAttributes or len(indexes) >= self.maximumIndexes-1:
+                    # Make room for the above in databases indexed before they were added
+                    if self.riscosCollection.index_information().has_key(internalAttribute+'_1'):
+                        self.riscosCollection.drop_index(internalAttribute+'_1')
+                    #endif
+                elif not [(internalAttribute,pymongo.ASCENDING)] in indexes:
+                    indexes.append([(internalAttribute,pymongo.ASCENDING)])
+                #endif
+            #endfor
+            print 'Ensuring '+str(len(indexes))+' indexes have been created...'
+            for index in indexes:
+                self.riscosCollection.ensure_index(index)
             #endfor
         except:
             print 'ERROR: TOO MANY INDEXES!'
@@ -287,12 +339,55 @@ class riscos:
                 
         # Connect to 'users' collection
         self.usersCollection = db['users']
+
+        # Recently read user documents, keyed by (attribute, value) and trusted for a few seconds only, so that
+        # changes made by other processes behind the same proxy are soon seen; changes are written straight to 'users'
+        self.userCache = OrderedDict()
+        self.userCacheLock = threading.Lock()
+        self.userCacheSize = 1024
+        self.userCacheExpiry = 5
+
+        # Except for the visit details set on every page view, which are batched per user document and written every so many seconds
+        self.userVisitAttributes = ['ip_address','last_visit','user_agent']
+        self.userVisits = {}
+        self.userVisitsLock = threading.Lock()
+        self.userVisitsFlushInterval = 30
+        plugins.Monitor(cherrypy.engine, self.background_task(self.flush_user_visits), frequency=self.userVisitsFlushInterval).subscribe()
+        cherrypy.engine.subscribe('stop', self.flush_user_visits)
+
+        # Guest documents not visited for 28 days are removed in the background, not on the request path
+        self.usersCollection.ensure_index('last_visit')
+        self.guestExpiry = 2419200
+        self.reaperInterval = 3600
+        plugins.Monitor(cherrypy.engine, self.background_task(self.reap_guest_documents), frequency=self.reaperInterval).subscribe()
         
         self.path = os.path.dirname(os.path.abspath(__file__))
         
-        self.cookie = Cookie.SimpleCookie()
-        self.sessionId = ""
+        # Content hashes appended to static file URLs, so they can be cached for a year and still change on release
+        self.fingerprints = {}
+        for staticFile in ['riscos.css','riscos.js']:
+            try:
+                self.fingerprints[staticFile] = hashlib.md5(open(self.path+os.sep+staticFile,'rb').read()).hexdigest()[:8]
+            except:
+                self.fingerprints[staticFile] = str(int(time.time()))
+            #endtryexcept
+        #endfor
         
+        # Header markup compiled once, leaving only the per-visitor parts to fill in on each request
+        self.headerTemplate = self.compile_header_template()
+
+        # Rendered filter selects, keyed by the selected values, most recently used last
+        self.filterFragments = OrderedDict()
+        self.filterFragmentsLock = threading.Lock()
+        self.filterFragmentsSize = 256
+
+        # riscos.xml and JSON renderings of recently displayed documents, keyed by _id and checked against a digest of the document
+        self.renderedDocuments = OrderedDict()
+        self.renderedDocumentsLock = threading.Lock()
+        self.renderedDocumentsSize = 512
+        self.xmlHighlights = {'<':'<b class="element">&lt;','&lt;':'<b class="element">&lt;','>':'&gt;</b>','&gt;':'&gt;</b>','  ':'&nbsp;&nbsp;','\n':'<br>'}
+        self.xmlHighlightPattern = re.compile('&lt;|&gt;|<|>|  |\n')
+
         self.trusted_domains = {}
         
         self.riscosspider = riscosspider.riscosspider()
@@ -300,126 +395,94 @@ class riscos:
         self.periodMonth = 2419200
         self.periodYear = 31536000
         
-        self.taxonomy = [['Anti-Virus','(?i)anti-virus'],
-                         ['Artificial Intelligence','Expert Systems','(?i)expert system|observess'],
-                         ['Artificial Intelligence','Programmming Languages','(?i)lisp|prolog'],
-                         ['Business','Accounting','(?i)tax|accounting'],
-                         ['Business','Personnel','(?i)personnel'],
-                         ['Business','Presentation Graphics','(?i)presentation|OHP'],
-                         ['Business','Project Planning','(?i)project planning'],
-                         ['Business','Spreadsheets','(?i)spreadsheet|eureka|resultz'],
-                         ['Business','Stock Control','(?i)stock control'],
-                         ['Business','Time Management','(?i)time management'],
-                         ['Command Line','(?i)command line|cli'],
-                         ['Compression/Archive','(?i)spark|sparkplug|zip'],
-                         ['Connectivity and Control','Communications','(?i)communication'],
-                         ['Connectivity and Control','Control','(?i)control'],
-                         ['Connectivity and Control','Robots','(?i)robot'],
-                         ['Connectivity and Control','Turtles','(?i)turtle'],
-                         ['Connectivity and Control','Networking','(?i)network'],
-                         ['Education','Administration','(?i)admin'],
-                         ['Education','Subjects','Art','(?i)art|paint|painting'],
-                         ['Education','Subjects','Business Studies','(?i)business studies'],
-                         ['Education','Subjects','Citizenship','(?i)citizenship'],
-                         ['Education','Subjects','Classics','(?i)classics'],
-                         ['Education','Subjects','Design and Technology','(?i)design|technology'],
-                         ['Education','Subjects','Drama','(?i)drama'],
-                         ['Education','Subjects','English','(?i)english'],
-                         ['Education','Subjects','Geography','(?i)geography'],
-                         ['Education','Subjects','History','(?i)history'],
-                         ['Education','Subjects','Humanities','(?i)humanity'],
-                         ['Education','Subjects','ICT','(?i)ICT'],
-                         ['Education','Subjects','Mathematics','(?i)mathematics|maths|lispcalc'],
-                         ['Education','Subjects','Modern Languages','(?i)modern language'],
-                         ['Education','Subjects','Modern Studies','(?i)modern studies'],
-                         ['Education','Subjects','Music','(?i)music|maestro'],
-                         ['Education','Subjects','Physical Education','(?i)physical education'],
-                         ['Education','Subjects','Religious Education','(?i)religious education|religion|bible'],
-                         ['Education','Subjects','Sciences','(?i)science|physics|biology|chemistry'],
-                         ['Education','Subjects','Technology','(?i)technology'],
-                         ['Emulation','(?i)emulator|emulation'],
-                         ['Freeware','(?i)freeware'],
-                         ['Graphics','Animation','(?i)animation|animate'],
-                         ['Graphics','Art','(?i)art'],
-                         ['Graphics','Computer-Aided Design','(?i)CAD|computer-aided design|draw'],
-                         ['Graphics','Conversion','(?i)changefsi'],
-                         ['Graphics','Data Presentation','(?i)data presentation'],
-                         ['Graphics','Graphics Libraries','(?i)graphics library'],
-                         ['Graphics','Image Processing','(?i)image processing'],
-                         ['Graphics','Ray Tracing','(?i)ray tracing'],
-                         ['Graphics','Scanning and Digitising','(?i)scanning|digitising'],
-                         ['Graphics','Video Post-Processing','(?i)video'],
-                         ['Information Storage and Retrieval','Database Management Systems','(?i)database management system|datapower'],
-                         ['Information Storage and Retrieval','Data Files','(?i)data file'],
-                         ['Information Storage and Retrieval','Full Text Database Systems','(?i)full text database system'],
-                         ['Information Storage and Retrieval','Hypermedia','(?i)hypermedia|magpie'],
-                         ['Information Storage and Retrieval','Library Management Systems','(?i)library management system'],
-                         ['Information Storage and Retrieval','Specialised Data Management Systems','(?i)specialised data management system'],
-                         ['Information Storage and Retrieval','Videotex Database Systems','(?i)videotex database system'],
-                         ['Information Storage and Retrieval','Classification Schemes','(?i)classification scheme'],
-                         ['Leisure and Entertainment','Games','(?i)game'],
-                         ['Leisure and Entertainment','Hobbies','(?i)hobby'],
-                         ['Medicine and Health','Health Administration','(?i)health admin'],
-                         ['Medicine and Health','Healthcare','(?i)healthcare'],
-                         ['Medicine and Health','Health Education','(?i)health education'],
-                         ['Medicine and Health','Medical Records','(?i)medical record'],
-                         ['Medicine and Health','Monitoring','(?i)health monitoring'],
-                         ['Medicine and Health','Therapeutics','(?i)therapeutic'],
-                         ['Medicine and Health','Psychology','(?i)psychology'],
-                         ['Medicine and Health','Nursing','(?i)nursing'],
-                         ['Network','Internet','Email','(?i)messenger|email client|pluto'],
-                         ['Network','Internet','FTP','(?i)ftpc'],
-                         ['Network','Internet','General','(?i)ping|sunfish'],
-                         ['Network','Internet','Usenet','(?i)newshound'],
-                         ['Network','Internet','Terminal','(?i)nettle'],
-                         ['Network','Internet','Web Broswer','(?i)netsurf|arcweb'],
-                         ['Network','Internet','Web Server','(?i)serviette'],
-                         ['Peripherals','CD-ROM','(?i)cd-rom'],
-                         ['Peripherals','DVD','(?i)dvd'],
-                         ['Peripherals','Expansion Cards','(?i)expansion card|podule'],
-                         ['Peripherals','Firmware','(?i)firmware'],
-                         ['Peripherals','Input Devices','(?i)input device|keyboard|mouse'],
-                         ['Peripherals','Keyboards','(?i)keyboard'],
-                         ['Peripherals','Memory','(?i)memory|ram'],
-                         ['Peripherals','Memory Cards','(?i)memory card'],
-                         ['Peripherals','Mice','(?i)mouse'],
-                         ['Peripherals','Network Cards','(?i)network card|NCI'],
-                         ['Peripherals','Output Devices','(?i)output device'],
-                         ['Peripherals','Printers','(?i)printer'],
-                         ['Peripherals','Storage Devices','(?i)storage device'],
-                         ['Peripherals','USB','(?i)usb'],
-                         ['Programming','Languages','ADA','ADA'],
-                         ['Programming','Languages','Assembler','(?i)assembler'],
-                         ['Programming','Languages','BBC BASIC','BBC BASIC'],
-                         ['Programming','Languages','C/C++','(?i)c/c\+\+|ansi c|desktop c'],
-                         ['Programming','Languages','COBOL','(?i)cobol'],
-                         ['Programming','Languages','Lisp','(?i)lisp'],
-                         ['Programming','Languages','Modula-2','(?i)module-2'],
-                         ['Programming','Languages','Pascal','(?i)pascal'],
-                         ['Programming','Languages','Prolog','(?i)prolog'],
-                         ['Programming','Languages','Python','(?i)python'],
-                         ['Programming','Languages','General','(?i)programming'],
-                         ['Publications','(?i)publication|arcscan'],
-                         ['Public Domain','(?i)public domain'],
-                         ['Science and Industry','Data Capture/Logging','(?i)data capture|data logging'],
-                         ['Science and Industry','Engineering','(?i)engineering'],
-                         ['Science and Industry','Industrial Applications','(?i)industrial'],
-                         ['Science and Industry','Scientific Research','(?i)scientific research'],
-                         ['Shareware','(?i)shareware'],
-                         ['Sound and Music','(?i)sound|music'],
-                         ['Text Processing','Desktop Publishing','(?i)desktop publishing|ovation|impression'],
-                         ['Text Processing','Fonts','(?i)font'],
-                         ['Text Processing','Spell Checkers and Word Finders','(?i)spell(?:ing)? check|word find'],
-                         ['Text Processing','Text Editors','(?i)text editor'],
-                         ['Text Processing','Word Processing','(?i)word processing|word processor|easiwriter'],
-                         ['Text Processing','Optical Character Recognition','(?i)optical character recognition|OCR'],
-                         ['Video','(?i)video'],
-                         ['General','CD-ROM Discs','(?i)CD-ROM'],
-                         ['General','Demos','(?i)demo'],
-                         ['General','Personal Productivity','(?i)personal productivity'],
-                         ['Upgrades','Firmware','(?i)firmware'],
-                         ['Utilities','(?i)utility']
-                        ]
+        # Number of syndicated feed items shown on the news page and in the index page's news panel
+        self.newsLimit = 99
+        self.newsPanelLimit = 10
+
+        # Number of search results displayed per page
+        self.pageSize = 32
+        
+        # Result types in display order, superseded applications after the others, each paged through newest first
+        self.typeCriteria = [('Applications',{'directory':{'$nin':['',None,[]]},'superseded_by':{'$in':['',None,[]]}}),
+                             ('Applications',{'directory':{'$nin':['',None,[]]},'superseded_by':{'$nin':['',None,[]]}}),
+                             ('CompressedFiles',{'directory':{'$in':['',None,[]]},'$or':[{'zip_file':{'$nin':['',None,[]]}},{'arc_file':{'$nin':['',None,[]]}},{'spk_file':{'$nin':['',None,[]]}}]}),
+                             ('Non-Software',{'directory':{'$in':['',None,[]]},'zip_file':{'$in':['',None,[]]},'arc_file':{'$in':['',None,[]]},'spk_file':{'$in':['',None,[]]}})
+                            ]
+
+        # Most changes returned per call to synchronise, other mirrors calling again while there are more
+        self.changesBatchSize = 1000
+
+        # A gap in the change sequence this recent may be a change still being written, so synchronise stops short of it
+        self.changesGracePeriod = 300
+
+        # Machine-readable JSON under /riscos/api, answered without cookies or page chrome
+        self.api = riscosapi.riscosapi(self)
+
+        # Database snapshots are written by a background thread, resuming from their checkpoint after a restart
+        self.export = riscosexport.riscosexport(self)
+        cherrypy.engine.subscribe('start', self.export.resume)
+        cherrypy.engine.subscribe('stop', self.export.stop)
+
+        # Snapshot of the site-wide counts shown in the footer, refreshed in the background every so many seconds
+        self.siteStatistics = {}
+        self.siteStatisticsInterval = cherrypy.config.get('riscos.site_statistics_interval', 300)
+        
+        # Generated RSS and Atom feeds, with the counts they were generated from
+        self.feeds = {}
+        plugins.Monitor(cherrypy.engine, self.background_task(self.refresh_site_statistics), frequency=self.siteStatisticsInterval).subscribe()
+
+        # In-memory suggestions for the search_*_autocomplete URLs, kept up to date with the spider's inserts
+        self.autocompleteAttributes = []
+        for (externalAttribute,internalAttribute,key) in self.searchableAttributes:
+            # Free text is too long to suggest and would hold most of the collection in memory
+            if not internalAttribute in self.unindexedAttributes:
+                self.autocompleteAttributes.append(internalAttribute)
+            #endif
+        #endfor
+        self.autocomplete = riscosautocomplete.riscosautocomplete(self.riscosCollection, self.riscosspider.searchIndexCollection, self.autocompleteAttributes+['event','computer','dealer','developer','forum','video','relocatable_modules.software_interrupts.name','relocatable_modules.star_commands.name','provider','question','howto','glossary_term','relocatable_modules.name','module_dependencies.name','monitor_definition_files','podule','printer_definition_files','peripheral','project','book','magazine','user_group','utilities.name'])
+        self.autocompleteInterval = 60
+        cherrypy.engine.subscribe('start', self.autocomplete.start)
+        plugins.Monitor(cherrypy.engine, self.autocomplete.refresh, frequency=self.autocompleteInterval).subscribe()
+
+        # The statistics page is rendered from a snapshot in 'stats', rebuilt every so many seconds, counting
+        # the documents matching each row's criteria, or for lists the distinct values of its attribute among them
+        self.statisticsRows = [('Absolutes','absolutes','list','ff8.png',{'absolutes':{"$exists":True,"$nin":["",[]]}}),
+                               ('Apps','directory','string','app.png',{'directory':{"$exists":True,"$nin":["",[]]}}),
+                               ('ARC Files','arc_file','string','',{'arc_file':{"$exists":True,"$nin":["",[]]}}),
+                               ('Authors','authors','list','',{'authors':{"$exists":True,"$nin":["",[]]}}),
+                               ('Dealers','dealer','string','',{'dealer':{"$exists":True,"$nin":["",[]]}}),
+                               ('Developers','developer','string','',{'developer':{"$exists":True,"$nin":["",[]]}}),
+                               ('Filetypes','filetypes_run','list','',{'filetypes_run':{"$exists":True,"$nin":["",[]]}}),
+                               ('Fonts','fonts','list','ff6.png',{'fonts':{"$exists":True,"$nin":["",[]]}}),
+                               ('Forums','forum','string','',{'forum':{"$exists":True,"$nin":["",[]]}}),
+                               ('Glossary Terms','glossary_term','string','',{'glossary_term':{"$exists":True,"$nin":["",[]]}}),
+                               ('Maintainers','maintainer','string','',{'maintainer':{"$exists":True,"$nin":["",[]]}}),
+                               ('Monitor Definition Files','monitor_definition_files','list','display.png',{'monitor_definition_files':{"$exists":True,"$nin":["",[]]}}),
+                               ('Packages','package_name','string','package.png',{'package_name':{"$exists":True,"$nin":["",[]]}}),
+                               ('Page Titles','page_title','string','',{'page_title':{"$exists":True,"$nin":["",[]]}}),
+                               ('Portable Document Format Files','pdf_file','string','',{'pdf_file':{"$exists":True,"$nin":["",[]]}}),
+                               ('Printer Definition Files','printer_definition_files','list','',{'printer_definition_files':{"$exists":True,"$nin":["",[]]}}),
+                               ('Provider','provider','string','',{'provider':{"$exists":True,"$nin":["",[]]}}),
+                               ('Relocatable Modules','relocatable_modules.name','list','ffa.png',{'relocatable_modules.name':{"$exists":True,"$nin":["",[]]}}),
+                               ('Spark Files','spark_file','string','',{'spark_file':{"$exists":True,"$nin":["",[]]}}),
+                               ('* Command','star_command','list','',{'star_command':{"$exists":True,"$nin":["",[]]}}),
+                               ('System Variables','system_variables','list','',{'system_variables':{"$exists":True,"$nin":["",[]]}}),
+                               ('Utilities','utilities.name','list','ffc.png',{'utilities.name':{"$exists":True,"$nin":["",[]]}}),
+                               ('ZIP Files','zip_file','string','ddc.png',{'zip_file':{"$exists":True,"$nin":["",[]]}})
+                              ]
+        self.statisticsInterval = 3600
+        plugins.Monitor(cherrypy.engine, self.background_task(self.materialise_statistics), frequency=self.statisticsInterval).subscribe()
+
+        # Searches are logged in batches and summarised per window into 'stats' every so many seconds
+        self.queryLog = []
+        self.queryLogLock = threading.Lock()
+        self.queryWindows = [('day','Past Day',86400),('week','Past Week',604800),('month','Past 28 Days',2419200)]
+        self.queriesReported = 20
+        self.queriesInterval = 600
+        self.queryLogFlushInterval = 30
+        plugins.Monitor(cherrypy.engine, self.background_task(self.flush_query_log), frequency=self.queryLogFlushInterval).subscribe()
+        cherrypy.engine.subscribe('stop', self.flush_query_log)
+        plugins.Monitor(cherrypy.engine, self.background_task(self.materialise_queries), frequency=self.queriesInterval).subscribe()
     #enddef
 
     @cherrypy.expose
@@ -429,7 +492,7 @@ class riscos:
             if self.riscosCollection.find({'_id':ObjectId(doc_id)}).count():
                 document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
                 if document.has_key('url') and document['url']:
-                    userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+                    userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
                     if userDocument:
                         rescanAllowed = True
                         if userDocument.has_key('rescan_count') and userDocument['rescan_count'] and userDocument['rescan_count'] >= 10:
@@ -447,14 +510,14 @@ class riscos:
                                 #endif
                                 self.urlsCollection.insert(movedDocument)
                             #endif
-                            self.riscosCollection.remove({'_id':ObjectId(document['_id'])})
+                            self.riscosspider.remove_riscos_document(document['_id'])
                             if userDocument:
                                 if userDocument.has_key('rescan_count') and userDocument['rescan_count']:
                                     userDocument['rescan_count'] += 1
                                 else:
                                     userDocument['rescan_count'] = 1
                                 #endif
-                                self.usersCollection.save(userDocument)
+                                self.save_user_document(userDocument)
                             #endif
                         #endif
                     #endif
@@ -476,13 +539,13 @@ class riscos:
         status = self.cookie_handling()
         if doc_id:
             if self.riscosCollection.find({'_id':ObjectId(doc_id)}).count():
-                userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+                userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
                 if userDocument.has_key('watchlist'):
                     userDocument['watchlist'].append(doc_id)
                 else:
                     userDocument['watchlist'] = [doc_id]
                 #endif
-                self.usersCollection.save(userDocument)
+                self.save_user_document(userDocument)
             #endif
         #endif
         if origin == 'advanced_search':
@@ -512,13 +575,11 @@ class riscos:
             status = self.cookie_handling()
             content += self.header(status, 'index, nofollow')
             content += '<h2>Record in JSON Format</h2>'
-            if self.riscosCollection.find({'_id':ObjectId(doc_id)}).count():
-                document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
-                if document:
-                    content += '<p class="json">'
-                    content += self.dictionary_as_json(document, 0)
-                    content += '</p>'
-                #endif
+            document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
+            if document:
+                content += '<p class="json">'
+                content += self.rendered_document(document)['json']
+                content += '</p>'
             #endif
             content += self.footer()
             return content
@@ -597,17 +658,11 @@ class riscos:
             content += self.header(status, 'index, nofollow')
             content += '<h2>Record in riscos.xml Format</h2>'
             content += '<div id="introduction">'
-            if self.riscosCollection.find({'_id':ObjectId(doc_id)}).count():
-                document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
-                if document:
-                    if document.has_key('_id'):
-                        del document['_id']
-                    #endif
-                    content += '<p align="left">'
-                    xmlCode = self.dictionary_as_xml(document)
-                    content += self.post_process_xml_code(xmlCode)
-                    content += '</p>'
-                #endif
+            document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
+            if document:
+                content += '<p align="left">'
+                content += self.rendered_document(document)['highlighted_xml']
+                content += '</p>'
             #endif
             content += '</div>'
             content += self.footer()
@@ -618,13 +673,37 @@ class riscos:
     #enddef
     
     def post_process_xml_code(self, xmlCode):
-        xmlCode = xmlCode.replace('<','&lt;')
-        xmlCode = xmlCode.replace('>','&gt;')
-        xmlCode = xmlCode.replace('  ','&nbsp;&nbsp;')
-        xmlCode = xmlCode.replace('&lt;','<b class="element">&lt;')
-        xmlCode = xmlCode.replace('&gt;','&gt;</b>')
-        xmlCode = xmlCode.replace('\n','<br>')
-        return xmlCode
+        # Escape and highlight the markup in a single pass over the code
+        return self.xmlHighlightPattern.sub(lambda match: self.xmlHighlights[match.group(0)], xmlCode)
+    #enddef
+    
+    def rendered_document(self, document):
+        # The riscos.xml, highlighted riscos.xml and JSON renderings of a document, built once per version of it
+        key = str(document.get('_id',''))
+        if document.has_key('_id'):
+            del document['_id']
+        #endif
+        version = hashlib.md5(repr(document)).hexdigest()
+        with self.renderedDocumentsLock:
+            if key and self.renderedDocuments.has_key(key) and self.renderedDocuments[key]['version'] == version:
+                renderedDocument = self.renderedDocuments.pop(key)
+                self.renderedDocuments[key] = renderedDocument
+                return renderedDocument
+            #endif
+        #endwith
+        renderedDocument = {'version':version}
+        renderedDocument['xml'] = self.dictionary_as_xml(document)
+        renderedDocument['highlighted_xml'] = self.post_process_xml_code(renderedDocument['xml'])
+        renderedDocument['json'] = self.dictionary_as_json(document, 0)
+        if key:
+            with self.renderedDocumentsLock:
+                self.renderedDocuments[key] = renderedDocument
+                while len(self.renderedDocuments) > self.renderedDocumentsSize:
+                    self.renderedDocuments.popitem(last=False)
+                #endwhile
+            #endwith
+        #endif
+        return renderedDocument
     #enddef
     
     def app_as_xml(self, dictionary):
@@ -2218,12 +2297,12 @@ class riscos:
                         #endif
                         if toBeQuarantined:
                             self.quarantineCollection.insert(document)
-                            self.riscosCollection.remove({'_id':ObjectId(document['_id'])})
+                            self.riscosspider.remove_riscos_document(document['_id'])
                             content += '<h3>The individual record you clicked upon has now been quarantined!</h3>'
                         #endif
                     else:
                         self.quarantineCollection.insert(document)
-                        self.riscosCollection.remove({'_id':ObjectId(document['_id'])})
+                        self.riscosspider.remove_riscos_document(document['_id'])
                         content += '<h3>The individual record you clicked on has now been quarantined!</h3>'                        
                     #endif
                 #endif
@@ -2245,7 +2324,7 @@ class riscos:
     def remove_from_watchlist(self, doc_id, origin, nested=False):
         status = self.cookie_handling()
         if doc_id:
-            userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+            userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
             if userDocument.has_key('watchlist') and doc_id in userDocument['watchlist']:
                 items = userDocument['watchlist']
                 watchlistItems = []
@@ -2255,7 +2334,7 @@ class riscos:
                     #endif
                 #endfor
                 userDocument['watchlist'] = watchlistItems
-                self.usersCollection.save(userDocument)
+                self.save_user_document(userDocument)
             #endif
         #endif
         if origin == 'advanced_search':
@@ -2272,7 +2351,7 @@ class riscos:
     @cherrypy.expose
     def logon(self, mode="", username="", firstname="", surname="", password="", passwordconfirm=""):
         status = self.cookie_handling()
-        guestDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        guestDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         content = ""
         content += self.header(status, 'noindex, follow')
         content += '<div id="introduction">'
@@ -2281,10 +2360,10 @@ class riscos:
         
         if not mode or mode=="logon":
             if username and password:
-                memberDocument = self.usersCollection.find_one({"username":username,"password":password})
-                if memberDocument:
+                memberDocument = self.get_user_document("username", username)
+                if memberDocument and memberDocument.has_key('password') and memberDocument['password'] == password:
                     guestDocument['member'] = username
-                    self.usersCollection.save(guestDocument)
+                    self.save_user_document(guestDocument)
                     raise cherrypy.HTTPRedirect("/riscos/index", 302)
                 else:
                     logonFailureMessage = '<p class="warning">Username and/or password incorrect!</p>'
@@ -2294,7 +2373,7 @@ class riscos:
             #endif
         elif mode=="register":
             if username:
-                memberDocument = self.usersCollection.find_one({"username":username})
+                memberDocument = self.get_user_document("username", username)
                 if memberDocument:
                     registrationFailureMessage = '<p class="warning">Sorry, that username already exists!</p>'
                 else:
@@ -2311,7 +2390,7 @@ class riscos:
                             #endif
                             self.usersCollection.insert(memberDocument)
                             guestDocument['member'] = username
-                            self.usersCollection.save(guestDocument)
+                            self.save_user_document(guestDocument)
                         #endif
                     #endif
                 #endif
@@ -2344,16 +2423,16 @@ class riscos:
     #enddef
 
     @cherrypy.expose
-    def view_watchlist(self, nested=False):
+    def view_watchlist(self, nested=False, page=1):
         status = self.cookie_handling()
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         if userDocument.has_key('watchlist') and userDocument['watchlist']:
-            content = ""
+            content = riscospage.riscospage()
             content += self.header(status, 'noindex, follow')
             if userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(userDocument['watchlist'], 'view_watchlist', nested)
+                content += self.stream_document_table(userDocument['watchlist'], 'view_watchlist', nested)
             else:
-                content += self.display_document_report(userDocument['watchlist'], 'view_watchlist', nested)
+                content += self.stream_document_report(userDocument['watchlist'], 'view_watchlist', nested)
             #endif
             content += '</div></body>'
             content += self.footer()
@@ -2370,10 +2449,10 @@ class riscos:
     @cherrypy.expose
     def clear_watchlist(self, nested=False):
         status = self.cookie_handling()
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         if userDocument.has_key('watchlist') and userDocument['watchlist']:
             userDocument['watchlist'] = []
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
         if nested:
             raise cherrypy.HTTPRedirect("/riscos/advanced_search?nested=true", 302)
@@ -2386,7 +2465,7 @@ class riscos:
         memberDocument = ""
         if userDocument:
             if userDocument.has_key('member') and userDocument['member']:
-                memberDocument = self.usersCollection.find_one({"username":userDocument['member']})
+                memberDocument = self.get_user_document("username", userDocument['member'])
             #endif
         #endif
         
@@ -2457,33 +2536,21 @@ class riscos:
         return selectedRiscosVersion, selectedAddressingMode, selectedArmArchitecture, selectedTerritory, selectedStartYear, selectedEndYear, selectedView, selectedWebsites     
     #enddef
     
-    def header(self, status, robotsContent=""):
-        nested = False
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
-        selectedRiscosVersion, selectedAddressingMode, selectedArmArchitecture, selectedTerritory, selectedStartYear, selectedEndYear, selectedView, selectedWebsites = self.get_filter_settings(userDocument)
+    def compile_header_template(self):
+        # The header markup shared by every page, with placeholders for the parts that vary by visitor
         content = '<!DOCTYPE html>'
         content += '<html><head>'
         content += '<meta http-equiv="Content-Type" content="text/html; charset=utf-8">'
         content += '<title>RISC OS Search Engine @ '+self.mirror+'</title>'
         content += '<meta name="description" content="A completely automated search engine for absolute files, applications, filetypes, fonts, relocatable modules, monitor definition files, printer definition files and utilities compatible with the Reduced Instruction Set Computing Operating System (RISC OS) originally developed by Acorn Computers">'
         content += '<meta name="author" content="Rebecca Shalfield">'
-        if userDocument:
-            if not userDocument["ip_address"].startswith('192.168'):
-                cherrypy.response.headers['Location'] = "http://www.shalfield.com"
-            #endif
-            if userDocument and userDocument.has_key('nested'):
-                nested = userDocument['nested']
-            #endif
-        #endif
-        if robotsContent:
-            content += '<meta name="robots" content="'+robotsContent+'">'
-        #endif
-        content += '<link rel="stylesheet" type="text/css" href="/riscos/riscos.css">'
+        content += '$robots'
+        content += '<link rel="stylesheet" type="text/css" href="/riscos/riscos.css?v='+self.fingerprints['riscos.css']+'">'
         content += '<link rel="stylesheet" href="/riscos/jquery-ui-1.8.21.custom/css/custom-theme/jquery-ui-1.8.21.custom.css">'
         content += '<script type="text/javascript" src="/riscos/jquery-ui-1.8.21.custom/js/jquery-1.7.2.min.js"></script>'
         content += '<script type="text/javascript" src="/riscos/jquery-ui-1.8.21.custom/js/jquery-ui-1.8.21.custom.min.js"></script>'
         content += '<script type="text/javascript" src="/riscos/jquery-ui-1.8.21.custom/development-bundle/ui/jquery.ui.core.js"></script>'
-        content += '<script type="text/javascript" src="/riscos/riscos.js"></script>'
+        content += '<script type="text/javascript" src="/riscos/riscos.js?v='+self.fingerprints['riscos.js']+'"></script>'
         content += '<link href="/riscos/atomfeed" type="application/atom+xml" rel="alternate" title="The RISC OS Search Engine ATOM Feed">'
         content += '</head>'
         content += '<body>'
@@ -2497,28 +2564,37 @@ class riscos:
             #endif
         #endfor
         content += '</select><input class="button" type="submit" value="Switch"></form> | '
-        if userDocument:
-            if userDocument.has_key('member') and userDocument['member']:
-                memberDocument = self.usersCollection.find_one({"username":userDocument['member']})
-                if memberDocument.has_key('firstname') and memberDocument['firstname']:
-                    content += "Welcome "+memberDocument['firstname']+"!"
-                else:
-                    content += "Welcome!"
-                #endif
-            else:
-                content += '<form class="inline" action="/riscos/logon" method="post"><input class="button" type="submit" value="Logon"></form>'
-            #endif
-        else:
-            content += '<form class="inline" action="/riscos/logon" method="post"><input class="button" type="submit" value="Logon"></form>'
-        #endif
+        content += '$welcome'
         content += '</th></tr>'
         content += '<tr><th id="logo" rowspan="5"><a href="/riscos/index" target="_top"><img src="/riscos/images/cogwheel.gif" alt="Cogwheel"></a></th></tr>'
         content += '<tr><th id="titlebar"><b class="inline" id="title"><sup>The</sup> RISC OS Search Engine</b></th></tr>'
         content += '<tr><th id="upperbuttonbar"><form class="inline" action="/riscos/absolute" method="post"><input class="button" type="submit" value="Absolutes" title="Search for Absolutes"></form> <form class="inline" action="/riscos/app" method="post"><input class="button" type="submit" value="Apps" title="Search for Applications"></form> <form class="inline" action="/riscos/book" method="post"><input class="button" type="submit" value="Books" title="Search for Books"></form> <form class="inline" action="/riscos/computer" method="post"><input class="button" type="submit" value="Computers" title="Search for Computers"></form> <form class="inline" action="/riscos/dealer" method="post"><input class="button" type="submit" value="Dealers" title="Search for Dealers"></form> <form class="inline" action="/riscos/developer" method="post"><input class="button" type="submit" value="Developers" title="Search for Developers"></form> <form class="inline" action="/riscos/errormessage" method="post"><input class="button" type="submit" value="Error Messages" title="Search for Error Messages"></form> <form class="inline" action="/riscos/event" method="post"><input class="button" type="submit" value="Events" title="Search for Events"></form> <form class="inline" action="/riscos/faq" method="post"><input class="button" type="submit" value="FAQs" title="Search for Frequently Asked Questions"></form> <form class="inline" action="/riscos/filetype" method="post"><input class="button" type="submit" value="Filetypes" title="Search for Filetypes"></form> <form class="inline" action="/riscos/font" method="post"><input class="button" type="submit" value="Fonts" title="Search for Fonts"></form> <form class="inline" action="/riscos/forum" method="post"><input class="button" type="submit" value="Forums" title="Search for Forums"></form> <form class="inline" action="/riscos/glossary" method="post"><input class="button" type="submit" value="Glossary" title="Search for Glossary Terms"></form> <form class="inline" action="/riscos/howto" method="post"><input class="button" type="submit" value="How-Tos" title="Search for How-Tos"></form> <form class="inline" action="/riscos/magazine" method="post"><input class="button" type="submit" value="Magazines" title="Search for Magazines"></form> <form class="inline" action="/riscos/module" method="post"><input class="button" type="submit" value="Modules" title="Search for Relocatable Modules"></form> <form class="inline" action="/riscos/monitor" method="post"><input class="button" type="submit" value="Monitor DFs" title="Search for Monitor Definition Files"></form> <form class="inline" action="/riscos/peripheral" method="post"><input class="button" type="submit" value="Peripherals" title="Search for Peripherals"></form> <form class="inline" action="/riscos/podule" method="post"><input class="button" type="submit" value="Podules" title="Search for Podules"></form> <form class="inline" action="/riscos/printer" method="post"><input class="button" type="submit" value="Printer DFs" title="Search for Printer Definition Files"></form> <form class="inline" action="/riscos/project" method="post"><input class="button" type="submit" value="Projects" title="Search for Projects"></form> <form class="inline" action="/riscos/service" method="post"><input class="button" type="submit" value="Services" title="Search for Services"></form> <form class="inline" action="/riscos/softwareinterrupt" method="post"><input class="button" type="submit" value="SWIs" title="Search for SoftWare Interrupts (SWIs)"></form> <form class="inline" action="/riscos/starcommand" method="post"><input class="button" type="submit" value="* Commands" title="Search for * (Star) Commands"></form> <form class="inline" action="/riscos/usergroup" method="post"><input class="button" type="submit" value="User Groups" title="Search for User Groups"></form> <form class="inline" action="/riscos/utility" method="post"><input class="button" type="submit" value="Utilities" title="Search for Utilities"></form> <form class="inline" action="/riscos/video" method="post"><input class="button" type="submit" value="Videos" title="Search for Videos"></form></th></tr>'
         content += '<tr><td class="filter"><form class="inline" action="/riscos/filter" method="post">'
-        content += '<table class="filter"><tr><td>RISC OS Version</td><td>Addressing Mode</td><td>ARM Architecture</td><td>Territory</td><td>Start Year</td><td>End Year</td><td>View</td><td>Embed Web Sites</td></tr>'       
-        content += '<tr><td><select name="riscosversion" title="Select your version of RISC OS noting that 5.xx is in one fork and 4.xx/6.xx in the other">'
-        selectedRiscosVersion, selectedAddressingMode, selectedArmArchitecture, selectedTerritory, selectedStartYear, selectedEndYear, selectedView, selectedWebsites = self.get_filter_settings(userDocument)
+        content += '<table class="filter"><tr><td>RISC OS Version</td><td>Addressing Mode</td><td>ARM Architecture</td><td>Territory</td><td>Start Year</td><td>End Year</td><td>View</td><td>Embed Web Sites</td></tr>'
+        content += '$filter'
+        content += '</select></td><td><input type="hidden" name="origin" value="index"><input class="button" type="submit" value="Filter"></td></tr></table></form>'
+        content += '</td></tr>'
+        content += '<tr><th id="lowerbuttonbar"><form class="inline" action="/riscos/introduction" method="post"><input class="button" type="submit" value="Introduction"></form> <form class="inline" action="/riscos/news" method="post"><input class="button" type="submit" value="News"></form> <form class="inline" action="/riscos/categorisation"><input class="button" type="submit" value="Categorisation"></form> <form class="inline" action="/riscos/generic_search" method="post"><input class="button" type="submit" value="Generic Search" title="Allows you to enter a single search as either a string or a regular expression"></form> <form class="inline" action="/riscos/advanced_search" method="post"><input class="button" type="submit" value="Advanced Search" title="Allows you to enter multiple searches as regular expressions"></form> <form class="inline" action="/riscos/filetypenavigator" method="post"><input class="button" type="submit" value="Filetype Navigator" title="Allows you to navigate from one application to the next via the filetypes it supports"></form> <form class="inline" action="/riscos/websites" method="post"><input class="button" type="submit" value="Web Sites"></form> <form class="inline" action="/riscos/ftpsites" method="post"><input class="button" type="submit" value="FTP Sites"></form> <form class="inline" action="/riscos/randomrecord" method="post"><input class="button" type="submit" value="Random Record" title="Displays a record at random"></form> <form class="inline" action="/riscos/randomapp" method="post"><input class="button" type="submit" value="Random App" title="Displays details of a RISC OS application at random"></form> <form class="inline" action="/riscos/randomurl" method="post"><input class="button" type="submit" value="Random URL" title="Takes you to a URL at random directly related to a RISC OS application"></form> <form class="inline" action="/riscos/randomvideo" method="post"><input class="button" type="submit" value="Random Video" title="Takes you to a RISC OS-related video at random"></form>'
+        content += '$watchlist'
+        content += '</th></tr>'
+        content += '</table>'
+        content += '<div class="maincontent">'
+        content += '$warning'
+        return Template(content)
+    #enddef
+    
+    def filter_fragment(self, selectedRiscosVersion, selectedAddressingMode, selectedArmArchitecture, selectedTerritory, selectedStartYear, selectedEndYear, selectedView, selectedWebsites):
+        # The filter selects only depend on the selected values and the year, so each combination is rendered once
+        currentYear = time.localtime()[0]
+        key = (selectedRiscosVersion, selectedAddressingMode, selectedArmArchitecture, selectedTerritory, selectedStartYear, selectedEndYear, selectedView, selectedWebsites, currentYear)
+        with self.filterFragmentsLock:
+            if self.filterFragments.has_key(key):
+                content = self.filterFragments.pop(key)
+                self.filterFragments[key] = content
+                return content
+            #endif
+        #endwith
+        content = '<tr><td><select name="riscosversion" title="Select your version of RISC OS noting that 5.xx is in one fork and 4.xx/6.xx in the other">'
         for (textualRiscosVersion,riscOsVersion) in self.riscOsVersions:
             if selectedRiscosVersion and riscOsVersion == selectedRiscosVersion:
                 content += '<option value="'+riscOsVersion+'" selected>'+textualRiscosVersion+'</option>'
@@ -2551,7 +2627,7 @@ class riscos:
             #endif
         #endfor
         content += '</select></td><td><select name="startyear">'
-        for startYear in range(1987,time.localtime()[0]+2):
+        for startYear in range(1987,currentYear+2):
             if startYear == int(selectedStartYear):
                 content += '<option value="'+str(startYear)+'" selected>'+str(startYear)+'</option>'
             else:
@@ -2559,7 +2635,7 @@ class riscos:
             #endif
         #endfor
         content += '</select></td><td><select name="endyear">'
-        for endYear in range(1987,time.localtime()[0]+2):
+        for endYear in range(1987,currentYear+2):
             if endYear == int(selectedEndYear):
                 content += '<option value="'+str(endYear)+'" selected>'+str(endYear)+'</option>'
             else:
@@ -2582,28 +2658,61 @@ class riscos:
                 content += '<option value="'+websites+'">'+websites.capitalize()+'</option>'
             #endif
         #endfor
-        content += '</select></td><td><input type="hidden" name="origin" value="index"><input class="button" type="submit" value="Filter"></td></tr></table></form>'
-        content += '</td></tr>'
-        content += '<tr><th id="lowerbuttonbar"><form class="inline" action="/riscos/introduction" method="post"><input class="button" type="submit" value="Introduction"></form> <form class="inline" action="/riscos/news" method="post"><input class="button" type="submit" value="News"></form> <form class="inline" action="/riscos/categorisation"><input class="button" type="submit" value="Categorisation"></form> <form class="inline" action="/riscos/generic_search" method="post"><input class="button" type="submit" value="Generic Search" title="Allows you to enter a single search as either a string or a regular expression"></form> <form class="inline" action="/riscos/advanced_search" method="post"><input class="button" type="submit" value="Advanced Search" title="Allows you to enter multiple searches as regular expressions"></form> <form class="inline" action="/riscos/filetypenavigator" method="post"><input class="button" type="submit" value="Filetype Navigator" title="Allows you to navigate from one application to the next via the filetypes it supports"></form> <form class="inline" action="/riscos/websites" method="post"><input class="button" type="submit" value="Web Sites"></form> <form class="inline" action="/riscos/ftpsites" method="post"><input class="button" type="submit" value="FTP Sites"></form> <form class="inline" action="/riscos/randomrecord" method="post"><input class="button" type="submit" value="Random Record" title="Displays a record at random"></form> <form class="inline" action="/riscos/randomapp" method="post"><input class="button" type="submit" value="Random App" title="Displays details of a RISC OS application at random"></form> <form class="inline" action="/riscos/randomurl" method="post"><input class="button" type="submit" value="Random URL" title="Takes you to a URL at random directly related to a RISC OS application"></form> <form class="inline" action="/riscos/randomvideo" method="post"><input class="button" type="submit" value="Random Video" title="Takes you to a RISC OS-related video at random"></form>'
+        with self.filterFragmentsLock:
+            self.filterFragments[key] = content
+            while len(self.filterFragments) > self.filterFragmentsSize:
+                self.filterFragments.popitem(last=False)
+            #endwhile
+        #endwith
+        return content
+    #enddef
+    
+    def header(self, status, robotsContent=""):
+        nested = False
+        robots = ""
+        welcome = ""
+        watchlist = ""
+        warning = ""
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
+        selectedRiscosVersion, selectedAddressingMode, selectedArmArchitecture, selectedTerritory, selectedStartYear, selectedEndYear, selectedView, selectedWebsites = self.get_filter_settings(userDocument)
+        if userDocument:
+            if not userDocument["ip_address"].startswith('192.168'):
+                cherrypy.response.headers['Location'] = "http://www.shalfield.com"
+            #endif
+            if userDocument and userDocument.has_key('nested'):
+                nested = userDocument['nested']
+            #endif
+        #endif
+        if robotsContent:
+            robots = '<meta name="robots" content="'+robotsContent+'">'
+        #endif
+        if userDocument and userDocument.has_key('member') and userDocument['member']:
+            memberDocument = self.get_user_document("username", userDocument['member'])
+            if memberDocument.has_key('firstname') and memberDocument['firstname']:
+                welcome = "Welcome "+memberDocument['firstname']+"!"
+            else:
+                welcome = "Welcome!"
+            #endif
+        else:
+            welcome = '<form class="inline" action="/riscos/logon" method="post"><input class="button" type="submit" value="Logon"></form>'
+        #endif
         if userDocument and userDocument.has_key('watchlist') and userDocument['watchlist']:
-            content += ' | <form class="inline" action="/riscos/view_watchlist" method="post">'
+            watchlist += ' | <form class="inline" action="/riscos/view_watchlist" method="post">'
             if nested:
-                content += '<input type="hidden" name="nested" value="true">'
+                watchlist += '<input type="hidden" name="nested" value="true">'
             #endif
-            content += '<input class="button" class="watchlist" type="submit" value="View" title="Display contents of watchlist"></form> <form class="inline" action="/riscos/clear_watchlist" method="post">'
+            watchlist += '<input class="button" class="watchlist" type="submit" value="View" title="Display contents of watchlist"></form> <form class="inline" action="/riscos/clear_watchlist" method="post">'
             if nested:
-                content += '<input type="hidden" name="nested" value="true">'
+                watchlist += '<input type="hidden" name="nested" value="true">'
             #endif            
-            content += '<input class="button" class="watchlist" type="submit" value="Clear" title="Empty watchlist"></form>'
+            watchlist += '<input class="button" class="watchlist" type="submit" value="Clear" title="Empty watchlist"></form>'
         #endif
-        content += '</th></tr>'
-        content += '</table>'
-        content += '<div class="maincontent">'
         if status == "new":
-            content += '<h3 class="warning">We use cookies to ensure that we give you the best experience on our website<br>If you continue without changing your settings, we\'ll assume that you are happy to receive all cookies from this website</h3>'
-            content += '<h3 class="warning">You are visiting from '+cherrypy.request.remote.ip+' ['+cherrypy.request.headers['User-Agent']+']</h3>'       
+            warning += '<h3 class="warning">We use cookies to ensure that we give you the best experience on our website<br>If you continue without changing your settings, we\'ll assume that you are happy to receive all cookies from this website</h3>'
+            warning += '<h3 class="warning">You are visiting from '+cherrypy.request.remote.ip+' ['+cherrypy.request.headers['User-Agent']+']</h3>'       
         #endif
-        return content     
+        filterFragment = self.filter_fragment(selectedRiscosVersion, selectedAddressingMode, selectedArmArchitecture, selectedTerritory, selectedStartYear, selectedEndYear, selectedView, selectedWebsites)
+        return self.headerTemplate.substitute(robots=robots, welcome=welcome, filter=filterFragment, watchlist=watchlist, warning=warning)
     #enddef
     
     @cherrypy.expose
@@ -2611,24 +2720,15 @@ class riscos:
         content = ""
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         content += '<h2>Web Sites</h2>'
         content += '<div id="introduction">'
         websites = []
-        domains = self.riscosCollection.find({"url":{"$exists":True,"$ne":""},"page_title":{"$exists":True,"$ne":""},"domain":{"$exists":True,"$ne":""}}).distinct('domain')
-        for domain in domains:
-            shortestUrl = ""
-            for document in self.riscosCollection.find({"url":{"$exists":True,"$ne":""},"page_title":{"$exists":True,"$ne":""},"domain":domain}):
-                if shortestUrl == "" or len(document['url']) < len(shortestUrl):
-                    shortestUrl = document['url']
-                #endif
-            #endfor
-            if shortestUrl:
-                selectedDocument = self.riscosCollection.find_one({"url":shortestUrl,"page_title":{"$exists":True,"$ne":""},"domain":domain})
-                if selectedDocument:
-                    websites.append((selectedDocument['page_title'].lower().strip(),selectedDocument['page_title'].strip(),selectedDocument['url']))
-                #endif
-            #endif
+        if not self.websitesCollection.find_one():
+            self.riscosspider.rebuild_websites()
+        #endif
+        for websiteDocument in self.websitesCollection.find({}):
+            websites.append((websiteDocument['page_title'].lower(),websiteDocument['page_title'],websiteDocument['url']))
         #endfor
         if websites:
             websites.sort()
@@ -2648,7 +2748,7 @@ class riscos:
         content = ""
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         content += '<h2>FTP Sites</h2>'
         content += '<div id="introduction">'       
         searchCriteria = {}
@@ -2669,32 +2769,24 @@ class riscos:
     
     @cherrypy.expose
     def randomapp(self):
-        content = ""
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         content += '<h2>Random App</h2>'     
-        distinctApps = self.riscosCollection.find({"directory":{"$exists":True,"$ne":""}}).distinct("directory")
-        appFound = False
-        while distinctApps and not appFound:
-            randomNo = randint(0,len(distinctApps)-1)
-            doc_ids = self.riscosCollection.find({"directory":distinctApps[randomNo]}).distinct('_id')
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
-            if filteredDocIds:
-                content += '<h3>'+str(randomNo+1)+' of '+str(len(distinctApps))+'</h3>'
-                if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                    content += self.display_document_table(filteredDocIds, 'randomapp', False)
-                else:
-                    content += self.display_document_report(filteredDocIds, 'randomapp', False)
-                #endif
-                appFound = True  
-
-                if len(filteredDocIds) == 1:
-                    content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
-                #endif
-                
+        document = self.random_document({"directory":{"$exists":True,"$ne":""}}, userDocument, ['directory'])
+        if document:
+            filteredDocIds = self.merge_filter_criteria(userDocument, {"directory":document['directory']})
+            if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
+                content += self.stream_document_table(filteredDocIds, 'randomapp', False)
+            else:
+                content += self.stream_document_report(filteredDocIds, 'randomapp', False)
+            #endif
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
-        #endwhile
+        #endif
         content += self.footer()
         return content
     #enddef
@@ -2702,19 +2794,16 @@ class riscos:
     def display_dictionary_as_xml_and_json(self, docId):
         content = ""
         document = self.riscosCollection.find_one({'_id':ObjectId(docId)})
+        renderedDocument = self.rendered_document(document)
         content += '<table width="100%" border="0"><tr><td valign="top" width="50%"><div class="white">'
         content += '<h3 class="underlined">Record in riscos.xml Format</h3>'
-        if document.has_key('_id'):
-            del document['_id']
-        #endif
         content += '<p align="left">'
-        xmlCode = self.dictionary_as_xml(document)
-        content += self.post_process_xml_code(xmlCode)
+        content += renderedDocument['highlighted_xml']
         content += '</p>'
         content += '</div></td><td valign="top" width="50%"><div class="white">'
         content += '<h3 class="underlined">Record in JSON Format</h3>'
         content += '<p class="json">'
-        content += self.dictionary_as_json(document, 0)
+        content += renderedDocument['json']
         content += '</p>'
         content += '</div></td></tr></table>'
         return content        
@@ -2725,21 +2814,18 @@ class riscos:
         content = ""
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         content += '<h2>Random Record</h2>'
-        doc_ids = self.riscosCollection.find({'syndicated_feed':{'$exists':False},'zip_file':{'$exists':False}}).distinct("_id")
-        randomNo = randint(0,len(doc_ids)-1)
-        document = self.riscosCollection.find_one({'_id':ObjectId(doc_ids[randomNo])})
+        document = self.random_document({'syndicated_feed':{'$exists':False},'zip_file':{'$exists':False}}, None, ['_id'])
         if document:
-            content += '<h3>'+str(randomNo+1)+' of '+str(len(doc_ids))+'</h3>'
             try:
                 if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                    content += self.display_document_table([doc_ids[randomNo]], 'randomrecord', False)
+                    content += self.display_document_table([document['_id']], 'randomrecord', False)
                 else:
-                    content += self.display_document_report([doc_ids[randomNo]], 'randomrecord', False)
+                    content += self.display_document_report([document['_id']], 'randomrecord', False)
                 #endif
 
-                content += self.display_dictionary_as_xml_and_json(doc_ids[randomNo])
+                content += self.display_dictionary_as_xml_and_json(document['_id'])
             except:
                 True
         
@@ -2749,21 +2835,48 @@ class riscos:
         return content
     #enddef
     
+    def filetype_applications(self, filetypeDocument, key):
+        # Sorted distinct apps held against a filetype in the reverse index under 'run' or 'set'
+        apps = []
+        if filetypeDocument and filetypeDocument.has_key(key):
+            for reference in filetypeDocument[key]:
+                if not reference['directory'] in apps:
+                    apps.append(reference['directory'])
+                #endif
+            #endfor
+        #endif
+        apps.sort()
+        return apps
+    #enddef
+    
+    @cherrypy.expose
+    def filetype_json(self, filetype):
+        # Apps running and setting a filetype, as JSON, given either its hex code or hex code and name
+        hex = filetype.strip().split(' ')[0].upper()
+        filetypeDocument = self.filetypesCollection.find_one({'_id':hex})
+        names = []
+        if filetypeDocument and filetypeDocument.has_key('names'):
+            names = filetypeDocument['names']
+        #endif
+        cherrypy.response.headers['Content-Type'] = 'application/json'
+        return json.dumps({'filetype':hex,'names':names,'run':self.filetype_applications(filetypeDocument, 'run'),'set':self.filetype_applications(filetypeDocument, 'set')})
+    #enddef
+    
     @cherrypy.expose
     def filetypenavigator(self, seedfiletype=""):
         content = ""
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         content += '<h2>Filetype Navigator</h2>'
         
         if not seedfiletype:
-            distinctFiletypesRun = self.riscosCollection.find({"filetypes_run":{"$exists":True,"$ne":[]}}).distinct("filetypes_run")
-            distinctFiletypesSet = self.riscosCollection.find({"filetypes_set":{"$exists":True,"$ne":[]}}).distinct("filetypes_set")
-            distinctFiletypes = distinctFiletypesRun + distinctFiletypesSet
-            distinctFiletypes.sort()
             content += '<p><form action="/riscos/filetypenavigator" method="post">Filetype: <select name="seedfiletype">'
-            for filetype in distinctFiletypes:
+            for filetypeDocument in self.filetypesCollection.find({}).sort('_id', pymongo.ASCENDING):
+                filetype = filetypeDocument['_id']
+                if filetypeDocument.has_key('names') and filetypeDocument['names']:
+                    filetype += ' '+filetypeDocument['names'][0]
+                #endif
                 content += '<option value="'+filetype+'">'+filetype+'</option>'
             #endfor
             content += '</select><input class="button" type="submit" value="Navigate"></form></p>'
@@ -2772,46 +2885,59 @@ class riscos:
         if seedfiletype:
             content += '<table class="software">'
             content += '<tr><th>Application</th><th>Filetypes Run</th><th>Filetypes Set</th></tr>'
-            for document in self.riscosCollection.find({"$or":[{"filetypes_run":{"$exists":True,"$ne":[]}},{"filetypes_set":{"$exists":True,"$ne":[]}}]}):
-                if (document.has_key('filetypes_run') and seedfiletype in document['filetypes_run']) or (document.has_key('filetypes_set') and seedfiletype in document['filetypes_set']):
-                    if (document.has_key('directory') and document['directory']) or (document.has_key('application_name') and document['application_name']):
-                        content += '<tr>'
-                        if document.has_key('directory') and document['directory']:
-                            content += '<td>'
-                            content += '<form class="inline" action="/riscos/app?search='+document['directory']+'" method="post"><input class="button" type="submit" value="'+document['directory']+'"></form>'
-                            content += '</td>'
-                        elif document.has_key('application_name') and document['application_name']:
-                            content += '<td>'
-                            content += '<form class="inline" action="/riscos/app?search='+document['application_name']+'" method="post"><input class="button" type="submit" value="'+document['application_name']+'"></form>'
-                            content += '</td>'    
-                        #endif
+            # Only the apps the reverse index holds for the seed's hex code are fetched
+            seedHex = seedfiletype.strip().split(' ')[0].upper()
+            docIds = []
+            filetypeDocument = self.filetypesCollection.find_one({'_id':seedHex})
+            if filetypeDocument:
+                for key in ['run','set']:
+                    if filetypeDocument.has_key(key):
+                        for reference in filetypeDocument[key]:
+                            if not reference['doc_id'] in docIds:
+                                docIds.append(reference['doc_id'])
+                            #endif
+                        #endfor
+                    #endif
+                #endfor
+            #endif
+            for document in self.riscosCollection.find({'_id':{'$in':docIds}},['application_name','directory','filetypes_run','filetypes_set']):
+                if (document.has_key('directory') and document['directory']) or (document.has_key('application_name') and document['application_name']):
+                    content += '<tr>'
+                    if document.has_key('directory') and document['directory']:
                         content += '<td>'
-                        if document.has_key('filetypes_run') and document['filetypes_run']:
-                            content += '<ul>'
-                            for filetype in document['filetypes_run']:
-                                if filetype == seedfiletype:
-                                    content += '<li><b>'+filetype+'</b></li>'
-                                else:
-                                    content += '<li><a href="/riscos/filetypenavigator?seedfiletype='+filetype+'">'+filetype+'</a></li>'
-                                #endif
-                            #endfor
-                            content += '</ul>'
-                        #endif
+                        content += '<form class="inline" action="/riscos/app?search='+document['directory']+'" method="post"><input class="button" type="submit" value="'+document['directory']+'"></form>'
                         content += '</td>'
+                    elif document.has_key('application_name') and document['application_name']:
                         content += '<td>'
-                        if document.has_key('filetypes_set') and document['filetypes_set']:
-                            content += '<ul>'
-                            for filetype in document['filetypes_set']:
-                                if filetype == seedfiletype:
-                                    content += '<li><b>'+filetype+'</b></li>'
-                                else:
-                                    content += '<li><a href="/riscos/filetypenavigator?seedfiletype='+filetype+'">'+filetype+'</a></li>'
-                                #endif
-                            #endfor
-                            content += '</ul>'
-                        #endif                        
-                        content += '</td></tr>'
+                        content += '<form class="inline" action="/riscos/app?search='+document['application_name']+'" method="post"><input class="button" type="submit" value="'+document['application_name']+'"></form>'
+                        content += '</td>'    
+                    #endif
+                    content += '<td>'
+                    if document.has_key('filetypes_run') and document['filetypes_run']:
+                        content += '<ul>'
+                        for filetype in document['filetypes_run']:
+                            if filetype.strip().split(' ')[0].upper() == seedHex:
+                                content += '<li><b>'+filetype+'</b></li>'
+                            else:
+                                content += '<li><a href="/riscos/filetypenavigator?seedfiletype='+filetype+'">'+filetype+'</a></li>'
+                            #endif
+                        #endfor
+                        content += '</ul>'
                     #endif
+                    content += '</td>'
+                    content += '<td>'
+                    if document.has_key('filetypes_set') and document['filetypes_set']:
+                        content += '<ul>'
+                        for filetype in document['filetypes_set']:
+                            if filetype.strip().split(' ')[0].upper() == seedHex:
+                                content += '<li><b>'+filetype+'</b></li>'
+                            else:
+                                content += '<li><a href="/riscos/filetypenavigator?seedfiletype='+filetype+'">'+filetype+'</a></li>'
+                            #endif
+                        #endfor
+                        content += '</ul>'
+                    #endif                        
+                    content += '</td></tr>'
                 #endif
                 
             #endfor
@@ -2828,24 +2954,11 @@ class riscos:
         content = ""
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         content += '<h2>Random Video</h2>'       
-        distinctVideos = self.riscosCollection.find({"domain":{"$in":['www.youtube.com','m.youtube.com','uk.youtube.com']},'embed':{"$exists":True}}).distinct('url')
-        if distinctVideos:
-            videoFound = False
-            while not videoFound:
-                randomNo = randint(0,len(distinctVideos)-1)
-                doc_ids = self.riscosCollection.find({"url":distinctVideos[randomNo]}).distinct('_id')
-                filteredDocIds = self.apply_filter(userDocument, doc_ids)
-                if filteredDocIds:
-                    document = self.riscosCollection.find_one({"_id":ObjectId(filteredDocIds[0])})
-                    if document:
-                        content += '<h3>'+str(randomNo+1)+' of '+str(len(distinctVideos))+'</h3>'
-                        content += '<p>'+document['embed']+'<br><a href="'+document['url']+'" target="_blank" title="'+document['url']+'">'+document['page_title']+'</a>'+self.insert_date(document)+'<br><b class="green">'+document['url']+self.insert_parent_hyperlink(document)+'</p>'
-                        videoFound = True
-                    #endif
-                #endif
-            #endwhile
+        document = self.random_document({"domain":{"$in":['www.youtube.com','m.youtube.com','uk.youtube.com']},'embed':{"$exists":True},'url':{"$exists":True,"$ne":""}}, userDocument)
+        if document:
+            content += '<p>'+document['embed']+'<br><a href="'+document['url']+'" target="_blank" title="'+document['url']+'">'+document['page_title']+'</a>'+self.insert_date(document)+'<br><b class="green">'+document['url']+self.insert_parent_hyperlink(document)+'</p>'
         #endif
         content += self.footer()
         return content
@@ -2857,22 +2970,12 @@ class riscos:
         selectedUrl = ""
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         content += '<h2>Random URL</h2>'   
-        distinctUrls = self.riscosCollection.find({"directory":{"$exists":True,"$ne":""},"parent_url":{"$exists":True,"$ne":""}}).distinct("parent_url")
-        if distinctUrls:
-            urlFound = False
-            while not urlFound:
-                randomNo = randint(0,len(distinctUrls)-1)
-                doc_ids = self.riscosCollection.find({"parent_url":distinctUrls[randomNo]}).distinct('_id')
-                filteredDocIds = self.apply_filter(userDocument, doc_ids)
-                if filteredDocIds:
-                    selectedUrl = distinctUrls[randomNo]
-                    distinctApps = self.riscosCollection.find({"directory":{"$exists":True,"$ne":""},"parent_url":selectedUrl}).distinct("directory")
-                    content += '<h3>'+str(randomNo+1)+' of '+str(len(distinctUrls))+'</h3>'
-                    urlFound = True
-                #endif
-            #endwhile
+        document = self.random_document({"directory":{"$exists":True,"$ne":""},"parent_url":{"$exists":True,"$ne":""}}, userDocument, ['parent_url'])
+        if document:
+            selectedUrl = document['parent_url']
+            distinctApps = self.riscosCollection.find({"directory":{"$exists":True,"$ne":""},"parent_url":selectedUrl}).distinct("directory")
         #endif
         if selectedUrl:
             content += self.embed_web_site(selectedUrl, distinctApps) 
@@ -2885,7 +2988,7 @@ class riscos:
         content = ""
         width = 800
         height = 600 
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         if userDocument and userDocument.has_key('web_sites') and userDocument['web_sites']:
             if userDocument['web_sites'] == 'enabled 640x480':
                 width = 640
@@ -2917,11 +3020,11 @@ class riscos:
     @cherrypy.expose
     def filter(self, riscosversion, addressingmode, armarchitecture, territory, startyear, endyear, view, websites, origin):
         status = self.cookie_handling()
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         if userDocument:
             memberDocument = ""
             if userDocument.has_key('member') and userDocument['member']:
-                memberDocument = self.usersCollection.find_one({"username":userDocument['member']})
+                memberDocument = self.get_user_document("username", userDocument['member'])
             #endif
             if riscosversion:
                 if riscosversion in ['5.00']:
@@ -2984,9 +3087,9 @@ class riscos:
                 userDocument['web_sites'] = websites
             #endif
             if memberDocument:
-                self.usersCollection.save(memberDocument)
+                self.save_user_document(memberDocument)
             #endif
-            self.usersCollection.save(userDocument)           
+            self.save_user_document(userDocument)           
         #endif
         raise cherrypy.HTTPRedirect("/riscos/"+origin, 302)
     #endddef
@@ -3031,7 +3134,7 @@ class riscos:
                 #endif
                 if self.riscosCollection.find({'url':url}).count():
                     for existingDocument in self.riscosCollection.find({'url':url}):
-                        self.riscosCollection.remove({'_id':ObjectId(existingDocument['_id'])})
+                        self.riscosspider.remove_riscos_document(existingDocument['_id'])
                     #endfor
                 #endif
             else:
@@ -3070,7 +3173,7 @@ class riscos:
     def remove_search_component(self, attribute, value):
         status = self.cookie_handling()
         if attribute and value:
-            userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+            userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
             if userDocument:
                 if userDocument.has_key('search_criteria'):
                     searchCriteria = userDocument['search_criteria']
@@ -3079,7 +3182,7 @@ class riscos:
                         userDocument['search_criteria'] = searchCriteria
                         userDocument['key'] = attribute
                         userDocument['value'] = value
-                        self.usersCollection.save(userDocument)
+                        self.save_user_document(userDocument)
                         if userDocument['search_criteria'] == {}:
                             # As no search criteria, return without removal set to true to force exit from nested mode
                             raise cherrypy.HTTPRedirect("/riscos/advanced_search", 302)
@@ -3091,41 +3194,171 @@ class riscos:
         raise cherrypy.HTTPRedirect("/riscos/advanced_search?removal=true", 302)
     #enddef
     
+    def get_user_document(self, attribute, value):
+        # Return a copy of the user document with the given session_id or username, reading 'users' once the cached one has expired
+        if not value:
+            return None
+        #endif
+        key = (attribute, value)
+        userDocument = None
+        with self.userCacheLock:
+            if self.userCache.has_key(key):
+                (cached, userDocument) = self.userCache.pop(key)
+                if time.time()-cached < self.userCacheExpiry:
+                    self.userCache[key] = (cached, userDocument)
+                else:
+                    userDocument = None
+                #endif
+            #endif
+        #endwith
+        if not userDocument:
+            userDocument = self.usersCollection.find_one({attribute:value})
+            if not userDocument:
+                return None
+            #endif
+            self.cache_user_document(key, userDocument)
+        #endif
+        # Remember what this request was given, so that saving it writes only the fields the request has changed
+        if not hasattr(cherrypy.request, 'userDocuments'):
+            cherrypy.request.userDocuments = {}
+        #endif
+        cherrypy.request.userDocuments[userDocument['_id']] = copy.deepcopy(userDocument)
+        return copy.deepcopy(userDocument)
+    #enddef
+
+    def cache_user_document(self, key, userDocument):
+        with self.userCacheLock:
+            if self.userCache.has_key(key):
+                del self.userCache[key]
+            #endif
+            self.userCache[key] = (time.time(), userDocument)
+            while len(self.userCache) > self.userCacheSize:
+                self.userCache.popitem(last=False)
+            #endwhile
+        #endwith
+    #enddef
+
+    def save_user_document(self, userDocument):
+        # Write the fields changed since this request read the document, leaving those changed by other requests alone
+        if not userDocument.has_key('_id'):
+            userDocument['_id'] = ObjectId()
+        #endif
+        if not hasattr(cherrypy.request, 'userDocuments'):
+            cherrypy.request.userDocuments = {}
+        #endif
+        if cherrypy.request.userDocuments.has_key(userDocument['_id']):
+            originalDocument = cherrypy.request.userDocuments[userDocument['_id']]
+            changes = {}
+            for attribute in userDocument.keys():
+                if not originalDocument.has_key(attribute) or originalDocument[attribute] != userDocument[attribute]:
+                    changes.setdefault('$set', {})[attribute] = userDocument[attribute]
+                #endif
+            #endfor
+            for attribute in originalDocument.keys():
+                if not userDocument.has_key(attribute):
+                    changes.setdefault('$unset', {})[attribute] = 1
+                #endif
+            #endfor
+            with self.userVisitsLock:
+                if changes and not changes.has_key('$unset') and not [attribute for attribute in changes['$set'].keys() if not attribute in self.userVisitAttributes]:
+                    self.userVisits.setdefault(userDocument['_id'], {}).update(changes['$set'])
+                    changes = {}
+                elif changes and self.userVisits.has_key(userDocument['_id']):
+                    # Visit details still waiting to be flushed go out with this write instead
+                    userVisit = self.userVisits.pop(userDocument['_id'])
+                    for attribute in userVisit.keys():
+                        if not changes.get('$set', {}).has_key(attribute) and not changes.get('$unset', {}).has_key(attribute):
+                            changes.setdefault('$set', {})[attribute] = userVisit[attribute]
+                        #endif
+                    #endfor
+                #endif
+            #endwith
+            if changes:
+                self.usersCollection.update({'_id':userDocument['_id']}, changes)
+            #endif
+        else:
+            # New documents, or ones not read through get_user_document, are written whole
+            with self.userVisitsLock:
+                if self.userVisits.has_key(userDocument['_id']):
+                    userDocument.update(self.userVisits.pop(userDocument['_id']))
+                #endif
+            #endwith
+            self.usersCollection.save(userDocument)
+        #endif
+        cherrypy.request.userDocuments[userDocument['_id']] = copy.deepcopy(userDocument)
+        # Cached copies may be under a session id or username this change has replaced
+        with self.userCacheLock:
+            for key in self.userCache.keys():
+                if self.userCache[key][1]['_id'] == userDocument['_id']:
+                    del self.userCache[key]
+                #endif
+            #endfor
+        #endwith
+        if userDocument.has_key('session_id') and userDocument['session_id']:
+            self.cache_user_document(('session_id', userDocument['session_id']), copy.deepcopy(userDocument))
+        elif userDocument.has_key('username') and userDocument['username']:
+            self.cache_user_document(('username', userDocument['username']), copy.deepcopy(userDocument))
+        #endif
+    #enddef
+
+    def flush_user_visits(self):
+        with self.userVisitsLock:
+            userVisits = self.userVisits
+            self.userVisits = {}
+        #endwith
+        for (userId,userVisit) in userVisits.items():
+            self.usersCollection.update({'_id':userId}, {'$set':userVisit})
+        #endfor
+    #enddef
+
+    def reap_guest_documents(self):
+        # Remove expired guest documents in a single bulk delete and record how many went in 'stats'
+        epoch = int(time.time())
+        criteria = {'last_visit':{'$lt':epoch-self.guestExpiry},"username":{"$exists":False}}
+        reaped = self.usersCollection.find(criteria).count()
+        if reaped:
+            self.usersCollection.remove(criteria)
+        #endif
+        self.statsCollection.update({'_id':'guest_reaper'},{'$set':{'last_run':epoch,'last_reaped':reaped},'$inc':{'total_reaped':reaped,'runs':1}},upsert=True)
+        print 'Reaped '+str(reaped)+' guest documents'
+    #enddef
+
     def cookie_handling(self):
         status = ""
-        try:
-            cookie_string = cherrypy.request.headers['Cookie']
-        except:
-            cookie_string = ""
-        if not cookie_string:
-            self.sessionId = sha.new(repr(time.time())).hexdigest()
-            self.cookie['sid'] = self.sessionId
+        # Session state is held on the request, not the instance, as requests are served concurrently
+        if cherrypy.request.cookie.has_key('sid') and cherrypy.request.cookie['sid'].value:
+            cherrypy.request.sessionId = cherrypy.request.cookie['sid'].value
+            status = "existing"
+        else:
+            cherrypy.request.sessionId = sha.new(repr(time.time())+os.urandom(16)).hexdigest()
             userDocument = {}
-            userDocument["session_id"] = self.sessionId
-            self.usersCollection.insert(userDocument)
+            userDocument["session_id"] = cherrypy.request.sessionId
+            self.save_user_document(userDocument)
+            # Only a new session needs the cookie sending, leaving other responses cacheable
+            cherrypy.response.cookie['sid'] = cherrypy.request.sessionId
             status = "new"
-        else:
-            self.cookie.load(cookie_string)
-            self.sessionId = self.cookie['sid'].value
-            status = "existing"
         #endif
         
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        # Only mark the user and member documents as changed if the visitor's details have changed
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         if userDocument:
-            userDocument["ip_address"] = cherrypy.request.remote.ip
-            userDocument['user_agent'] = cherrypy.request.headers['User-Agent']
-            self.usersCollection.save(userDocument)
+            ipAddress = cherrypy.request.remote.ip
+            userAgent = cherrypy.request.headers['User-Agent']
+            if userDocument.get('ip_address') != ipAddress or userDocument.get('user_agent') != userAgent:
+                userDocument["ip_address"] = ipAddress
+                userDocument['user_agent'] = userAgent
+                self.save_user_document(userDocument)
+            #endif
             if userDocument.has_key('member') and userDocument['member']:
-                memberDocument = self.usersCollection.find_one({"username":userDocument['member']})
-                if memberDocument:
-                    memberDocument["ip_address"] = cherrypy.request.remote.ip
-                    memberDocument['user_agent'] = cherrypy.request.headers['User-Agent']
-                    self.usersCollection.save(memberDocument)
+                memberDocument = self.get_user_document("username", userDocument['member'])
+                if memberDocument and (memberDocument.get('ip_address') != ipAddress or memberDocument.get('user_agent') != userAgent):
+                    memberDocument["ip_address"] = ipAddress
+                    memberDocument['user_agent'] = userAgent
+                    self.save_user_document(memberDocument)
                 #endif
             #endif
         #endif
-        cherrypy.response.headers['Set-Cookie'] = self.cookie
-        return status         
+        return status
     #enddef
     
     @cherrypy.expose
@@ -3134,15 +3367,9 @@ class riscos:
         search = ""
         status = self.cookie_handling()
         content += self.header(status, 'index, follow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
         
-        # Delete guest documents older than 28 days
-        oldGuestDocuments = self.usersCollection.find({'last_visit':{'$lt':epoch-2419200},"username":{"$exists":False}})
-        for oldGuestDocument in oldGuestDocuments:
-            self.usersCollection.remove({'_id':ObjectId(oldGuestDocument['_id'])})
-        #endfor
-        
         if userDocument:
             if userDocument.has_key("last_visit") and userDocument["last_visit"]:
                 # Reset search if last visit was over 24 hours ago
@@ -3154,7 +3381,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
             if userDocument.has_key('value') and userDocument['value']:
                 search = userDocument['value']
             #endif
@@ -3169,25 +3396,19 @@ class riscos:
         content += '<tr><td width="25%" valign="top">'
         
         content += '<div class="partition">'
-        distinctQuestions = self.riscosCollection.find({"question":{"$exists":True,"$ne":""},"answer":{"$exists":True,"$ne":""}}).distinct("question")
-        questionFound = False
-        while distinctQuestions and not questionFound:
-            randomNo = randint(0,len(distinctQuestions)-1)
-            content += '<h3 class="columnheading">Random FAQ ('+str(randomNo+1)+' of '+str(len(distinctQuestions))+')</h3>'
-            content += self.display_faq_entries([distinctQuestions[randomNo]])
-            questionFound = True
-        #endwhile
+        document = self.random_document({"question":{"$exists":True,"$ne":""},"answer":{"$exists":True,"$ne":""}}, None, ['question'])
+        if document:
+            content += '<h3 class="columnheading">Random FAQ</h3>'
+            content += self.display_faq_entries([document['question']])
+        #endif
         content += '</div>'        
         
         content += '<div class="partition">'
-        distinctTerms = self.riscosCollection.find({"glossary_term":{"$exists":True,"$ne":""},"glossary_definition":{"$exists":True,"$ne":""}}).distinct("glossary_term")
-        termFound = False
-        while distinctTerms and not termFound:
-            randomNo = randint(0,len(distinctTerms)-1)
-            content += '<h3 class="columnheading">Random Glossary ('+str(randomNo+1)+' of '+str(len(distinctTerms))+')</h3>'
-            content += self.display_glossary_entries([distinctTerms[randomNo]])
-            termFound = True
-        #endwhile
+        document = self.random_document({"glossary_term":{"$exists":True,"$ne":""},"glossary_definition":{"$exists":True,"$ne":""}}, None, ['glossary_term'])
+        if document:
+            content += '<h3 class="columnheading">Random Glossary</h3>'
+            content += self.display_glossary_entries([document['glossary_term']])
+        #endif
         content += '</div>'
 
         content += '</td><td valign="top" width="25%">'
@@ -3195,7 +3416,7 @@ class riscos:
         content += '<div class="partition">'
         content += '<h3 class="columnheading">News</h3>'
         
-        for document in self.riscosCollection.find({'syndicated_feed':{'$exists':True},'date':{'$exists':True,'$ne':"",'$gte':epoch-self.periodMonth}}):
+        for document in self.riscosCollection.find({'syndicated_feed':{'$exists':True},'date':{'$exists':True,'$ne':"",'$gte':epoch-self.periodMonth}}).sort('date',pymongo.DESCENDING).limit(self.newsPanelLimit):
             if document.has_key('syndicated_feed_item_title') and document['syndicated_feed_item_title']:
                 content += '<h4 align="left">'+document['syndicated_feed_item_title']+'</h4>'
             #endif
@@ -3253,26 +3474,18 @@ class riscos:
         content += '</form></p>'        
         
         content += '<h4>What Others Have Been Searching For During The Past 28 Days</h4>'
-        otherUserDocuments = self.usersCollection.find({"session_id":{"$exists":True,"$ne":""},"value":{"$exists":True,"$ne":""},'last_visit':{'$gte':epoch-2419200}})
-        if otherUserDocuments:
-            otherSearches = []
-            for otherUserDocument in otherUserDocuments:
-                if otherUserDocument.has_key('format') and otherUserDocument.has_key('value') and otherUserDocument['format'] and otherUserDocument['value']:
-                    otherSearches.append((otherUserDocument['value'].lower(),otherUserDocument['format'],otherUserDocument['value']))
+        queriesDocument = self.get_queries('month')
+        if queriesDocument and queriesDocument['popular']:
+            otherSearches = queriesDocument['popular']
+            content += '<p>'
+            for os in range(len(otherSearches)):                   
+                # Terms typed by other visitors, so escaped in both the link and its text
+                content += '<a href="/riscos/generic_search?format='+urllib.quote_plus(otherSearches[os]['format'].encode('utf-8'))+'&search='+urllib.quote_plus(otherSearches[os]['term'].encode('utf-8'))+'">'+cgi.escape(otherSearches[os]['term'], True)+'</a>'
+                if os < len(otherSearches)-1:
+                    content += ' &bull; '
                 #endif
             #endfor
-            if otherSearches:
-                otherSearches = list(set(otherSearches))
-                otherSearches.sort()
-                content += '<p>'
-                for os in range(len(otherSearches)):                   
-                    content += '<a href="/riscos/generic_search?format='+otherSearches[os][1]+'&search='+otherSearches[os][2]+'">'+otherSearches[os][2]+'</a>'
-                    if os < len(otherSearches)-1:
-                        content += ' &bull; '
-                    #endif
-                #endfor
-                content += '</p>'
-            #endif
+            content += '</p>'
         #endif
         content += '</div>'
         
@@ -3327,27 +3540,57 @@ class riscos:
         return content
     #enddef
     
+    def random_document(self, criteria, userDocument=None, fields=None):
+        # Pick the document whose rand value follows a random point, wrapping round, with the user's filter in the query
+        if userDocument:
+            criteria = self.merge_filter_criteria(userDocument, criteria)
+        #endif
+        point = random()
+        for (operator,direction) in [('$gte',pymongo.ASCENDING),('$lt',pymongo.DESCENDING)]:
+            for document in self.riscosCollection.find({'$and':[criteria,{'rand':{operator:point}}]},fields).sort('rand',direction).limit(1):
+                return document
+            #endfor
+        #endfor
+        # Documents the spider has not yet given a rand value
+        for document in self.riscosCollection.find(criteria,fields).limit(1):
+            return document
+        #endfor
+        return None
+    #enddef
+    
     def insert_advert(self, attribute):
         content = ""
         if attribute:
-            doc_ids = self.riscosCollection.find({attribute:{'$exists':True},'url':{'$exists':True},'advert_url':{'$exists':True}}).distinct("_id")
+            document = self.random_document({attribute:{'$exists':True},'url':{'$exists':True},'advert_url':{'$exists':True}}, None, ['advert_url','url'])
         else:
-            doc_ids = self.riscosCollection.find({'url':{'$exists':True},'advert_url':{'$exists':True}}).distinct("_id")
+            document = self.random_document({'url':{'$exists':True},'advert_url':{'$exists':True}}, None, ['advert_url','url'])
         #endif
-        if doc_ids:
-            randomNo = randint(0,len(doc_ids)-1)
-            document = self.riscosCollection.find_one({'_id':ObjectId(doc_ids[randomNo])})
+        if document:
             content += '<p><a href="'+document['url']+'"><img border="0" src="'+document['advert_url']+'"></a></p>'
         #endif
         return content        
     #enddef
     
-    def dictionary_as_xml(self, document):
+    def xml_prologue(self):
         content = ""
         content += '<?xml version="1.0" encoding="ISO-8859-1"?>\n'
         content += '<?xml-stylesheet type="text/xsl" href="http://' + self.mirror + '/riscos.xsl"?>\n'
         #content += '<riscos xmlns="http://' + self.mirror + '/namespace" version="0.99">\n'
         content += '<riscos version="0.99">\n'
+        return content
+    #enddef
+    
+    def dictionary_as_xml(self, document):
+        content = ""
+        content += self.xml_prologue()
+        content += self.document_as_xml_elements(document)
+        content += '</riscos>'
+        return content        
+    #enddef
+    
+    def document_as_xml_elements(self, document):
+        # The elements within <riscos> for a single document
+        content = ""
         appFound = False
         for key in document.keys():
             if key == 'absolutes' and not 'application_name' in document.keys() and not 'directory' in document.keys():
@@ -3403,16 +3646,15 @@ class riscos:
                 content += self.video_as_xml(document)
             #endif
         #endfor
-        content += '</riscos>'
-        return content        
+        return content
     #enddef
     
     @cherrypy.expose
-    def generic_search(self, format="string", search=''):
-        content = ""
+    def generic_search(self, format="string", search='', page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, follow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
                 
         if userDocument:
@@ -3432,7 +3674,7 @@ class riscos:
                 userDocument['format'] = format
                 userDocument['value'] = search
             #endif
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif   
 
         content += '<h2>Generic Search</h2>'
@@ -3456,48 +3698,59 @@ class riscos:
         content += '</form></p>'
 
         if search:
-            if format == 'string':
-                search = re.escape(search)
-            #endif
-            doc_ids = []
-            attributesToSearch = []
-            for (externalAttribute,internalAttribute,key) in self.searchableAttributes:
-                attributesToSearch.append(internalAttribute)
-            #endfor
-            for attributeToSearch in attributesToSearch:
-                searchCriteria = {}
-                try:
-                    if attributeToSearch in ['relocatable_modules','module_dependencies','utilities']:
-                        searchCriteria[attributeToSearch+'.name'] = re.compile('(?i)'+search)
-                    else:
-                        searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    #endif
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
-                except:
-                    content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
-                    for charToBeEscaped in ['\\','(',')','$','.','+']:
-                        if charToBeEscaped in search and not '\\'+charToBeEscaped in search:
-                            content += "<br>Try escaping `"+charToBeEscaped+"` with `\\"+charToBeEscaped+"` as in `"+search.replace(charToBeEscaped,'\\'+charToBeEscaped)+"`"
+            searchClauses = []
+            term = search
+            started = time.time()
+            # String searches are answered from the search_index collection once the spider has built it
+            if format == 'string' and self.riscosspider.tokenise(search) and self.riscosspider.searchIndexCollection.find_one():
+                searchClauses.append(self.selection_criteria(self.riscosspider.search_index_lookup(search)))
+            else:
+                if format == 'string':
+                    search = re.escape(search)
+                #endif
+                attributesToSearch = []
+                for (externalAttribute,internalAttribute,key) in self.searchableAttributes:
+                    attributesToSearch.append(internalAttribute)
+                #endfor
+                for attributeToSearch in attributesToSearch:
+                    searchCriteria = {}
+                    try:
+                        if attributeToSearch in ['relocatable_modules','module_dependencies','utilities']:
+                            searchCriteria[attributeToSearch+'.name'] = re.compile('(?i)'+search)
+                        else:
+                            searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
                         #endif
+                        searchClauses.append(searchCriteria)
+                    except:
+                        content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
+                        for charToBeEscaped in ['\\','(',')','$','.','+']:
+                            if charToBeEscaped in search and not '\\'+charToBeEscaped in search:
+                                content += "<br>Try escaping `"+charToBeEscaped+"` with `\\"+charToBeEscaped+"` as in `"+search.replace(charToBeEscaped,'\\'+charToBeEscaped)+"`"
+                            #endif
+                        #endfor
+                        content += "</h3>"
+                        content += self.regex_table()
+                        content += self.footer()
+                        return content
                     #endfor
-                    content += "</h3>"
-                    content += self.regex_table()
-                    content += self.footer()
-                    return content
                 #endfor
             #endif
-            
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
+
+            # Logged with the total the results page counts anyway, once it has been
+            def log_results(total):
+                self.log_query(term, format, total, int((time.time()-started)*1000))
+            #enddef
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False, log_results)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False, log_results)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif           
             
         #endif
@@ -3505,13 +3758,14 @@ class riscos:
         return content
     #enddef
     
-    def embed_web_sites(self, docIds):
+    def embed_web_sites(self, documents):
         content = ""
         distinctUrls = []
-        for docId in docIds:
-            document = self.riscosCollection.find_one({'_id':ObjectId(docId),"directory":{"$exists":True,"$ne":""},"parent_url":{"$exists":True,"$ne":""}})
-            if document and not document['parent_url'] in distinctUrls:
-                distinctUrls.append(document['parent_url'])
+        for document in documents:
+            if document.has_key('directory') and document['directory'] and document.has_key('parent_url') and document['parent_url']:
+                if not document['parent_url'] in distinctUrls:
+                    distinctUrls.append(document['parent_url'])
+                #endif
             #endif
         #endfor
         distinctUrls.sort()
@@ -3538,133 +3792,72 @@ class riscos:
         return content
     #enddef
     
+    def get_filter_criteria(self, userDocument):
+        # The user's filter as a query fragment over the normalised attributes set by the spider, each setting applying on its own
+        clauses = []
+        if userDocument:
+            if userDocument.has_key('riscos_version') and userDocument['riscos_version']:
+                clauses.append({'$or':[{'min_riscos_versions':{'$exists':False}},{'min_riscos_versions':userDocument['riscos_version']}]})
+            #endif
+            if userDocument.has_key('addressing_mode') and userDocument['addressing_mode']:
+                clauses.append({'$or':[{'addressing_modes':{'$exists':False}},{'addressing_modes':[]},{'addressing_modes':[userDocument['addressing_mode']]}]})
+            #endif
+            if userDocument.has_key('territory') and userDocument['territory']:
+                clauses.append({'$or':[{'territories':None},{'territories':[]},{'territories':''},{'territories':userDocument['territory']}]})
+            #endif
+            yearRange = {}
+            for (attribute,operator) in [('start_year','$gte'),('end_year','$lte')]:
+                if userDocument.has_key(attribute) and userDocument[attribute]:
+                    try:
+                        yearRange[operator] = int(userDocument[attribute])
+                    except:
+                        True
+                #endif
+            #endfor
+            if yearRange:
+                clauses.append({'$or':[{'year':{'$exists':False}},{'year':yearRange}]})
+            #endif
+            if userDocument.has_key('arm_architecture') and userDocument['arm_architecture']:
+                clauses.append({'$or':[{'arm_architectures':None},{'arm_architectures':[]},{'arm_architectures':''},{'arm_architectures':userDocument['arm_architecture']}]})
+            #endif
+        #endif
+        if clauses:
+            return {'$and':clauses}
+        #endif
+        return {}
+    #enddef
+    
+    def merge_filter_criteria(self, userDocument, searchCriteria):
+        filterCriteria = self.get_filter_criteria(userDocument)
+        if filterCriteria:
+            return {'$and':[searchCriteria,filterCriteria]}
+        else:
+            return searchCriteria
+        #endif
+    #enddef
+    
     def apply_filter(self, userDocument, doc_ids):
-        if userDocument and ((userDocument.has_key('riscos_version') and userDocument['riscos_version']) or (userDocument.has_key('addressing_mode') and userDocument['addressing_mode'])):
-            filteredDocIds = []
+        filterCriteria = self.get_filter_criteria(userDocument)
+        if filterCriteria and doc_ids:
+            objectIds = []
             for doc_id in doc_ids:
-                validDocID = False
-                if userDocument.has_key('riscos_version') and userDocument['riscos_version'] and userDocument.has_key('addressing_mode') and userDocument['addressing_mode']:
-                    validRiscosVersion = False
-                    validAddressingMode = False
-                    if self.riscosCollection.find({'_id':ObjectId(doc_id),'module_dependencies.name':'UtilityModule'}).count():
-                        document = self.riscosCollection.find_one({'_id':ObjectId(doc_id),'module_dependencies.name':'UtilityModule'})
-                        for item in document['module_dependencies']:
-                            if item.has_key('name') and item['name'] == 'UtilityModule':
-                                if item.has_key('version') and item['version'] and len(item['version']) == 4 and item['version'] == userDocument['riscos_version']:
-                                    validRiscosVersion = True
-                                    break
-                                #endif
-                            #endif
-                        #endfor
-                    else:
-                        validRiscosVersion = True
-                    #endif
-                    if self.riscosCollection.find({'_id':ObjectId(doc_id),'relocatable_modules.addressing_mode':{"$exists":True}}).count():
-                        validAddressingMode = True
-                        document = self.riscosCollection.find_one({'_id':ObjectId(doc_id),'relocatable_modules.addressing_mode':{"$exists":True}})
-                        for item in document['relocatable_modules']:
-                            if item.has_key('addressing_mode') and item['addressing_mode'] and item['addressing_mode'] != userDocument['addressing_mode']:
-                                validAddressingMode = False
-                                break
-                            #endif
-                        #endfor
-                    else:
-                        validAddressingMode = True
-                    #endif 
-                    if validRiscosVersion and validAddressingMode:
-                        validDocID = True
-                    #endif                    
-                elif userDocument.has_key('riscos_version') and userDocument['riscos_version']:
-                    if self.riscosCollection.find({'_id':ObjectId(doc_id),'module_dependencies.name':'UtilityModule'}).count():
-                        document = self.riscosCollection.find_one({'_id':ObjectId(doc_id),'module_dependencies.name':'UtilityModule'})
-                        for item in document['module_dependencies']:
-                            if item.has_key('name') and item['name'] == 'UtilityModule':
-                                if item.has_key('version') and item['version'] and len(item['version']) == 4 and item['version'] == userDocument['riscos_version']:
-                                    validDocID = True
-                                    break
-                                #endif
-                            #endif
-                        #endfor
-                    else:
-                        validDocID = True
-                    #endif          
-                elif userDocument.has_key('addressing_mode') and userDocument['addressing_mode']:
-                    if self.riscosCollection.find({'_id':ObjectId(doc_id),'relocatable_modules.addressing_mode':{"$exists":True}}).count():
-                        validAddressingMode = True
-                        document = self.riscosCollection.find_one({'_id':ObjectId(doc_id),'relocatable_modules.addressing_mode':{"$exists":True}})
-                        for item in document['relocatable_modules']:
-                            if item.has_key('addressing_mode') and item['addressing_mode'] and item['addressing_mode'] != userDocument['addressing_mode']:
-                                validAddressingMode = False
-                                break
-                            #endif
-                        #endfor
-                        if validAddressingMode:
-                            validDocID = True
-                        #endif
-                    else:
-                        validDocID = True
-                    #endif                    
-                else:
-                    validDocID = True
-                #endif
-                    
-                if validDocID:
-                    if userDocument.has_key('territory') and userDocument['territory']:
-                        document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
-                        if document:
-                            if document.has_key('territories') and document['territories']:
-                                if not userDocument['territory'] in document['territories']:
-                                    validDocID = False
-                                #endif
-                            #endif
-                        #endif                        
-                    #endif
-                #endif
-                    
-                if validDocID: 
-                    if userDocument.has_key('start_year') and userDocument['start_year'] or userDocument.has_key('end_year') and userDocument['end_year']: 
-                        document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
-                        if document:
-                            if document.has_key('date') and document['date']:
-                                try:
-                                    documentYear = int(time.ctime(int(document['date']))[-4:])
-                                    if documentYear < int(userDocument['start_year']) or documentYear > int(userDocument['end_year']):
-                                        validDocID = False
-                                    #endif
-                                except:
-                                    True
-                            #endif
-                        #endif
-                    #endif
-                #endif
-                
-                if validDocID: 
-                    if userDocument.has_key('arm_architecture') and userDocument['arm_architecture']: 
-                        document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
-                        if document:
-                            if document.has_key('arm_architectures') and document['arm_architectures']:
-                                if not userDocument['arm_architecture'] in document['arm_architectures']:
-                                    validDocID = False
-                                #endif
-                            #endif
-                        #endif
-                    #endif
-                #endif
-                
-                if validDocID:
-                    filteredDocIds.append(doc_id)
-                #endif
+                try:
+                    objectIds.append(ObjectId(doc_id))
+                except:
+                    True
             #endfor
+            filterCriteria['_id'] = {'$in':objectIds}
+            filteredDocIds = self.riscosCollection.find(filterCriteria).distinct('_id')
         else:
             filteredDocIds = doc_ids
-        #endif    
+        #endif
         return filteredDocIds
-    #endif
+    #enddef
     
     @cherrypy.expose
-    def advanced_search(self, attribute='directory', value='', nested=False, removal=False, spider=False):
+    def advanced_search(self, attribute='directory', value='', nested=False, removal=False, spider=False, page=1):
         status = self.cookie_handling()
-        content = ""
+        content = riscospage.riscospage()
                
         if removal:
             nested = True
@@ -3674,7 +3867,7 @@ class riscos:
                
         content += self.header(status, 'index, nofollow')  
         
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         
         epoch = int(time.time())
         
@@ -3712,7 +3905,7 @@ class riscos:
                     userDocument['value'] = value
                 #endif
             #endif
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
 
             if not attribute and not value:
                 if userDocument and userDocument.has_key('key') and userDocument['key']:
@@ -3798,9 +3991,9 @@ class riscos:
                         content += self.footer()
                         return content                    
                 #endfor
-                doc_ids = self.riscosCollection.find(searchCriteria).distinct('_id')
+                searchClauses = [searchCriteria]
             else:
-                doc_ids = []
+                searchClauses = []
                 if attribute:
                     attributesToSearch = [attribute]
                 else:
@@ -3817,7 +4010,7 @@ class riscos:
                         else:
                             searchCriteria[attributeToSearch] = re.compile('(?i)'+value)
                         #endif
-                        doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
+                        searchClauses.append(searchCriteria)
                     except:
                         content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in '"+value+"', your Regex for '"+attributeToSearch+"'!"
                         for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -3832,16 +4025,17 @@ class riscos:
                 #endfor                
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'advanced_search', nested)
+                content += self.stream_document_table(filteredDocIds, 'advanced_search', nested)
             else:
-                content += self.display_document_report(filteredDocIds, 'advanced_search', nested)
+                content += self.stream_document_report(filteredDocIds, 'advanced_search', nested)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
             
         #endif
@@ -3849,71 +4043,150 @@ class riscos:
         return content
     #enddef
 
-    def filter_documents_by_type(self, doc_ids, type):
-        filteredDocIds = []
-        discarded = 0
-        doc_ids = list(set(doc_ids))
-        if type == 'Applications':
-            for doc_id in doc_ids:
-                document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
-                if document:
-                    if document.has_key('directory') and document['directory']:
-                        if not document.has_key('superseded_by') or not document['superseded_by']:
-                            filteredDocIds.append(doc_id)
-                        #endif
-                    #endif            
+    def load_documents(self, doc_ids):
+        # Fetch a whole result set in a single query, keeping only the displayed attributes
+        documents = []
+        objectIds = []
+        # A set alongside the ordered list keeps deduplicating linear in the number of results
+        seenObjectIds = set()
+        for doc_id in doc_ids:
+            try:
+                objectId = ObjectId(doc_id)
+                if not objectId in seenObjectIds:
+                    seenObjectIds.add(objectId)
+                    objectIds.append(objectId)
                 #endif
+            except:
+                True
+        #endfor
+        if objectIds:
+            documentsById = {}
+            for document in self.riscosCollection.find({'_id':{'$in':objectIds}},self.displayedFields):
+                documentsById[document['_id']] = document
             #endfor
-            for doc_id in doc_ids:
-                document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
-                if document:
-                    if document.has_key('directory') and document['directory']:
-                        if document.has_key('superseded_by') and document['superseded_by']:
-                            filteredDocIds.append(doc_id)
-                        #endif
-                    #endif            
-                #endif
-            #endfor             
-        elif type == 'CompressedFiles':
-            for doc_id in doc_ids:
-                document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
-                if document:
-                    if not (document.has_key('directory') and document['directory']):
-                        if (document.has_key('zip_file') and document['zip_file']) or (document.has_key('arc_file') and document['arc_file']) or (document.has_key('spk_file') and document['spk_file']):
-                            filteredDocIds.append(doc_id)
-                        #endif
-                    #endif             
-                #endif
-            #endfor        
-        elif type == 'Non-Software':
-            for doc_id in doc_ids:
-                document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
-                if document:
-                    if not (document.has_key('directory') and document['directory']):
-                        if not(document.has_key('zip_file') and document['zip_file']):
-                            if not (document.has_key('arc_file') and document['arc_file']):
-                                if not (document.has_key('spk_file') and document['spk_file']):
-                                    filteredDocIds.append(doc_id)
-                                #endif
-                            #endif
-                        #endif
-                    #endif           
+            for objectId in objectIds:
+                if documentsById.has_key(objectId):
+                    documents.append(documentsById[objectId])
                 #endif
-            #endfor        
+            #endfor
+        #endif
+        return documents
+    #enddef
+
+    def selection_criteria(self, selection):
+        # A result set is passed around as a query or, where it can't be expressed as one, as a list of ids
+        if isinstance(selection, dict):
+            return selection
+        #endif
+        objectIds = []
+        for doc_id in selection:
+            try:
+                objectIds.append(ObjectId(doc_id))
+            except:
+                True
+        #endfor
+        return {'_id':{'$in':objectIds}}
+    #enddef
+    
+    def single_doc_id(self, selection):
+        # The _id of the only document in a result set, or None if there are none or several
+        docIds = [document['_id'] for document in self.riscosCollection.find(self.selection_criteria(selection),['_id']).limit(2)]
+        if len(docIds) == 1:
+            return docIds[0]
         #endif
+        return None
+    #enddef
 
-        if len(filteredDocIds) >= 32:
-            discarded = len(filteredDocIds)-32
-            filteredDocIds = filteredDocIds[:32]
+    def classify_documents(self, selection, page=1):
+        # Order a result set as Applications, CompressedFiles and Non-Software, newest first, with MongoDB counting
+        # each type and sorting and skipping to the requested page, so only the documents displayed are fetched
+        classifiedDocuments = {}
+        total = 0
+        criteria = self.selection_criteria(selection)
+        skip = (page-1)*self.pageSize
+        limit = self.pageSize
+        pageDocuments = []
+        for (type,typeCriteria) in self.typeCriteria:
+            cursor = self.riscosCollection.find({'$and':[criteria,typeCriteria]},self.displayedFields)
+            typeTotal = cursor.count()
+            total += typeTotal
+            if skip >= typeTotal:
+                skip -= typeTotal
+            elif limit:
+                for document in cursor.sort([('date',pymongo.DESCENDING),('_id',pymongo.DESCENDING)]).skip(skip).limit(limit):
+                    pageDocuments.append((type,document))
+                #endfor
+                limit -= min(typeTotal-skip, limit)
+                skip = 0
+            #endif
+        #endfor
+        if pageDocuments:
+            for type in ['Applications','CompressedFiles','Non-Software']:
+                classifiedDocuments[type] = []
+            #endfor
+            for (type,document) in pageDocuments:
+                classifiedDocuments[type].append(document)
+            #endfor
+        #endif
+        return classifiedDocuments, total
+    #enddef
+    
+    def get_page_number(self):
+        page = 1
+        try:
+            page = max(int(cherrypy.request.params.get('page', 1)), 1)
+        except:
+            True
+        return page
+    #enddef
+    
+    def page_url(self, page):
+        params = {}
+        for key in cherrypy.request.params.keys():
+            # Don't repeat one-off actions when paging through the results
+            if key in ['removal','spider']:
+                continue
+            #endif
+            value = cherrypy.request.params[key]
+            if isinstance(value, unicode):
+                value = value.encode('utf-8')
+            #endif
+            params[key] = value
+        #endfor
+        params['page'] = page
+        return cherrypy.request.script_name+cherrypy.request.path_info+'?'+urllib.urlencode(params, True)
+    #enddef
+    
+    def pagination_links(self, page, total):
+        content = ""
+        if total > self.pageSize:
+            lastPage = (total+self.pageSize-1)/self.pageSize
+            firstRecord = min((page-1)*self.pageSize+1, total)
+            lastRecord = min(page*self.pageSize, total)
+            content += '<p align="center">'
+            if page > 1:
+                content += '<a href="'+self.page_url(page-1)+'">&laquo; Previous</a> '
+            #endif
+            content += '<b>Records '+str(firstRecord)+' to '+str(lastRecord)+' of '+str(total)+'</b>'
+            if page < lastPage:
+                content += ' <a href="'+self.page_url(page+1)+'">Next &raquo;</a>'
+            #endif
+            content += '</p>'
         #endif
-        return filteredDocIds, discarded
+        return content
+    #enddef
+    
+    def display_document_table(self, selection, origin, nested=False):
+        return ''.join(self.stream_document_table(selection, origin, nested))
     #enddef
     
-    def display_document_table(self, doc_ids, origin, nested=False):
+    def stream_document_table(self, selection, origin, nested=False, counted=None):
+        # Yields the page a row at a time so a streamed response can send each row as soon as it is built, telling
+        # counted, if given, how many documents there are in all
         content = ""
         romModules = []
         epoch = int(time.time())
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         
         selectedRiscosVersion, selectedAddressingMode, selectedArmArchitecture, selectedTerritory, selectedStartYear, selectedEndYear, selectedView, selectedWebsites = self.get_filter_settings(userDocument) 
         for (potentialRiscosVersion,potentialRomModules) in self.romModules:
@@ -3923,26 +4196,28 @@ class riscos:
             #endif
         #endfor      
         
-        if doc_ids:
+        page = self.get_page_number()
+        classifiedDocuments, total = self.classify_documents(selection, page)
+        if counted:
+            counted(total)
+        #endif
+        if classifiedDocuments:
             for (type,textualType) in [('Applications','RISC OS Applications'),('CompressedFiles','Miscellaneous Archive Files'),('Non-Software','Non-Software URLs')]:
-                filteredDocIds, discarded = self.filter_documents_by_type(doc_ids, type)
+                filteredDocuments = classifiedDocuments[type]
+
+                if filteredDocuments:
 
-                if filteredDocIds:              
-                
                     #content += '<h2 class="resultheader">'+textualType+'</h2>'
-                
+
                     columnsRequired = []
-                    for doc_id in filteredDocIds:
-                        document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
-                        if document:
-                            for (externalAttribute,internalAttribute,image) in self.displayedAttributes:
-                                if not internalAttribute in columnsRequired:
-                                    if document.has_key(internalAttribute) and document[internalAttribute]:
-                                        columnsRequired.append(internalAttribute)
-                                    #endif
+                    for document in filteredDocuments:
+                        for (externalAttribute,internalAttribute,image) in self.displayedAttributes:
+                            if not internalAttribute in columnsRequired:
+                                if document.has_key(internalAttribute) and document[internalAttribute]:
+                                    columnsRequired.append(internalAttribute)
                                 #endif
-                            #endfor
-                        #endif
+                            #endif
+                        #endfor
                     #endfor
 
                     content += '<table class="software">'
@@ -3959,8 +4234,11 @@ class riscos:
                     #endfor
                     content += '<th><p class="heading">Buttons</p></th></tr>'
 
-                    for doc_id in filteredDocIds:
-                        document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
+                    for document in filteredDocuments:
+                        if content:
+                            yield content
+                            content = ""
+                        #endif
                         if document.has_key('superseded_by') and document['superseded_by']:
                             content += '<tr class="superseded">'
                         else:
@@ -4337,33 +4615,36 @@ class riscos:
                         #endif
                         content += '</td>'
                     #endfor
-                        
-                    if discarded:
-                        content += '<tr><td colspan="'+str(len(columnsRequired)+1)+'"><h3 class="warning">Sorry, Unable To Display Remaining '+str(discarded)+' Records!</h3></td></tr>'
-                    #endif
                     content += '</table>'
                     
                     if type == 'Applications':
                         if userDocument and userDocument.has_key('web_sites') and userDocument['web_sites'] and userDocument['web_sites'] in ['enabled 640x480','enabled 800x600','enabled 1024x768']:
-                            content += self.embed_web_sites(filteredDocIds)
+                            content += self.embed_web_sites(filteredDocuments)
                         #endif
                     #endif
                     content += '<p></p>'
                 #endif
             #endfor
+            content += self.pagination_links(page, total)
         else:
             content += '<p align="center"><b>Sorry, no matching records could be found!<br>Ensure the above filter is set correctly!<br>Should you find the information you require elsewhere,<br>please don\'t forget to submit the URL to us for the benefit of others!</b></p>'
             content += '<p align="center">You might like to try: <a href="http://www.filebase.org.uk/">ANS RISC OS Filebase</a> | <a href="http://www.riscos.org/links/">RISC OS Software Links Database</a> | <a href="http://nutshells.anjackson.net/">Nutshells</a> | <a href="http://www.arcsite.de/arcarchie/eindex.html">ArcArchie</a> | <a href="http://www.riscos.com/the_archive/rol/productsdb/index.htm">RISC OS Products Directory</a></p>'
         #endif
-        return content
+        yield content
     #enddef
     
-    def display_document_report(self, doc_ids, origin, nested=False):
+    def display_document_report(self, selection, origin, nested=False):
+        return ''.join(self.stream_document_report(selection, origin, nested))
+    #enddef
+    
+    def stream_document_report(self, selection, origin, nested=False, counted=None):
+        # Yields the page a row at a time so a streamed response can send each row as soon as it is built, telling
+        # counted, if given, how many documents there are in all
         content = ""
         romModules = []
         
         remoteAddr = cherrypy.request.remote.ip
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         
         selectedRiscosVersion, selectedAddressingMode, selectedArmArchitecture, selectedTerritory, selectedStartYear, selectedEndYear, selectedView, selectedWebsites = self.get_filter_settings(userDocument)
         for (potentialRiscosVersion,potentialRomModules) in self.romModules:
@@ -4374,15 +4655,27 @@ class riscos:
         #endfor       
         
         content += '<div class="report">'
-        if doc_ids:
+        page = self.get_page_number()
+        if content:
+            yield content
+            content = ""
+        #endif
+        classifiedDocuments, total = self.classify_documents(selection, page)
+        if counted:
+            counted(total)
+        #endif
+        if classifiedDocuments:
             for (type,textualType) in [('Applications','RISC OS Applications'),('CompressedFiles','Miscellaneous Archive Files'),('Non-Software','Non-Software URLs')]:
-                filteredDocIds, discarded = self.filter_documents_by_type(doc_ids, type)
-                if filteredDocIds:
-                
+                filteredDocuments = classifiedDocuments[type]
+                if filteredDocuments:
+
                     #content += '<h2 class="resultheader">'+textualType+'</h2>'
-                    
-                    for doc_id in filteredDocIds:
-                        document = self.riscosCollection.find_one({'_id':ObjectId(doc_id)})
+
+                    for document in filteredDocuments:
+                        if content:
+                            yield content
+                            content = ""
+                        #endif
                         if document.has_key('url') and document['url'] and not document['url'].__contains__('/riscos/softwareunconfirmed/'):
                             if (document.has_key('directory') and document['directory']) or (document.has_key('application_name') and document['application_name']):
                                 if document.has_key('directory') and document['directory'] and document.has_key('application_name') and document['application_name']:
@@ -4392,7 +4685,14 @@ class riscos:
                                 elif document.has_key('application_name') and document['application_name']:
                                     content += '<p class="report"><a class="external" href="'+document['url']+'" target="_blank" title="'+document['url']+'"><img src="/riscos/images/ddc.png" border="0"> '+document['application_name']+'</a>'+self.insert_application_version_and_or_date(document)+self.insert_date(document)+'<br><b class="green">'+document['url']+self.insert_parent_hyperlink(document)+'</b>'
                                 #endif
-                                distinctModules = self.riscosCollection.find({'_id':ObjectId(document['_id'])}).distinct('relocatable_modules.name')
+                                distinctModules = []
+                                if document.has_key('relocatable_modules') and document['relocatable_modules']:
+                                    for relocatableModule in document['relocatable_modules']:
+                                        if relocatableModule.has_key('name') and relocatableModule['name'] and not relocatableModule['name'] in distinctModules:
+                                            distinctModules.append(relocatableModule['name'])
+                                        #endif
+                                    #endfor
+                                #endif
                                 if distinctModules:
                                     content += '<br>Modules: '
                                     try:
@@ -4421,18 +4721,19 @@ class riscos:
                     #endfor
                     if type == 'Applications':
                         if userDocument and userDocument.has_key('web_sites') and userDocument['web_sites'] and userDocument['web_sites'] in ['enabled 640x480','enabled 800x600','enabled 1024x768']:
-                            content += self.embed_web_sites(filteredDocIds)
+                            content += self.embed_web_sites(filteredDocuments)
                         #endif
                     #endif
                 #endif
                 content += '<p></p>'
             #endfor
+            content += self.pagination_links(page, total)
         else:
             content += '<p align="center"><b>Sorry, no matching records could be found!<br>Ensure the above filter is set correctly!<br>Should you find the information you require elsewhere,<br>please don\'t forget to submit the URL to us for the benefit of others!</b></p>'
             content += '<p align="center">You might like to try: <a href="http://www.filebase.org.uk/">ANS RISC OS Filebase</a> | <a href="http://www.riscos.org/links/">RISC OS Software Links Database</a> | <a href="http://nutshells.anjackson.net/">Nutshells</a> | <a href="http://www.arcsite.de/arcarchie/eindex.html">ArcArchie</a> | <a href="http://www.riscos.com/the_archive/rol/productsdb/index.htm">RISC OS Products Directory</a></p>'
         #endif
         content += '</div>'
-        return content
+        yield content
     #enddef
     
     def insert_parent_hyperlink(self,document):
@@ -4499,34 +4800,44 @@ class riscos:
        
     @cherrypy.expose
     # This feature is hidden in the UI
-    def database_as_json(self, nested=False):
+    def database_as_json(self, nested=False, refresh=False):
+        return self.database_export('json', 'JSON', refresh)
+    #enddef
+    
+    @cherrypy.expose
+    # This feature is hidden in the UI
+    def database_as_xml(self, nested=False, refresh=False):
+        return self.database_export('xml', 'riscos.xml', refresh)
+    #enddef
+    
+    def database_export(self, format, textualFormat, refresh):
+        # Offer the last completed snapshot and report on, or start, a fresh export in the background
         status = self.cookie_handling()
         content = ""
-        port = ""
         content += self.header(status, 'noindex, follow')
-        if self.mongodbPort != 27017:
-            port = ' --port '+str(self.mongodbPort)
+        progressDocument = self.export.get_progress(format)
+        if refresh or not progressDocument:
+            self.export.start(format)
+            progressDocument = self.export.get_progress(format)
+        elif self.export.abandoned(progressDocument):
+            self.export.resume()
+            progressDocument = self.export.get_progress(format)
+        #endif
+        (snapshot,snapshotTime) = self.export.latest_snapshot(format)
+        if snapshot:
+            content += '<p><a href="/riscos/downloads/'+snapshot+'">Download Database in '+textualFormat+' Format</a> (exported '+time.ctime(snapshotTime)+')</p>'
+        #endif
+        if progressDocument and progressDocument['status'] == 'running':
+            content += '<p>Export in progress: '+str(progressDocument['exported'])+' of '+str(progressDocument['total'])+' records</p>'
+        else:
+            if progressDocument and progressDocument['status'] == 'failed':
+                content += '<p>The last export failed after '+str(progressDocument['exported'])+' of '+str(progressDocument['total'])+' records</p>'
+            #endif
+            content += '<p><form class="inline" action="/riscos/database_as_'+format+'" method="post"><input type="hidden" name="refresh" value="true"><input class="button" type="submit" value="Export Again"></form></p>'
         #endif
-        executable = r'"C:\Program Files\MongoDB\bin\mongoexport.exe" --verbose'+port+' --db riscos --collection riscos --out '+self.path+os.sep+'downloads'+os.sep+'riscos.json'
-        (status,output) = self.getstatusoutput(executable)
-        content += '<p><a href="/riscos/downloads/riscos.json">Download Database in JSON Format</p>'
         content += '</div></body>'
         content += self.footer()
         return content  
-    #enddef    
-    
-    def getstatusoutput(self,cmd):
-        """Return (status, output) of executing cmd in a shell."""
-        mswindows = (sys.platform == "win32")
-        if not mswindows:
-            cmd = '{ ' + cmd + '; }'
-        #endif
-        pipe = os.popen(cmd + ' 2>&1', 'r')
-        text = pipe.read()
-        sts = pipe.close()
-        if sts is None: sts = 0
-        if text[-1:] == '\n': text = text[:-1]
-        return sts, text
     #enddef
     
     @cherrypy.expose
@@ -4534,13 +4845,13 @@ class riscos:
         epoch = int(time.time())
         status = self.cookie_handling()
         content = ""
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         content += self.header(status, 'index, nofollow')
         content += '<h2>News</h2>'    
         content += '<p>An amalgamation of Syndicated (RSS and Atom) Feeds from around the World Wide Web</p>'
         content += '<table border="0" width="99%"><tr>'
         colCount = 0
-        for document in self.riscosCollection.find({'syndicated_feed':{'$exists':True},'date':{'$exists':True,'$ne':"",'$gte':epoch-self.periodYear}}):
+        for document in self.riscosCollection.find({'syndicated_feed':{'$exists':True},'date':{'$exists':True,'$ne':"",'$gte':epoch-self.periodYear}}).sort('date',pymongo.DESCENDING).limit(self.newsLimit):
             content += '<td valign="top" width="33%">'
             content += '<div class="partition">'
             if document.has_key('syndicated_feed_item_title') and document['syndicated_feed_item_title']:
@@ -4590,60 +4901,52 @@ class riscos:
     def latest_records(self):
         content = ""
         epoch = int(time.time())
-        # Gather records last modified in the past month
-        lastModifieds = self.riscosCollection.find({'date':{'$exists':True,'$ne':"",'$gte':epoch-self.periodMonth}}).distinct('date')
-        lastModifieds.sort(reverse=True)
-        count = 0
-        for lastModified in lastModifieds:
-            timeString = time.ctime(lastModified)
-            # Ensure date last modified and last_scanned dates are at least two hours apart
-            for document in self.riscosCollection.find({'date':lastModified,'last_scanned':{'$gt':lastModified+7200}}):
-                if document.has_key('url') and document['url'] and not document['url'].__contains__('/riscos/softwareunconfirmed/'):
-                    if (document.has_key('directory') and document['directory']) or (document.has_key('application_name') and document['application_name']):
-                        content += ' <h4 align="left">'+timeString+'</h4>'
-                        if document.has_key('directory') and document['directory'] and document.has_key('application_name') and document['application_name']:
-                            content += '<p><a class="external" href="'+document['url']+'" target="_blank" title="'+document['url']+'"><img src="/riscos/images/ddc.png" border="0"> '+document['application_name']+'</a> ('+document['directory']+')'+self.insert_application_version_and_or_date(document)+'<br><b class="green">'+document['url']+self.insert_parent_hyperlink(document)+'</b>'
-                        elif document.has_key('directory') and document['directory']:
-                            content += '<p><a class="external" href="'+document['url']+'" target="_blank" title="'+document['url']+'"><img src="/riscos/images/ddc.png" border="0"> '+document['directory']+'</a>'+self.insert_application_version_and_or_date(document)+'<br><b class="green">'+document['url']+self.insert_parent_hyperlink(document)+'</b>'
-                        elif document.has_key('application_name') and document['application_name']:
-                            content += '<p><a class="external" href="'+document['url']+'" target="_blank" title="'+document['url']+'"><img src="/riscos/images/ddc.png" border="0"> '+document['application_name']+'</a>'+self.insert_application_version_and_or_date(document)+'<br><b class="green">'+document['url']+self.insert_parent_hyperlink(document)+'</b>'
-                        #endif
-                        distinctModules = self.riscosCollection.find({'_id':ObjectId(document['_id'])}).distinct('relocatable_modules.name')
-                        if distinctModules:
-                            content += '<br>Modules: '
-                            try:
-                                for i in range(len(distinctModules)):
-                                    content += '<a href="/riscos/module?search='+distinctModules[i]+'">'+distinctModules[i]+'</a>'
-                                    if i < len(distinctModules)-1:
-                                        content += ', '
-                                    #endif
-                                #endfor
-                            except:
-                                True
-                        #endif
-                        content += '</p>'
-                        count += 1
-                    elif document.has_key('domain') and document['domain'] in ['www.youtube.com','m.youtube.com','uk.youtube.com'] and document.has_key('embed') and document['embed']:
-                        content += ' <h4 align="left">'+timeString+'</h4>'
-                        if document.has_key('page_title') and document['page_title']:
-                            content += '<p>'+document['embed']+'<br><a href="'+document['url']+'" target="_blank" title="'+document['url']+'">'+document['page_title']+'</a>'+'<br><b class="green">'+document['url']+self.insert_parent_hyperlink(document)+'</b>'
-                        else:
-                            content += '<p>'+document['embed']+'<br><a href="'+document['url']+'" target="_blank" title="'+document['url']+'">'+document['url']+'</a>'+self.insert_parent_hyperlink(document)
-                        #endif
-                        content += '</p>'
-                        count += 1
-                    elif document.has_key('page_title') and document['page_title']:
-                        content += ' <h4 align="left">'+timeString+'</h4>'
-                        content += '<p><a href="'+document['url']+'" target="_blank" title="'+document['url']+'">'+document['page_title']+'</a></p>'
-                        count += 1
-                    #endif
+        # The spider keeps the newest qualifying records, already sorted, as a single document
+        latestRecordsDocument = self.statsCollection.find_one({'_id':'latest_records'})
+        if not latestRecordsDocument:
+            self.riscosspider.rebuild_latest_records()
+            latestRecordsDocument = self.statsCollection.find_one({'_id':'latest_records'})
+        #endif
+        for document in latestRecordsDocument['records']:
+            # Only records last modified in the past month
+            if document['date'] < epoch-self.periodMonth:
+                break
+            #endif
+            timeString = time.ctime(document['date'])
+            if (document.has_key('directory') and document['directory']) or (document.has_key('application_name') and document['application_name']):
+                content += ' <h4 align="left">'+timeString+'</h4>'
+                if document.has_key('directory') and document['directory'] and document.has_key('application_name') and document['application_name']:
+                    content += '<p><a class="external" href="'+document['url']+'" target="_blank" title="'+document['url']+'"><img src="/riscos/images/ddc.png" border="0"> '+document['application_name']+'</a> ('+document['directory']+')'+self.insert_application_version_and_or_date(document)+'<br><b class="green">'+document['url']+self.insert_parent_hyperlink(document)+'</b>'
+                elif document.has_key('directory') and document['directory']:
+                    content += '<p><a class="external" href="'+document['url']+'" target="_blank" title="'+document['url']+'"><img src="/riscos/images/ddc.png" border="0"> '+document['directory']+'</a>'+self.insert_application_version_and_or_date(document)+'<br><b class="green">'+document['url']+self.insert_parent_hyperlink(document)+'</b>'
+                elif document.has_key('application_name') and document['application_name']:
+                    content += '<p><a class="external" href="'+document['url']+'" target="_blank" title="'+document['url']+'"><img src="/riscos/images/ddc.png" border="0"> '+document['application_name']+'</a>'+self.insert_application_version_and_or_date(document)+'<br><b class="green">'+document['url']+self.insert_parent_hyperlink(document)+'</b>'
+                #endif
+                distinctModules = document['modules']
+                if distinctModules:
+                    content += '<br>Modules: '
+                    try:
+                        for i in range(len(distinctModules)):
+                            content += '<a href="/riscos/module?search='+distinctModules[i]+'">'+distinctModules[i]+'</a>'
+                            if i < len(distinctModules)-1:
+                                content += ', '
+                            #endif
+                        #endfor
+                    except:
+                        True
                 #endif
-                if count >= 32:
-                    break;
+                content += '</p>'
+            elif document.has_key('domain') and document['domain'] in ['www.youtube.com','m.youtube.com','uk.youtube.com'] and document.has_key('embed') and document['embed']:
+                content += ' <h4 align="left">'+timeString+'</h4>'
+                if document.has_key('page_title') and document['page_title']:
+                    content += '<p>'+document['embed']+'<br><a href="'+document['url']+'" target="_blank" title="'+document['url']+'">'+document['page_title']+'</a>'+'<br><b class="green">'+document['url']+self.insert_parent_hyperlink(document)+'</b>'
+                else:
+                    content += '<p>'+document['embed']+'<br><a href="'+document['url']+'" target="_blank" title="'+document['url']+'">'+document['url']+'</a>'+self.insert_parent_hyperlink(document)
                 #endif
-            #endfor
-            if count >= 32:
-                break;
+                content += '</p>'
+            elif document.has_key('page_title') and document['page_title']:
+                content += ' <h4 align="left">'+timeString+'</h4>'
+                content += '<p><a href="'+document['url']+'" target="_blank" title="'+document['url']+'">'+document['page_title']+'</a></p>'
             #endif
         #endfor
         return content
@@ -4781,11 +5084,11 @@ class riscos:
     #enddef 
     
     @cherrypy.expose
-    def absolute(self, format="string", search=""):
-        content = ""
+    def absolute(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -4799,7 +5102,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Absolute Search</h2>'
@@ -4831,14 +5134,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['absolutes']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -4853,16 +5155,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
             
         #endif
@@ -4871,11 +5174,11 @@ class riscos:
     #enddef    
     
     @cherrypy.expose
-    def app(self, format="string", search=""):
-        content = ""
+    def app(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -4889,7 +5192,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Application Search</h2>'
@@ -4925,14 +5228,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['application_name','directory']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -4947,16 +5249,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -4964,11 +5267,11 @@ class riscos:
     #enddef
     
     @cherrypy.expose
-    def filetype(self, format="string", search=""):
-        content = ""
+    def filetype(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -4982,7 +5285,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Filetype Search</h2>'
@@ -5014,14 +5317,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['filetypes_set','filetypes_run']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -5036,16 +5338,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += '<p><form class="inline" action="/riscos/filetypes" method="post"><input class="button" type="submit" value="Filetypes"></form></p>'
@@ -5054,11 +5357,11 @@ class riscos:
     #enddef
     
     @cherrypy.expose
-    def font(self, format="string", search=""):
-        content = ""
+    def font(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -5072,7 +5375,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Font Search</h2>'
@@ -5104,14 +5407,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['fonts']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -5126,16 +5428,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -5143,11 +5446,11 @@ class riscos:
     #enddef
     
     @cherrypy.expose
-    def computer(self, format="string", search=""):
-        content = ""
+    def computer(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -5161,7 +5464,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Computer Search</h2>'
@@ -5197,14 +5500,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['computer']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -5219,16 +5521,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -5236,11 +5539,11 @@ class riscos:
     #enddef    
     
     @cherrypy.expose
-    def peripheral(self, format="string", search=""):
-        content = ""
+    def peripheral(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -5254,7 +5557,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Peripheral Search</h2>'
@@ -5290,14 +5593,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['peripheral']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -5312,16 +5614,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -5329,11 +5632,11 @@ class riscos:
     #enddef  
     
     @cherrypy.expose
-    def podule(self, format="string", search=""):
-        content = ""
+    def podule(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -5347,7 +5650,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Podule Search</h2>'
@@ -5383,14 +5686,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['podule']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -5405,16 +5707,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -5422,11 +5725,11 @@ class riscos:
     #enddef    
     
     @cherrypy.expose
-    def book(self, format="string", search=""):
-        content = ""
+    def book(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -5440,7 +5743,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Book Search</h2>'
@@ -5476,14 +5779,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['book']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -5498,16 +5800,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -5515,11 +5818,11 @@ class riscos:
     #enddef      
     
     @cherrypy.expose
-    def magazine(self, format="string", search=""):
-        content = ""
+    def magazine(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -5533,7 +5836,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Magazine Search</h2>'
@@ -5569,14 +5872,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['magazine']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -5591,16 +5893,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -5608,11 +5911,11 @@ class riscos:
     #enddef    
     
     @cherrypy.expose
-    def project(self, format="string", search=""):
-        content = ""
+    def project(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -5626,7 +5929,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Project Search</h2>'
@@ -5662,14 +5965,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['project']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -5684,16 +5986,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -5701,11 +6004,11 @@ class riscos:
     #enddef     
     
     @cherrypy.expose
-    def event(self, format="string", search=""):
-        content = ""
+    def event(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -5719,7 +6022,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Event Search</h2>'
@@ -5755,14 +6058,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['event']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -5777,16 +6079,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -5794,11 +6097,11 @@ class riscos:
     #enddef
     
     @cherrypy.expose
-    def video(self, format="string", search=""):
-        content = ""
+    def video(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -5812,7 +6115,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Video Search</h2>'
@@ -5844,14 +6147,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['video']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -5866,16 +6168,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -5883,11 +6186,11 @@ class riscos:
     #enddef 
     
     @cherrypy.expose
-    def dealer(self, format="string", search=""):
-        content = ""
+    def dealer(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -5901,7 +6204,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Dealer Search</h2>'
@@ -5937,14 +6240,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['dealer']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -5959,16 +6261,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -5976,11 +6279,11 @@ class riscos:
     #enddef 
     
     @cherrypy.expose
-    def developer(self, format="string", search=""):
-        content = ""
+    def developer(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -5994,7 +6297,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Developer Search</h2>'
@@ -6030,14 +6333,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['developer']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -6052,16 +6354,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -6069,11 +6372,11 @@ class riscos:
     #enddef 
     
     @cherrypy.expose
-    def forum(self, format="string", search=""):
-        content = ""
+    def forum(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -6087,7 +6390,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Forum Search</h2>'
@@ -6123,14 +6426,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['forum']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -6145,16 +6447,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -6166,7 +6469,7 @@ class riscos:
         content = ""
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -6180,7 +6483,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Error Message Search</h2>'
@@ -6243,7 +6546,7 @@ class riscos:
         content = ""
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -6257,7 +6560,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>FAQ Search</h2>'
@@ -6320,7 +6623,7 @@ class riscos:
         content = ""
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -6334,7 +6637,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>How-To Search</h2>'
@@ -6419,7 +6722,7 @@ class riscos:
         content = ""
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -6433,7 +6736,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Glossary Term Search</h2>'
@@ -6563,192 +6866,76 @@ class riscos:
         return content
     #enddef
     
-    @cherrypy.expose
-    def categorisation(self, primary="", secondary="", tertiary=""):
-        status = self.cookie_handling()
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
-        content = ""
-        content += self.header(status, 'index, follow')
-        content += '<h2>Categorisation</h2>'
+    def category_counts(self):
+        # Records per category path, as counted when the statistics were last materialised
+        categoryCounts = {}
+        statisticsDocument = self.statsCollection.find_one({'_id':'statistics'})
+        if not statisticsDocument or not statisticsDocument.has_key('categories'):
+            statisticsDocument = self.materialise_statistics()
+        #endif
+        for (categoryPath,count) in statisticsDocument['categories']:
+            categoryCounts[categoryPath] = count
+        #endfor
+        return categoryCounts
+    #enddef
+    
+    def category_url(self, categories):
+        params = {}
+        for (param,category) in zip(['primary','secondary','tertiary'], categories):
+            params[param] = category
+        #endfor
+        return '/riscos/categorisation?'+urllib.urlencode(params)
+    #enddef
+    
+    @cherrypy.expose
+    def categorisation(self, primary="", secondary="", tertiary="", page=1):
+        status = self.cookie_handling()
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
+        content = riscospage.riscospage()
+        content += self.header(status, 'index, follow')
+        content += '<h2>Categorisation</h2>'
         content += '<div id="introduction">'
-        if primary and secondary and tertiary:
-            content += '<h3><form class="inline" action="/riscos/categorisation?primary='+primary+'" method="post"><input class="button" type="submit" value="'+primary+'"></form> &rArr; <form class="inline" action="/riscos/categorisation?primary='+primary+'&secondary='+secondary+'" method="post"><input class="button" type="submit" value="'+secondary+'"></form> &rArr; '+tertiary+'</h3>'
-            for taxonomyEntry in self.taxonomy:
-                catPrimary = ""
-                catSecondary = ""
-                catTertiary = ""
-                catRegex = ""
-                if len(taxonomyEntry) == 4:
-                    [catPrimary,catSecondary,catTertiary,catRegex] = taxonomyEntry
-                    if catPrimary == primary and catSecondary == secondary and catTertiary == tertiary:
-                        searchCriteria = {}
-                        searchCriteria['help'] = re.compile(catRegex)
-                        doc_ids = self.riscosCollection.find(searchCriteria).distinct('_id')
-                        filteredDocIds = self.apply_filter(userDocument, doc_ids)
-                        if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                            content += self.display_document_table(filteredDocIds, 'categorisation', False)
-                        else:
-                            content += self.display_document_report(filteredDocIds, 'categorisation', False)
-                        #endif
-                        break
-                    #endif
-                #endif
+        selectedCategories = []
+        for category in [primary, secondary, tertiary]:
+            if not category:
+                break
+            #endif
+            selectedCategories.append(category)
+        #endfor
+        if selectedCategories:
+            content += '<h3>'
+            for i in range(len(selectedCategories)-1):
+                content += '<form class="inline" action="'+self.category_url(selectedCategories[:i+1])+'" method="post"><input class="button" type="submit" value="'+selectedCategories[i]+'"></form> &rArr; '
             #endfor
-        elif primary and secondary:
-            content += '<h3><form class="inline" action="/riscos/categorisation?primary='+primary+'" method="post"><input class="button" type="submit" value="'+primary+'"></form> &rArr; '+secondary+'</h3>'
-            distinctValues = []
-            catPrimaries = []
-            catSecondaries = []
-            catTertiaries = []
-            catRegexes = []
-            for taxonomyEntry in self.taxonomy:
-                distinctValue = ""
-                if len(taxonomyEntry) == 4:
-                    [catPrimary,catSecondary,catTertiary,catRegex] = taxonomyEntry
-                    if catPrimary == primary and catSecondary == secondary:                   
-                        catTertiaries.append(catTertiary)
-                    #endif
-                elif len(taxonomyEntry) == 3:
-                    [catPrimary,catSecondary,catRegex] = taxonomyEntry
-                    if catPrimary == primary and catSecondary == secondary:                   
-                        catRegexes.append(catRegex)
-                    #endif
-                #endif
-            #endfor            
-            if catTertiaries:
-                for taxonomyEntry in self.taxonomy:
-                    catPrimary = ""
-                    catSecondary = ""
-                    catTertiary = ""
-                    catRegex = ""
-                    distinctValue = ""
-                    if len(taxonomyEntry) == 4:
-                        [catPrimary,catSecondary,catTertiary,catRegex] = taxonomyEntry
-                        if catPrimary == primary and catSecondary == secondary:                   
-                            distinctValue = '<tr><td align="left"><form class="inline" action="/riscos/categorisation?primary='+primary+'&secondary='+secondary+'&tertiary='+catTertiary+'" method="post"><input class="button" type="submit" value="'+catTertiary+'"></form></td></tr>'
-                        #endif
-                    elif len(taxonomyEntry) == 3:
-                        [catPrimary,catSecondary,catRegex] = taxonomyEntry
-                        if catPrimary == primary and catSecondary == secondary:                   
-                            distinctValue = '<tr><td align="left">'+catRegex+'</td></tr>'
-                        #endif
-                    #endif
-                    if distinctValue and not distinctValue in distinctValues:
-                        distinctValues.append(distinctValue)
-                    #endif 
-                #endfor
-                content += '<table border="0">'
-                for distinctValue in distinctValues:
-                    content += distinctValue
-                #endfor
-                content += '</table>'
-            elif catRegexes:
-                for taxonomyEntry in self.taxonomy:
-                    catPrimary = ""
-                    catSecondary = ""
-                    catTertiary = ""
-                    catRegex = ""
-                    if len(taxonomyEntry) == 3:
-                        [catPrimary,catSecondary,catRegex] = taxonomyEntry
-                        if catPrimary == primary and catSecondary == secondary:
-                            searchCriteria = {}
-                            searchCriteria['help'] = re.compile(catRegex)
-                            doc_ids = self.riscosCollection.find(searchCriteria).distinct('_id')
-                            filteredDocIds = self.apply_filter(userDocument, doc_ids)
-                            if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                                content += self.display_document_table(filteredDocIds, 'categorisation', False)
-                            else:
-                                content += self.display_document_report(filteredDocIds, 'categorisation', False)
-                            #endif
-                            break
-                        #endif
-                    #endif
-                #endfor
-            #endif            
-        elif primary:
-            content += '<h3>'+primary+'</h3>'
-            distinctValues = []
-            catSecondaries = []
-            catRegexes = []
-            for taxonomyEntry in self.taxonomy:
-                distinctValue = ""
-                if len(taxonomyEntry) == 4:
-                    [catPrimary,catSecondary,catTertiary,catRegex] = taxonomyEntry
-                    if catPrimary == primary:                   
-                        catSecondaries.append(catSecondary)
-                    #endif
-                elif len(taxonomyEntry) == 3:
-                    [catPrimary,catSecondary,catRegex] = taxonomyEntry
-                    if catPrimary == primary:                   
-                        catSecondaries.append(catSecondary)
-                    #endif                    
-                elif len(taxonomyEntry) == 2:
-                    [catPrimary,catRegex] = taxonomyEntry
-                    if catPrimary == primary:                   
-                        catRegexes.append(catRegex)
-                    #endif
+            content += selectedCategories[-1]+'</h3>'
+        #endif
+        # The next level down from the selected categories, or the records in them if there is none
+        subcategories = []
+        for taxonomyEntry in self.riscosspider.taxonomy:
+            categories = taxonomyEntry[:-1]
+            if categories[:len(selectedCategories)] == selectedCategories and len(categories) > len(selectedCategories):
+                if not categories[len(selectedCategories)] in subcategories:
+                    subcategories.append(categories[len(selectedCategories)])
                 #endif
-            #endfor          
-            if catSecondaries:
-                for taxonomyEntry in self.taxonomy:
-                    catPrimary = ""
-                    catSecondary = ""
-                    catTertiary = ""
-                    catRegex = ""
-                    distinctValue = ""
-                    if len(taxonomyEntry) == 4:
-                        [catPrimary,catSecondary,catTertiary,catRegex] = taxonomyEntry
-                        if catPrimary == primary:                   
-                            distinctValue = '<tr><td align="left"><form class="inline" action="/riscos/categorisation?primary='+primary+'&secondary='+catSecondary+'" method="post"><input class="button" type="submit" value="'+catSecondary+'"></form></td></tr>'
-                        #endif
-                    elif len(taxonomyEntry) == 3:
-                        [catPrimary,catSecondary,catRegex] = taxonomyEntry
-                        if catPrimary == primary:                   
-                            distinctValue = '<tr><td align="left"><form class="inline" action="/riscos/categorisation?primary='+primary+'&secondary='+catSecondary+'" method="post"><input class="button" type="submit" value="'+catSecondary+'"></form></td></tr>'
-                        #endif
-                    #endif
-                    if distinctValue and not distinctValue in distinctValues:
-                        distinctValues.append(distinctValue)
-                    #endif 
-                #endfor
-                content += '<table border="0">'
-                for distinctValue in distinctValues:
-                    content += distinctValue
-                #endfor
-                content += '</table>'
-            elif catRegexes:
-                for taxonomyEntry in self.taxonomy:
-                    catPrimary = ""
-                    catRegex = ""
-                    if len(taxonomyEntry) == 2:
-                        [catPrimary,catRegex] = taxonomyEntry
-                        if catPrimary == primary:
-                            searchCriteria = {}
-                            searchCriteria['help'] = re.compile(catRegex)
-                            doc_ids = self.riscosCollection.find(searchCriteria).distinct('_id')
-                            filteredDocIds = self.apply_filter(userDocument, doc_ids)
-                            if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                                content += self.display_document_table(filteredDocIds, 'categorisation', False)
-                            else:
-                                content += self.display_document_report(filteredDocIds, 'categorisation', False)
-                            #endif
-                            break
-                        #endif
-                    #endif
-                #endfor
             #endif
-        else:
-            distinctValues = []     
-            for taxonomyEntry in self.taxonomy:
-                if not taxonomyEntry[0] in distinctValues:
-                    distinctValues.append(taxonomyEntry[0])
-                #endif
-            #endfor
+        #endfor
+        if subcategories:
+            categoryCounts = self.category_counts()
             content += '<table border="0">'
-            for distinctValue in distinctValues:
-                content += '<tr><td align="left"><form class="inline" action="/riscos/categorisation?primary='+distinctValue+'" method="post"><input class="button" type="submit" value="'+distinctValue+'"></form></td></tr>'
+            for subcategory in subcategories:
+                categoryPath = self.riscosspider.categorySeparator.join(selectedCategories+[subcategory])
+                content += '<tr><td align="left"><form class="inline" action="'+self.category_url(selectedCategories+[subcategory])+'" method="post"><input class="button" type="submit" value="'+subcategory+'"></form></td><td align="right">'+str(categoryCounts.get(categoryPath, 0))+'</td></tr>'
             #endfor
             content += '</table>'
+        elif selectedCategories:
+            searchCriteria = {}
+            searchCriteria['category_paths'] = self.riscosspider.categorySeparator.join(selectedCategories)
+            filteredDocIds = self.merge_filter_criteria(userDocument, searchCriteria)
+            if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
+                content += self.stream_document_table(filteredDocIds, 'categorisation', False)
+            else:
+                content += self.stream_document_report(filteredDocIds, 'categorisation', False)
+            #endif
         #endif
         content += '</div>'
         content += self.footer()
@@ -6756,11 +6943,11 @@ class riscos:
     #enddef
     
     @cherrypy.expose
-    def module(self, format="string", search=""):
-        content = ""
+    def module(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -6774,7 +6961,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif        
 
         content += '<h2>Relocatable Module Search</h2>'
@@ -6806,14 +6993,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['relocatable_modules.name']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -6828,16 +7014,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -6845,11 +7032,11 @@ class riscos:
     #enddef
     
     @cherrypy.expose
-    def monitor(self, format="string", search=""):
-        content = ""
+    def monitor(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -6863,7 +7050,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Monitor Definition File Search</h2>'
@@ -6895,14 +7082,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['monitor_definition_files']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -6917,16 +7103,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -6934,11 +7121,11 @@ class riscos:
     #enddef
     
     @cherrypy.expose
-    def service(self, format="string", search=""):
-        content = ""
+    def service(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -6952,7 +7139,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Service Search</h2>'
@@ -6988,14 +7175,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['provider']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -7010,16 +7196,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -7027,11 +7214,11 @@ class riscos:
     #enddef     
     
     @cherrypy.expose
-    def softwareinterrupt(self, format="string", search=""):
-        content = ""
+    def softwareinterrupt(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -7045,7 +7232,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>SoftWare Interrupt (SWI) Search</h2>'
@@ -7077,14 +7264,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['relocatable_modules.software_interrupts.name']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -7099,16 +7285,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -7116,11 +7303,11 @@ class riscos:
     #enddef     
     
     @cherrypy.expose
-    def starcommand(self, format="string", search=""):
-        content = ""
+    def starcommand(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -7134,7 +7321,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>* Command Search</h2>'
@@ -7166,14 +7353,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['relocatable_modules.star_commands.name']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -7188,16 +7374,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -7205,11 +7392,11 @@ class riscos:
     #enddef 
     
     @cherrypy.expose
-    def usergroup(self, format="string", search=""):
-        content = ""
+    def usergroup(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -7223,7 +7410,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>User Group Search</h2>'
@@ -7259,14 +7446,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['user_group']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -7281,16 +7467,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -7298,11 +7485,11 @@ class riscos:
     #enddef 
     
     @cherrypy.expose
-    def utility(self, format="string", search=""):
-        content = ""
+    def utility(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -7316,7 +7503,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif      
 
         content += '<h2>Utility Search</h2>'
@@ -7348,14 +7535,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['utilities.name']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -7370,16 +7556,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -7387,11 +7574,11 @@ class riscos:
     #enddef
     
     @cherrypy.expose
-    def printer(self, format="string", search=""):
-        content = ""
+    def printer(self, format="string", search="", page=1):
+        content = riscospage.riscospage()
         status = self.cookie_handling()
         content += self.header(status, 'index, nofollow')
-        userDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        userDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         epoch = int(time.time())
 
         if userDocument:
@@ -7405,7 +7592,7 @@ class riscos:
                 #endif
             #endif
             userDocument["last_visit"] = epoch
-            self.usersCollection.save(userDocument)
+            self.save_user_document(userDocument)
         #endif
 
         content += '<h2>Printer Definition File Search</h2>'
@@ -7437,14 +7624,13 @@ class riscos:
             if format == 'string':
                 search = re.escape(search)
             #endif
-            doc_ids = []
+            searchClauses = []
             attributesToSearch = ['printer_definition_files']
             for attributeToSearch in attributesToSearch:
                 searchCriteria = {}
                 try:
                     searchCriteria[attributeToSearch] = re.compile('(?i)'+search)
-                    doc_ids += self.riscosCollection.find(searchCriteria).distinct('_id')
-                    doc_ids = list(set(doc_ids))
+                    searchClauses.append(searchCriteria)
                 except:
                     content += "<h3 class=\"error\">Unlike Google, The RISC OS Search Engine uses Regular Expressions<br>Unfortunately, there is an error in `"+search+"`!"
                     for charToBeEscaped in ['\\','(',')','$','.','+']:
@@ -7459,16 +7645,17 @@ class riscos:
                 #endfor
             #endif
             
-            filteredDocIds = self.apply_filter(userDocument, doc_ids)
+            filteredDocIds = self.merge_filter_criteria(userDocument, {'$or':searchClauses})
 
             if userDocument and userDocument.has_key('view') and userDocument['view'] and userDocument['view'] == 'table':
-                content += self.display_document_table(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_table(filteredDocIds, 'generic_search', False)
             else:
-                content += self.display_document_report(filteredDocIds, 'generic_search', False)
+                content += self.stream_document_report(filteredDocIds, 'generic_search', False)
             #endif
             
-            if len(filteredDocIds) == 1:
-                content += self.display_dictionary_as_xml_and_json(filteredDocIds[0])
+            singleDocId = self.single_doc_id(filteredDocIds)
+            if singleDocId:
+                content += self.display_dictionary_as_xml_and_json(singleDocId)
             #endif
         #endif
         content += self.footer()
@@ -7498,7 +7685,7 @@ class riscos:
         content = ""
         content += self.header(status, 'noindex, nofollow')
         content += '<h2>Quarantine</h2>'
-        count = self.quarantineCollection.find().count()
+        count = self.get_site_statistics()['quarantined']
         if count:
             if count == 1:
                 content += '<p>Currently, there is '+str(count)+' record in quarantine!</p>'
@@ -8059,8 +8246,33 @@ class riscos:
         return content
     #enddef
        
+    def cached_feed(self, feed, generator, contentType):
+        # Regenerate a feed only when its counts change and answer conditional GETs with 304
+        feedCounts = self.get_site_statistics()['feed_counts']
+        if not self.feeds.has_key(feed) or self.feeds[feed]['counts'] != feedCounts:
+            content = generator(feedCounts)
+            self.feeds[feed] = {'counts':feedCounts,'content':content,'etag':'"'+hashlib.md5(content).hexdigest()+'"','last_modified':time.time()}
+        #endif
+        cachedFeed = self.feeds[feed]
+        cherrypy.response.headers['Content-Type'] = contentType
+        cherrypy.response.headers['ETag'] = cachedFeed['etag']
+        cherrypy.response.headers['Last-Modified'] = httputil.HTTPDate(cachedFeed['last_modified'])
+        cptools.validate_etags()
+        cptools.validate_since()
+        return cachedFeed['content']
+    #enddef
+    
     @cherrypy.expose
     def rssfeed(self):
+        return self.cached_feed('rss', self.generate_rssfeed, 'application/rss+xml')
+    #enddef
+    
+    @cherrypy.expose
+    def atomfeed(self):
+        return self.cached_feed('atom', self.generate_atomfeed, 'application/atom+xml')
+    #enddef
+    
+    def generate_rssfeed(self, feedCounts):
         content = ""
         content += '<?xml version="1.0" encoding="ISO-8859-1" ?>'
         content += '<rss version="2.0">'
@@ -8080,48 +8292,48 @@ class riscos:
         content += '<description>Follow development of The RISC OS Search Engine on GitHub!</description>'
         content += '</item>'        
         
-        apps = self.riscosCollection.find({'directory':{'$exists':True}}).distinct('directory')
+        apps = feedCounts['apps']
         if apps:
             content += '<item>'
-            content += '<title>The RISC OS Search Engine currently knows about '+str(len(apps))+' distinct RISC OS applications!</title>'
+            content += '<title>The RISC OS Search Engine currently knows about '+str(apps)+' distinct RISC OS applications!</title>'
             content += '<link>http://www.shalfield.com/riscos</link>'
-            content += '<description>The RISC OS Search Engine currently knows about '+str(len(apps))+' distinct RISC OS applications!</description>'
+            content += '<description>The RISC OS Search Engine currently knows about '+str(apps)+' distinct RISC OS applications!</description>'
             content += '</item>'
         #endif
         
-        modules = self.riscosCollection.find({'relocatable_modules.name':{'$exists':True}}).distinct('relocatable_modules.name')
+        modules = feedCounts['modules']
         if modules:
             content += '<item>'
-            content += '<title>The RISC OS Search Engine currently knows about '+str(len(modules))+' distinct RISC OS relocatable modules!</title>'
+            content += '<title>The RISC OS Search Engine currently knows about '+str(modules)+' distinct RISC OS relocatable modules!</title>'
             content += '<link>http://www.shalfield.com/riscos</link>'
-            content += '<description>The RISC OS Search Engine currently knows about '+str(len(modules))+' distinct RISC OS relocatable modules!</description>'
+            content += '<description>The RISC OS Search Engine currently knows about '+str(modules)+' distinct RISC OS relocatable modules!</description>'
             content += '</item>'
         #endif
         
-        utilities = self.riscosCollection.find({'utilities.name':{'$exists':True}}).distinct('utilities.name')
+        utilities = feedCounts['utilities']
         if modules:
             content += '<item>'
-            content += '<title>The RISC OS Search Engine currently knows about '+str(len(utilities))+' distinct RISC OS utilities!</title>'
+            content += '<title>The RISC OS Search Engine currently knows about '+str(utilities)+' distinct RISC OS utilities!</title>'
             content += '<link>http://www.shalfield.com/riscos</link>'
-            content += '<description>The RISC OS Search Engine currently knows about '+str(len(utilities))+' distinct RISC OS utilities!</description>'
+            content += '<description>The RISC OS Search Engine currently knows about '+str(utilities)+' distinct RISC OS utilities!</description>'
             content += '</item>'
         #endif
         
-        riscosXmlFiles = self.riscosCollection.find({'riscos_xml':{'$exists':True}}).distinct('riscos_xml')
-        if len(riscosXmlFiles) > 0 and len(riscosXmlFiles) < 100:
+        riscosXmlFiles = feedCounts['riscosXmlFiles']
+        if riscosXmlFiles > 0 and riscosXmlFiles < 100:
             content += '<item>'
             content += '<title>The RISC OS Search Engine needs your riscos.xml files!</title>'
             content += '<link>http://www.shalfield.com/riscos</link>'
-            content += '<description>The RISC OS Search Engine is currently able to read '+str(len(riscosXmlFiles))+' riscos.xml files but we need many more!</description>'
+            content += '<description>The RISC OS Search Engine is currently able to read '+str(riscosXmlFiles)+' riscos.xml files but we need many more!</description>'
             content += '</item>'
         #endif
 
-        glossaryTerms = self.riscosCollection.find({'glossary_term':{'$exists':True}}).distinct('glossary_term')
-        if len(glossaryTerms) > 0:
+        glossaryTerms = feedCounts['glossaryTerms']
+        if glossaryTerms > 0:
             content += '<item>'
-            content += '<title>The RISC OS Search Engine has '+str(len(glossaryTerms))+' RISC OS-related terms in its glossary!</title>'
+            content += '<title>The RISC OS Search Engine has '+str(glossaryTerms)+' RISC OS-related terms in its glossary!</title>'
             content += '<link>http://www.shalfield.com/riscos</link>'
-            content += '<description>The RISC OS Search Engine has '+str(len(glossaryTerms))+' RISC OS-related terms in its glossary!</description>'
+            content += '<description>The RISC OS Search Engine has '+str(glossaryTerms)+' RISC OS-related terms in its glossary!</description>'
             content += '</item>'
         #endif
         
@@ -8130,8 +8342,7 @@ class riscos:
         return content
     #enddef
     
-    @cherrypy.expose
-    def atomfeed(self):
+    def generate_atomfeed(self, feedCounts):
         content = ""
         content += '<?xml version="1.0" encoding="utf-8" ?>'
         content += '<feed xmlns="http://www.w3.org/2005/Atom">'
@@ -8151,48 +8362,48 @@ class riscos:
         content += '<summary>Follow development of The RISC OS Search Engine on GitHub!</summary>'
         content += '</entry>'        
         
-        apps = self.riscosCollection.find({'directory':{'$exists':True}}).distinct('directory')
+        apps = feedCounts['apps']
         if apps:
             content += '<entry>'
-            content += '<title>The RISC OS Search Engine currently knows about '+str(len(apps))+' distinct RISC OS applications!</title>'
+            content += '<title>The RISC OS Search Engine currently knows about '+str(apps)+' distinct RISC OS applications!</title>'
             content += '<link href="http://www.shalfield.com/riscos" />'
-            content += '<summary>The RISC OS Search Engine currently knows about '+str(len(apps))+' distinct RISC OS applications!</summary>'
+            content += '<summary>The RISC OS Search Engine currently knows about '+str(apps)+' distinct RISC OS applications!</summary>'
             content += '</entry>'
         #endif
         
-        modules = self.riscosCollection.find({'relocatable_modules.name':{'$exists':True}}).distinct('relocatable_modules.name')
+        modules = feedCounts['modules']
         if modules:
             content += '<entry>'
-            content += '<title>The RISC OS Search Engine currently knows about '+str(len(modules))+' distinct RISC OS relocatable modules!</title>'
+            content += '<title>The RISC OS Search Engine currently knows about '+str(modules)+' distinct RISC OS relocatable modules!</title>'
             content += '<link href="http://www.shalfield.com/riscos" />'
-            content += '<summary>The RISC OS Search Engine currently knows about '+str(len(modules))+' distinct RISC OS relocatable modules!</summary>'
+            content += '<summary>The RISC OS Search Engine currently knows about '+str(modules)+' distinct RISC OS relocatable modules!</summary>'
             content += '</entry>'
         #endif
         
-        utilities = self.riscosCollection.find({'utilities.name':{'$exists':True}}).distinct('utilities.name')
+        utilities = feedCounts['utilities']
         if modules:
             content += '<entry>'
-            content += '<title>The RISC OS Search Engine currently knows about '+str(len(utilities))+' distinct RISC OS utilities!</title>'
+            content += '<title>The RISC OS Search Engine currently knows about '+str(utilities)+' distinct RISC OS utilities!</title>'
             content += '<link href="http://www.shalfield.com/riscos" />'
-            content += '<summary>The RISC OS Search Engine currently knows about '+str(len(utilities))+' distinct RISC OS utilities!</summary>'
+            content += '<summary>The RISC OS Search Engine currently knows about '+str(utilities)+' distinct RISC OS utilities!</summary>'
             content += '</entry>'
         #endif
         
-        riscosXmlFiles = self.riscosCollection.find({'riscos_xml':{'$exists':True}}).distinct('riscos_xml')
-        if len(riscosXmlFiles) > 0 and len(riscosXmlFiles) < 100:
+        riscosXmlFiles = feedCounts['riscosXmlFiles']
+        if riscosXmlFiles > 0 and riscosXmlFiles < 100:
             content += '<entry>'
             content += '<title>The RISC OS Search Engine needs your riscos.xml files!</title>'
             content += '<link href="http://www.shalfield.com/riscos" />'
-            content += '<summary>The RISC OS Search Engine is currently able to read '+str(len(riscosXmlFiles))+' riscos.xml files but we need many more!</summary>'
+            content += '<summary>The RISC OS Search Engine is currently able to read '+str(riscosXmlFiles)+' riscos.xml files but we need many more!</summary>'
             content += '</entry>'
         #endif
 
-        glossaryTerms = self.riscosCollection.find({'glossary_term':{'$exists':True}}).distinct('glossary_term')
-        if len(glossaryTerms) > 0:
+        glossaryTerms = feedCounts['glossaryTerms']
+        if glossaryTerms > 0:
             content += '<entry>'
-            content += '<title>The RISC OS Search Engine has '+str(len(glossaryTerms))+' RISC OS-related terms in its glossary!</title>'
+            content += '<title>The RISC OS Search Engine has '+str(glossaryTerms)+' RISC OS-related terms in its glossary!</title>'
             content += '<link href="http://www.shalfield.com/riscos" />'
-            content += '<summary>The RISC OS Search Engine has '+str(len(glossaryTerms))+' RISC OS-related terms in its glossary!</summary>'
+            content += '<summary>The RISC OS Search Engine has '+str(glossaryTerms)+' RISC OS-related terms in its glossary!</summary>'
             content += '</entry>'
         #endif
         
@@ -8221,12 +8432,40 @@ class riscos:
     #enddef
     
     @cherrypy.expose
-    def synchronise(self):
-        content = ""
-        epoch = int(time.time())
-        # Returns all riscos documents scanned in the last 48 hours
-        if self.riscosCollection.find({'last_scanned':{'$gte':epoch-172800}}).count():
-            for document in self.riscosCollection.find({'last_scanned':{'$gte':epoch-172800}}):
+    def synchronise(self, since=0, limit=1000):
+        # Changes numbered after since, oldest first, with the current version of each upserted document
+        try:
+            since = int(since)
+            limit = min(max(int(limit), 1), self.changesBatchSize)
+        except:
+            since = 0
+            limit = self.changesBatchSize
+        #endtryexcept
+        changeDocuments = list(self.riscosspider.changesCollection.find({'_id':{'$gt':since}}).sort('_id', pymongo.ASCENDING).limit(limit+1))
+        more = len(changeDocuments) > limit
+        # Older gaps are changes superseded by a later change to the same document
+        previousSequence = since
+        for i in range(len(changeDocuments)):
+            if changeDocuments[i]['_id'] != previousSequence+1 and changeDocuments[i].get('timestamp', 0) >= int(time.time())-self.changesGracePeriod:
+                changeDocuments = changeDocuments[:i]
+                more = False
+                break
+            #endif
+            previousSequence = changeDocuments[i]['_id']
+        #endfor
+        changeDocuments = changeDocuments[:limit]
+        documentsById = {}
+        upsertedDocIds = [changeDocument['doc_id'] for changeDocument in changeDocuments if changeDocument['operation'] == 'upsert']
+        if upsertedDocIds:
+            for document in self.riscosCollection.find({'_id':{'$in':upsertedDocIds}}):
+                documentsById[document['_id']] = document
+            #endfor
+        #endif
+        changes = []
+        for changeDocument in changeDocuments:
+            okToSynchronise = False
+            if changeDocument['operation'] == 'upsert' and documentsById.has_key(changeDocument['doc_id']):
+                document = documentsById[changeDocument['doc_id']]
                 okToSynchronise = True
                 for urlKey in ['url','parent_url']:
                     if document.has_key(urlKey) and document[urlKey]:
@@ -8234,26 +8473,22 @@ class riscos:
                         if self.blacklisted_domains.has_key(netloc):
                             okToSynchronise = False
                         #endif
-                        if not self.trusted_domains.has_key(netloc):
-                            okToSynchronise = False
-                        #endif
                     #endif
                 #endfor
-                if okToSynchronise:
-                    content += '{\n'
-                    for key in document.keys():
-                        if key != '_id':
-                            try:
-                                content += "'"+key + "' : '" + str(document[key]) + "'\n"
-                            except:
-                                True
-                        #endif
-                    #endfor
-                    content += '}\n'
-                #endif
-            #endfor
+            #endif
+            if okToSynchronise:
+                changes.append({'sequence':changeDocument['_id'],'operation':'upsert','doc_id':changeDocument['doc_id'],'document':document})
+            else:
+                # Removed, since deleted or now blacklisted, so other mirrors drop their copy too
+                changes.append({'sequence':changeDocument['_id'],'operation':'remove','doc_id':changeDocument['doc_id']})
+            #endif
+        #endfor
+        nextSequence = since
+        if changeDocuments:
+            nextSequence = changeDocuments[-1]['_id']
         #endif
-        return content
+        cherrypy.response.headers['Content-Type'] = 'application/json'
+        return json.dumps({'changes':changes,'next':nextSequence,'more':more}, default=json_util.default, separators=(',',':'))
     #enddef
 
     @cherrypy.expose
@@ -8262,10 +8497,11 @@ class riscos:
         content = ""
         content += self.header(status, 'noindex, follow')
         content += '<h2>Spidering</h2>'
-        total = self.urlsCollection.find().count()
-        riscosXmlFiles = self.urlsCollection.find({'riscos_xml':{'$exists':True}}).count()
-        syndicatedFeeds = self.urlsCollection.find({'syndicated_feed':{'$exists':True}}).count()
-        zipFiles = self.urlsCollection.find({'zip_file':{'$exists':True}}).count()
+        siteStatistics = self.get_site_statistics()
+        total = siteStatistics['unprocessed_urls']
+        riscosXmlFiles = siteStatistics['riscos_xml_urls']
+        syndicatedFeeds = siteStatistics['syndicated_feed_urls']
+        zipFiles = siteStatistics['zip_file_urls']
         misc = total - (riscosXmlFiles + syndicatedFeeds + zipFiles)
         content += '<table class="software">'
         content += '<tr><th rowspan="2">Total<br>(Unprocessed URLs)</th><th colspan="4">Breakdown</th></tr>'
@@ -8291,6 +8527,150 @@ class riscos:
         return content
     #enddef
     
+    def aggregate(self, pipeline, collection=None):
+        # Older pymongo returns the command response, newer a cursor
+        if not collection:
+            collection = self.riscosCollection
+        #endif
+        results = collection.aggregate(pipeline)
+        if isinstance(results, dict):
+            results = results['result']
+        #endif
+        return list(results)
+    #enddef
+    
+    def materialise_statistics(self):
+        # Count everything shown on the statistics page server-side and store it as a single snapshot
+        statisticsDocument = {'_id':'statistics','rows':[],'arm_architectures':{},'categories':[],'generated':int(time.time())}
+        for (label,attribute,type,icon,criteria) in self.statisticsRows:
+            if type == 'string':
+                count = self.riscosCollection.find(criteria).count()
+            else:
+                # MongoDB before 3.2 fails on unwinding anything but a list, so only the list itself is unwound before
+                # grouping by the full path, with any stored as a single value grouped separately and the two merged
+                listAttribute = attribute.split('.')[0]
+                distinctValues = set()
+                pipelines = [[{'$match':criteria},{'$match':{listAttribute+'.0':{'$exists':True}}},{'$unwind':'$'+listAttribute}],
+                             [{'$match':criteria},{'$match':{listAttribute+'.0':{'$exists':False}}}]
+                            ]
+                for pipeline in pipelines:
+                    pipeline.append({'$group':{'_id':'$'+attribute}})
+                    for result in self.aggregate(pipeline):
+                        if result['_id'] != None:
+                            distinctValues.add(repr(result['_id']))
+                        #endif
+                    #endfor
+                #endfor
+                count = len(distinctValues)
+            #endif
+            statisticsDocument['rows'].append({'label':label,'icon':icon,'count':count})
+        #endfor
+        
+        # Apps per ARM architecture in one pass rather than one scan per architecture, again only unwinding lists
+        criteria = {'arm_architectures':{'$exists':True,'$ne':''},'directory':{'$exists':True,'$ne':''}}
+        pipelines = [[{'$match':criteria},
+                      {'$match':{'arm_architectures.0':{'$exists':True}}},
+                      {'$unwind':'$arm_architectures'},
+                      {'$group':{'_id':{'doc':'$_id','arm_architecture':'$arm_architectures'}}},
+                      {'$group':{'_id':'$_id.arm_architecture','count':{'$sum':1}}}
+                     ],
+                     [{'$match':criteria},
+                      {'$match':{'arm_architectures.0':{'$exists':False}}},
+                      {'$group':{'_id':'$arm_architectures','count':{'$sum':1}}}
+                     ]
+                    ]
+        for pipeline in pipelines:
+            for result in self.aggregate(pipeline):
+                if result['_id'] and isinstance(result['_id'], basestring):
+                    statisticsDocument['arm_architectures'][result['_id']] = statisticsDocument['arm_architectures'].get(result['_id'], 0) + result['count']
+                #endif
+            #endfor
+        #endfor
+        
+        # Records per taxonomy category path, as (path, count) pairs since paths may not be valid keys
+        pipeline = [{'$match':{'category_paths':{'$exists':True}}},
+                    {'$unwind':'$category_paths'},
+                    {'$group':{'_id':'$category_paths','count':{'$sum':1}}}
+                   ]
+        for result in self.aggregate(pipeline):
+            statisticsDocument['categories'].append([result['_id'],result['count']])
+        #endfor
+        
+        self.statsCollection.save(statisticsDocument)
+        return statisticsDocument
+    #enddef
+    
+    def log_query(self, term, format, results, latency):
+        # Queued rather than written, so logging adds no write to the search request
+        with self.queryLogLock:
+            self.queryLog.append({'term':term.strip(),'normalised':term.strip().lower(),'format':format,'timestamp':int(time.time()),'results':results,'latency':latency})
+        #endwith
+    #enddef
+    
+    def flush_query_log(self):
+        with self.queryLogLock:
+            queryLog = self.queryLog
+            self.queryLog = []
+        #endwith
+        if queryLog:
+            self.queryLogCollection.insert(queryLog)
+        #endif
+    #enddef
+    
+    def materialise_queries(self):
+        # Most frequent and slowest searches per window, stored in 'stats' for the index and queries pages
+        epoch = int(time.time())
+        for (window,textualWindow,period) in self.queryWindows:
+            pipeline = [{'$match':{'timestamp':{'$gte':epoch-period}}},
+                        {'$group':{'_id':{'normalised':'$normalised','format':'$format'},'term':{'$last':'$term'},'count':{'$sum':1},'results':{'$last':'$results'},'average_latency':{'$avg':'$latency'},'maximum_latency':{'$max':'$latency'}}}
+                       ]
+            queries = []
+            for result in self.aggregate(pipeline, self.queryLogCollection):
+                queries.append({'term':result['term'],'format':result['_id']['format'],'count':result['count'],'results':result['results'],'average_latency':result['average_latency'],'maximum_latency':result['maximum_latency']})
+            #endfor
+            popularQueries = sorted(queries, key=lambda query: (-query['count'], query['term'].lower()))[:self.queriesReported]
+            slowQueries = sorted(queries, key=lambda query: -query['average_latency'])[:self.queriesReported]
+            self.statsCollection.save({'_id':'queries_'+window,'popular':popularQueries,'slow':slowQueries,'generated':epoch})
+        #endfor
+        # The log only needs to cover the longest window
+        self.queryLogCollection.remove({'timestamp':{'$lt':epoch-self.queryWindows[-1][2]}})
+    #enddef
+    
+    def get_queries(self, window):
+        queriesDocument = self.statsCollection.find_one({'_id':'queries_'+window})
+        if not queriesDocument:
+            self.flush_query_log()
+            self.materialise_queries()
+            queriesDocument = self.statsCollection.find_one({'_id':'queries_'+window})
+        #endif
+        return queriesDocument
+    #enddef
+    
+    @cherrypy.expose
+    def queries(self):
+        status = self.cookie_handling()
+        content = ""
+        content += self.header(status, 'noindex, follow')
+        content += '<h2>Queries</h2>'
+        for (window,textualWindow,period) in self.queryWindows:
+            queriesDocument = self.get_queries(window)
+            for (key,textualKey) in [('popular','Popular Queries'),('slow','Slow Queries')]:
+                content += '<h3>'+textualKey+' During The '+textualWindow+'</h3>'
+                if queriesDocument and queriesDocument[key]:
+                    content += '<table class="software"><tr><th>Query</th><th>Format</th><th>Searches</th><th>Results</th><th>Average Time (ms)</th><th>Maximum Time (ms)</th></tr>'
+                    for query in queriesDocument[key]:
+                        content += '<tr><td><a href="/riscos/generic_search?'+urllib.urlencode({'format':query['format'].encode('utf-8'),'search':query['term'].encode('utf-8')})+'">'+cgi.escape(query['term'], True)+'</a></td><td>'+cgi.escape(query['format'], True)+'</td><td>'+str(query['count'])+'</td><td>'+str(query['results'])+'</td><td>'+str(int(query['average_latency']))+'</td><td>'+str(int(query['maximum_latency']))+'</td></tr>'
+                    #endfor
+                    content += '</table>'
+                else:
+                    content += '<p>No queries recorded.</p>'
+                #endif
+            #endfor
+        #endfor
+        content += self.footer()
+        return content
+    #enddef
+    
     @cherrypy.expose
     def statistics(self):
         status = self.cookie_handling()
@@ -8300,54 +8680,21 @@ class riscos:
         
         content += '<h3>Attributes</h3>'
 
-        rows = [('Absolutes','absolutes','list','ff8.png',{'absolutes':{"$exists":True,"$nin":["",[]]}}),
-                ('Apps','directory','string','app.png',{'directory':{"$exists":True,"$nin":["",[]]}}),
-                ('ARC Files','arc_file','string','',{'arc_file':{"$exists":True,"$nin":["",[]]}}),
-                ('Authors','author','list','',{'authors':{"$exists":True,"$nin":["",[]]}}),
-                ('Dealers','dealer','string','',{'dealer':{"$exists":True,"$nin":["",[]]}}),
-                ('Developers','developer','string','',{'developer':{"$exists":True,"$nin":["",[]]}}),
-                ('Filetypes','filetypes_run','list','',{'filetypes_run':{"$exists":True,"$nin":["",[]]}}),
-                ('Fonts','fonts','list','ff6.png',{'fonts':{"$exists":True,"$nin":["",[]]}}),
-                ('Forums','forum','string','',{'forum':{"$exists":True,"$nin":["",[]]}}),
-                ('Glossary Terms','glossary_term','string','',{'glossary_term':{"$exists":True,"$nin":["",[]]}}),
-                ('Maintainers','maintainer','string','',{'maintainer':{"$exists":True,"$nin":["",[]]}}),
-                ('Monitor Definition Files','monitor_definition_files','list','display.png',{'monitor_definition_files':{"$exists":True,"$nin":["",[]]}}),
-                ('Packages','package_name','string','package.png',{'package_name':{"$exists":True,"$nin":["",[]]}}),
-                ('Page Titles','page_title','string','',{'page_title':{"$exists":True,"$nin":["",[]]}}),
-                ('Portable Document Format Files','pdf_file','string','',{'pdf_file':{"$exists":True,"$nin":["",[]]}}),
-                ('Printer Definition Files','printer_definition_files','list','',{'printer_definition_files':{"$exists":True,"$nin":["",[]]}}),
-                ('Provider','provider','string','',{'provider':{"$exists":True,"$nin":["",[]]}}),
-                ('Relocatable Modules','relocatable_modules.name','list','ffa.png',{'relocatable_modules.name':{"$exists":True,"$nin":["",[]]}}),
-                ('Spark Files','spark_file','string','',{'spark_file':{"$exists":True,"$nin":["",[]]}}),
-                ('* Command','star_command','list','',{'star_command':{"$exists":True,"$nin":["",[]]}}),
-                ('System Variables','system_variables','list','',{'system_variables':{"$exists":True,"$nin":["",[]]}}),
-                ('Utilities','utilities.name','list','ffc.png',{'utilities.name':{"$exists":True,"$nin":["",[]]}}),
-                ('ZIP Files','zip_file','string','ddc.png',{'zip_file':{"$exists":True,"$nin":["",[]]}})
-               ]
+        statisticsDocument = self.statsCollection.find_one({'_id':'statistics'})
+        if not statisticsDocument:
+            statisticsDocument = self.materialise_statistics()
+        #endif
+        
         content += '<table id="searchcriteria"><tr>'
         noInRow = 0
-        for row in rows:
-            if row[3]:
-                content += '<th><img src="/riscos/images/'+row[3]+'" alt="'+row[3]+'"></th>'
+        for row in statisticsDocument['rows']:
+            if row['icon']:
+                content += '<th><img src="/riscos/images/'+row['icon']+'" alt="'+row['icon']+'"></th>'
             else:
                 content += '<th></th>'
             #endif
-            content += '<th>'+row[0]+'</th>'
-            if row[2] == 'string':
-                count = self.riscosCollection.find(row[4]).count()
-            elif row[2] == 'list':
-                distinctMembers = []
-                listOfLists = self.riscosCollection.find(row[4]).distinct(row[1])
-                for singleList in listOfLists:
-                    for listMember in singleList:
-                        if not listMember in distinctMembers:
-                            distinctMembers.append(listMember)
-                        #endif
-                    #endfor
-                #endfor
-                count = len(distinctMembers)
-            #endif
-            content += '<td align="right"><h2>'+str(count)+'</h2></td>'
+            content += '<th>'+row['label']+'</th>'
+            content += '<td align="right"><h2>'+str(row['count'])+'</h2></td>'
             noInRow += 1
             if noInRow == 3:
                 content += '</tr><tr>'
@@ -8366,11 +8713,9 @@ class riscos:
         content += '</tr><tr><th>Apps</th>'
         for (armArchitecture,modelsCovered) in self.armArchitectures:
             appsForArmArchitecture = 0
-            for document in self.riscosCollection.find({'arm_architectures':{'$exists':True,'$ne':''},'directory':{'$exists':True,'$ne':''}}):
-                if armArchitecture in document['arm_architectures']:
-                    appsForArmArchitecture += 1
-                #endif
-            #endfor
+            if statisticsDocument['arm_architectures'].has_key(armArchitecture):
+                appsForArmArchitecture = statisticsDocument['arm_architectures'][armArchitecture]
+            #endif
             content += '<td>'+str(appsForArmArchitecture)+'</td>'
         #endfor            
         content += '</tr></table>'
@@ -8384,44 +8729,18 @@ class riscos:
         content = ""
         content += self.header(status, 'index, nofollow')
         content += '<h2>Filetypes</h2>'
-        filetypesFound = []
-        filetypes = []
-        for field in ['filetypes_set','filetypes_run']:
-            documents = self.riscosCollection.find({field:{'$exists':True}})
-            for document in documents:
-                for filetype in document[field]:
-                    if filetype.__contains__(' '):
-                        (hex,textual) = filetype.split(' ')
-                        if not hex.upper() in filetypesFound and not (hex.upper(),textual) in filetypes:
-                            filetypesFound.append(hex.upper())
-                            filetypes.append((hex.upper(),textual))
-                        #endif
-                    else:
-                        if not hex.upper() in filetypesFound and not (filetype.upper(),'') in filetypes:
-                            filetypesFound.append(hex.upper())
-                            filetypes.append((filetype.upper(),''))
-                        #endif
-                    #endif
-                #endfor
-            #endfor
-        #endfor
-        filetypes.sort()
         content += '<table class="software"><tr><th>Hex</th><th>Textual</th><th>Applications</th></tr>'
-        for (hex,textual) in filetypes:
+        for filetypeDocument in self.filetypesCollection.find({}).sort('_id', pymongo.ASCENDING):
+            hex = filetypeDocument['_id']
+            textual = ""
+            if filetypeDocument.has_key('names') and filetypeDocument['names']:
+                textual = filetypeDocument['names'][0]
+            #endif
             content += '<tr><td><a href="/riscos/filetype?search='+hex+'">'+hex+'</a></td><td><a href="/riscos/filetype?search='+textual+'">'+textual+'</a></td><td>'
-            apps = []
-            for document in self.riscosCollection.find({'directory':{'$exists':True},'filetypes_set':{'$exists':True}}):
-                if hex+' '+textual in document['filetypes_set']:
-                    apps.append(document['directory'])
-                #endif
+            apps = self.filetype_applications(filetypeDocument, 'set')
+            for app in apps:
+                content += '<form class="inline" action="/riscos/app?search='+app+'" method="post"><input class="button" type="submit" value="'+app+'"></form> '
             #endfor
-            if apps:
-                apps = list(set(apps))
-                apps.sort()
-                for app in apps:
-                    content += '<form class="inline" action="/riscos/app?search='+app+'" method="post"><input class="button" type="submit" value="'+app+'"></form> '
-                #endfor
-            #endif
             content += '</td></tr>'
         #endfor
         content += '</table>'
@@ -8444,36 +8763,87 @@ class riscos:
                 content += '<tr><td>'+remoteUserAgent+'</td><td>'+str(count)+'</td></tr>'
             #endif
         #endfor
-        content += '</table></div></body>'
+        content += '</table>'
+        reaperDocument = self.statsCollection.find_one({'_id':'guest_reaper'})
+        if reaperDocument:
+            content += '<p>Expired guest sessions removed: '+str(reaperDocument['last_reaped'])+' at '+time.ctime(reaperDocument['last_run'])+', '+str(reaperDocument['total_reaped'])+' in total</p>'
+        #endif
+        content += '</div></body>'
         content += self.footer()
         return content
     #enddef
     
+    def background_task(self, task):
+        # CherryPy stops calling a Monitor back for good once it raises, so log the error and carry on next time
+        def run():
+            try:
+                task()
+            except:
+                cherrypy.log('Background task '+task.__name__+' failed', 'RISCOS', traceback=True)
+            #endtryexcept
+        #enddef
+        return run
+    #enddef
+    
+    def refresh_site_statistics(self):
+        # Recount everything into a new snapshot and swap it in whole, so readers never see a partial one
+        epoch = int(time.time())
+        siteStatistics = {}
+        # Get count of all URLs still to be spidered
+        siteStatistics['unprocessed_urls'] = self.urlsCollection.find().count()
+        siteStatistics['riscos_xml_urls'] = self.urlsCollection.find({'riscos_xml':{'$exists':True}}).count()
+        siteStatistics['syndicated_feed_urls'] = self.urlsCollection.find({'syndicated_feed':{'$exists':True}}).count()
+        siteStatistics['zip_file_urls'] = self.urlsCollection.find({'zip_file':{'$exists':True}}).count()
+        siteStatistics['rejected'] = self.rejectsCollection.find().count()
+        siteStatistics['quarantined'] = self.quarantineCollection.find().count()
+        siteStatistics['reserved'] = self.reservesCollection.find().count()
+        # Get count of all current URLs less than a year old
+        siteStatistics['processed_urls'] = self.riscosCollection.find({'url':{'$ne':['']},'last_scanned':{'$gte':epoch-31536000}}).count()
+        siteStatistics['members'] = len(self.usersCollection.find({"username":{"$exists":True,"$ne":""}}).distinct("username"))
+        siteStatistics['visitors_today'] = self.usersCollection.find({"session_id":{"$exists":True,"$ne":""},'last_visit':{'$gte':epoch-86400}}).count()
+        siteStatistics['members_today'] = len(self.usersCollection.find({"session_id":{"$exists":True,"$ne":""},"logged_on":{"$exists":True,"$ne":""},'last_visit':{'$gte':epoch-86400}}).distinct("logged_on"))
+        # Distinct counts announced in the RSS and Atom feeds
+        feedCounts = {}
+        feedCounts['apps'] = len(self.riscosCollection.find({'directory':{'$exists':True}}).distinct('directory'))
+        feedCounts['modules'] = len(self.riscosCollection.find({'relocatable_modules.name':{'$exists':True}}).distinct('relocatable_modules.name'))
+        feedCounts['utilities'] = len(self.riscosCollection.find({'utilities.name':{'$exists':True}}).distinct('utilities.name'))
+        feedCounts['riscosXmlFiles'] = len(self.riscosCollection.find({'riscos_xml':{'$exists':True}}).distinct('riscos_xml'))
+        feedCounts['glossaryTerms'] = len(self.riscosCollection.find({'glossary_term':{'$exists':True}}).distinct('glossary_term'))
+        siteStatistics['feed_counts'] = feedCounts
+        siteStatistics['refreshed'] = epoch
+        self.siteStatistics = siteStatistics
+    #enddef
+
+    def get_site_statistics(self):
+        # Only counted on the request path if the background refresh has not yet run
+        if not self.siteStatistics:
+            self.refresh_site_statistics()
+        #endif
+        return self.siteStatistics
+    #enddef
+
     def footer(self):
         content = "</div>"
-        epoch = int(time.time())
         
-        guestDocument = self.usersCollection.find_one({"session_id":self.sessionId})
+        guestDocument = self.get_user_document("session_id", cherrypy.request.sessionId)
         
-        # Get count of all URLs still to be spidered
-        unprocessedUrlCount = self.urlsCollection.find().count()
-        rejectedCount = self.rejectsCollection.find().count()
-        quarantinedCount = self.quarantineCollection.find().count()
-        reservedCount = self.reservesCollection.find().count()
-        # Get count of all current URLs less than a year old
-        processedUrlCount = self.riscosCollection.find({'url':{'$ne':['']},'last_scanned':{'$gte':epoch-31536000}}).count()
+        siteStatistics = self.get_site_statistics()
+        unprocessedUrlCount = siteStatistics['unprocessed_urls']
+        rejectedCount = siteStatistics['rejected']
+        quarantinedCount = siteStatistics['quarantined']
+        reservedCount = siteStatistics['reserved']
+        processedUrlCount = siteStatistics['processed_urls']
         
-        noOfMembers = len(self.usersCollection.find({"username":{"$exists":True,"$ne":""}}).distinct("username")) 
-        visitorsTodayCount = self.usersCollection.find({"session_id":{"$exists":True,"$ne":""},'last_visit':{'$gte':epoch-86400}}).count()
-        membersTodayCount = len(self.usersCollection.find({"session_id":{"$exists":True,"$ne":""},"logged_on":{"$exists":True,"$ne":""},'last_visit':{'$gte':epoch-86400}}).distinct("logged_on"))
-        guestsTodayCount = visitorsTodayCount - membersTodayCount
+        noOfMembers = siteStatistics['members']
+        membersTodayCount = siteStatistics['members_today']
+        guestsTodayCount = siteStatistics['visitors_today'] - membersTodayCount
         
         content += '<div id="footer_container">'
         content += '<div id="footer_contents"><form class="inline" action="/riscos/riscos_distributed_information_model" method="post"><input class="button" type="submit" value="RODIM" title="RISC OS Distributed Information Model"></form> <form class="inline" action="/riscos/riscos_markup_language" method="post"><input class="button" type="submit" value="ROML" title="RISC OS Markup Language"></form>'
         if guestDocument.has_key('member') and guestDocument['member']:
             content += '| <form class="inline" action="/riscos/submit_url" method="post"><input type="text" name="url"> <input class="button" type="submit" value="Submit URL"></form> '
         #endif
-        content += '| <form class="inline" action="/riscos/how_you_can_help" method="post"><input class="button" type="submit" value="How You Can Help" title="How You Can Help"></form> <form class="inline" action="/riscos/quarantine" method="post"><input class="button" type="submit" value="Quarantine" title="Gives details of quarantined records"></form> <form class="inline" action="/riscos/spidering" method="post"><input class="button" type="submit" value="Spidering"></form> <form class="inline" action="/riscos/statistics" method="post"><input class="button" type="submit" value="Statistics"></form> <form class="inline" action="/riscos/key" method="post"><input class="button" type="submit" value="Key"></form> <form class="inline" action="/riscos/visitors" method="post"><input class="button" type="submit" value="Visitors"></form> <form class="inline" action="/riscos/sourcecode" method="post"><input class="button" type="submit" value="Source Code"></form><br>'
+        content += '| <form class="inline" action="/riscos/how_you_can_help" method="post"><input class="button" type="submit" value="How You Can Help" title="How You Can Help"></form> <form class="inline" action="/riscos/quarantine" method="post"><input class="button" type="submit" value="Quarantine" title="Gives details of quarantined records"></form> <form class="inline" action="/riscos/spidering" method="post"><input class="button" type="submit" value="Spidering"></form> <form class="inline" action="/riscos/statistics" method="post"><input class="button" type="submit" value="Statistics"></form> <form class="inline" action="/riscos/queries" method="post"><input class="button" type="submit" value="Queries"></form> <form class="inline" action="/riscos/key" method="post"><input class="button" type="submit" value="Key"></form> <form class="inline" action="/riscos/visitors" method="post"><input class="button" type="submit" value="Visitors"></form> <form class="inline" action="/riscos/sourcecode" method="post"><input class="button" type="submit" value="Source Code"></form><br>'
         content += 'Source Code Copyright &copy; Rebecca Shalfield 2002-2013'
         content += ' | URLs - Processed: '+str(processedUrlCount)+', Unprocessed: '+str(unprocessedUrlCount)+', Quarantined: '+str(quarantinedCount)+', Reserved: '+str(reservedCount)+', Rejected: '+str(rejectedCount)
         content += ' | No. of Members: '+str(noOfMembers)+' |  Guests Today: '+str(guestsTodayCount)+' |  Members Today: '+str(membersTodayCount)+' | <a href="/riscos/rssfeed" title="RSS Feed"><img src="/riscos/images/rssfeed.png" alt="RSS Feed" border="0"></a> <a href="/riscos/atomfeed" title="ATOM Feed"><img src="/riscos/images/rssfeed.png" alt="ATOM Feed" border="0"></a></div>'
@@ -8482,1026 +8852,172 @@ class riscos:
         return content
     #enddef
 
+    def autocomplete_response(self, attributes, term):
+        # JSON list of suggestions as expected by the jQuery UI autocomplete widgets in riscos.js
+        return json.dumps(self.autocomplete.suggest(attributes, term))
+    #enddef
+
     @cherrypy.expose
     def search_absolute_autocomplete(self, term):
-        status = self.cookie_handling()
-        matches = []
-        for attribute in ['absolutes']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term   
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                if isinstance(document[attribute],list):
-                    for item in document[attribute]:
-                        if item.__contains__(term):
-                            matches += item
-                        #endif
-                    #endfor
-                elif isinstance(document[attribute],str):
-                    matches += document[attribute]
-                #endif
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['absolutes']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['absolutes'], term)
     #enddef
     
     @cherrypy.expose
     def search_app_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_app_autocomplete'
-        print term
-        
-        matches = []      
-        if term.startswith('!'):
-            distinctApps = self.riscosCollection.find({"directory":{"$exists":True,"$ne":""}}).distinct("directory")
-            for distinctApp in distinctApps:
-                if distinctApp.lower().startswith(term.lower()):
-                    matches.append(distinctApp)
-                #endif            
-            #endfor            
-        else:
-            for attribute in ['directory','application_name']:
-                searchCriteria = {}
-                searchCriteria[attribute] = term   
-                document = self.riscosCollection.find_one(searchCriteria)
-                if document:
-                    if isinstance(document[attribute],list):
-                        for item in document[attribute]:
-                            if item.__contains__(term):
-                                matches += item
-                            #endif
-                        #endfor
-                    elif isinstance(document[attribute],str):
-                        matches += document[attribute]
-                    #endif
-                #endif
-            #endfor
-        #endif            
-        if not matches:
-            for attribute in ['directory','application_name']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['directory','application_name'], term)
     #enddef
     
     @cherrypy.expose
     def search_errormessage_autocomplete(self, term):
-        status = self.cookie_handling()
-        matches = []      
-        for attribute in ['error_message']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['error_message']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['error_message'], term)
     #enddef
     
     @cherrypy.expose
     def search_event_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_event_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['event']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['event']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['event'], term)
     #enddef
     
     @cherrypy.expose
     def search_computer_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_computer_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['computer']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['computer']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['computer'], term)
     #enddef
     
     @cherrypy.expose
     def search_font_autocomplete(self, term):
-        status = self.cookie_handling()
-        matches = []
-        for attribute in ['fonts']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term   
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                if isinstance(document[attribute],list):
-                    for item in document[attribute]:
-                        if item.__contains__(term):
-                            matches += item
-                        #endif
-                    #endfor
-                elif isinstance(document[attribute],str):
-                    matches += document[attribute]
-                #endif
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['fonts']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['fonts'], term)
     #enddef
     
     @cherrypy.expose
     def search_filetype_autocomplete(self, term):
-        status = self.cookie_handling()
-        matches = []
-        for attribute in ['filetypes_set','filetypes_run']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term   
-            distinctFiletypes = self.riscosCollection.find(searchCriteria).distinct(attribute)
-            for distinctFiletype in distinctFiletypes:
-                if distinctFiletype.lower().__contains__(term.lower()):
-                    matches.append(distinctFiletype)
-                #endif
-            #endfor
-        #endfor           
-        if not matches:
-            for attribute in ['filetypes_set','filetypes_run']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                distinctFiletypes = self.riscosCollection.find(searchCriteria).distinct(attribute)
-                for distinctFiletype in distinctFiletypes:
-                    if distinctFiletype.lower().__contains__(term.lower()):
-                        matches.append(distinctFiletype)
-                    #endif
-                #endfor
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['filetypes_set','filetypes_run'], term)
     #enddef
     
     @cherrypy.expose
     def search_dealer_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_dealer_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['dealer']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['dealer']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['dealer'], term)
     #enddef
     
     @cherrypy.expose
     def search_developer_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_developer_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['developer']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['developer']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
-    #enddef 
+        return self.autocomplete_response(['developer'], term)
+    #enddef
     
     @cherrypy.expose
     def search_forum_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_forum_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['forum']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['forum']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['forum'], term)
     #enddef
     
     @cherrypy.expose
     def search_video_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_video_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['video']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['video']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
-    #enddef  
+        return self.autocomplete_response(['video'], term)
+    #enddef
 
     @cherrypy.expose
     def search_softwareinterrupt_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_softwareinterrupt_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['relocatable_modules.software_interrupts.name']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['relocatable_modules.software_interrupts.name']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
-    #enddef 
+        return self.autocomplete_response(['relocatable_modules.software_interrupts.name'], term)
+    #enddef
     
     @cherrypy.expose
     def search_starcommand_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_starcommand_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['relocatable_modules.star_commands.name']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['relocatable_modules.star_commands.name']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
-    #enddef 
+        return self.autocomplete_response(['relocatable_modules.star_commands.name'], term)
+    #enddef
     
     @cherrypy.expose
     def search_service_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_service_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['provider']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['provider']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
-    #enddef     
+        return self.autocomplete_response(['provider'], term)
+    #enddef
     
     @cherrypy.expose
     def search_faq_autocomplete(self, term):
-        status = self.cookie_handling()
-        matches = []      
-        for attribute in ['question']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['question']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
-    #enddef    
+        return self.autocomplete_response(['question'], term)
+    #enddef
     
     @cherrypy.expose
     def search_howto_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_howto_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['howto']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['howto']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
-    #enddef     
+        return self.autocomplete_response(['howto'], term)
+    #enddef
     
     @cherrypy.expose
     def search_glossary_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_glossary_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['glossary_term']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['glossary_term']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['glossary_term'], term)
     #enddef
     
     @cherrypy.expose
     def search_module_autocomplete(self, term):
-        status = self.cookie_handling()
-        matches = []
-        for attribute in ['relocatable_modules.name','module_dependencies.name']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term   
-            distinctModules = self.riscosCollection.find(searchCriteria).distinct(attribute)
-            for distinctModule in distinctModules:
-                if distinctModule.lower().__contains__(term.lower()):
-                    matches.append(distinctModule)
-                #endif
-            #endfor
-        #endfor           
-        if not matches:
-            for attribute in ['relocatable_modules.name','module_dependencies.name']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                distinctModules = self.riscosCollection.find(searchCriteria).distinct(attribute)
-                for distinctModule in distinctModules:
-                    if distinctModule.lower().__contains__(term.lower()):
-                        matches.append(distinctModule)
-                    #endif
-                #endfor
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['relocatable_modules.name','module_dependencies.name'], term)
     #enddef
     
     @cherrypy.expose
     def search_monitor_autocomplete(self, term):
-        status = self.cookie_handling()
-        matches = []
-        for attribute in ['monitor_definition_files']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term
-            distinctMonitors = self.riscosCollection.find(searchCriteria).distinct(attribute)
-            for distinctMonitor in distinctMonitors:
-                if distinctMonitor.lower().__contains__(term.lower()):
-                    matches.append(distinctMonitor)
-                #endif
-            #endfor
-        #endfor           
-        if not matches:
-            for attribute in ['monitor_definition_files']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                distinctMonitors = self.riscosCollection.find(searchCriteria).distinct(attribute)
-                for distinctMonitor in distinctMonitors:
-                    if distinctMonitor.lower().__contains__(term.lower()):
-                        matches.append(distinctMonitor)
-                    #endif
-                #endfor
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['monitor_definition_files'], term)
     #enddef
     
     @cherrypy.expose
     def search_podule_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_podule_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['podule']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['podule']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['podule'], term)
     #enddef
     
     @cherrypy.expose
     def search_printer_autocomplete(self, term):
-        status = self.cookie_handling()
-        matches = []
-        for attribute in ['printer_definition_files']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term   
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                if isinstance(document[attribute],list):
-                    for item in document[attribute]:
-                        if item.__contains__(term):
-                            matches += item
-                        #endif
-                    #endfor
-                elif isinstance(document[attribute],str):
-                    matches += document[attribute]
-                #endif
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['printer_definition_files']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['printer_definition_files'], term)
     #enddef
     
     @cherrypy.expose
     def search_peripheral_autocomplete(self, term):
-        status = self.cookie_handling()
-        matches = []
-        for attribute in ['peripheral']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term   
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                if isinstance(document[attribute],list):
-                    for item in document[attribute]:
-                        if item.__contains__(term):
-                            matches += item
-                        #endif
-                    #endfor
-                elif isinstance(document[attribute],str):
-                    matches += document[attribute]
-                #endif
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['peripheral']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['peripheral'], term)
     #enddef
     
     @cherrypy.expose
     def search_project_autocomplete(self, term):
-        status = self.cookie_handling()
-        matches = []
-        for attribute in ['project']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term   
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                if isinstance(document[attribute],list):
-                    for item in document[attribute]:
-                        if item.__contains__(term):
-                            matches += item
-                        #endif
-                    #endfor
-                elif isinstance(document[attribute],str):
-                    matches += document[attribute]
-                #endif
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['project']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['project'], term)
     #enddef
     
     @cherrypy.expose
     def search_book_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_book_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['book']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['book']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
-    #enddef    
+        return self.autocomplete_response(['book'], term)
+    #enddef
     
     @cherrypy.expose
     def search_magazine_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_magazine_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['magazine']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['magazine']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['magazine'], term)
     #enddef
     
     @cherrypy.expose
     def search_usergroup_autocomplete(self, term):
-        status = self.cookie_handling()
-        
-        print 'search_usergroup_autocomplete'
-        print term
-        
-        matches = []      
-        for attribute in ['user_group']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term  
-            document = self.riscosCollection.find_one(searchCriteria)
-            if document:
-                matches += document[attribute]
-            #endif
-        #endfor           
-        if not matches:
-            for attribute in ['user_group']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['user_group'], term)
     #enddef
     
     @cherrypy.expose
     def search_utility_autocomplete(self, term):
-        status = self.cookie_handling()
-        matches = []
-        for attribute in ['utilities.name']:
-            searchCriteria = {}
-            searchCriteria[attribute] = term
-            distinctUtilities = self.riscosCollection.find(searchCriteria).distinct(attribute)
-            for distinctUtility in distinctUtilities:
-                if distinctUtility.lower().__contains__(term.lower()):
-                    matches.append(distinctUtility)
-                #endif
-            #endfor
-        #endfor           
-        if not matches:
-            for attribute in ['utilities.name']:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                distinctUtilities = self.riscosCollection.find(searchCriteria).distinct(attribute)
-                for distinctUtility in distinctUtilities:
-                    if distinctUtility.lower().__contains__(term.lower()):
-                        matches.append(distinctUtility)
-                    #endif
-                #endfor
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(['utilities.name'], term)
     #enddef
     
     @cherrypy.expose
     def search_autocomplete(self, term):
-        status = self.cookie_handling()
-        attributesToSearch = []
-        for (externalAttribute,internalAttribute,key) in self.searchableAttributes:
-            attributesToSearch.append(internalAttribute)
-        #endfor
-        matches = []      
-        if term.startswith('!'):
-            distinctApps = self.riscosCollection.find({"directory":{"$exists":True,"$ne":""}}).distinct("directory")
-            for distinctApp in distinctApps:
-                if distinctApp.lower().startswith(term.lower()):
-                    matches.append(distinctApp)
-                #endif            
-            #endfor            
-        else:
-            for attribute in attributesToSearch:
-                searchCriteria = {}
-                searchCriteria[attribute] = term   
-                document = self.riscosCollection.find_one(searchCriteria)
-                if document:
-                    if isinstance(document[attribute],list):
-                        for item in document[attribute]:
-                            if item.__contains__(term):
-                                matches += item
-                            #endif
-                        #endfor
-                    elif isinstance(document[attribute],str):
-                        matches += document[attribute]
-                    #endif
-                #endif
-            #endfor
-        #endif            
-        if not matches:
-            for attribute in attributesToSearch:
-                searchCriteria = {}
-                searchCriteria[attribute] = re.compile('(?i)'+term)     
-                matches += self.riscosCollection.find(searchCriteria).limit(3).distinct(attribute)
-            #endfor
-        #endif
-        content = '['
-        for i in range(len(matches)):
-            content += '"'+matches[i].replace('"','\\"')+'"'
-            if i < len(matches)-1:
-                content += ','
-            #endif
-        #endfor
-        content += ']'
-        return content
+        return self.autocomplete_response(self.autocompleteAttributes, term)
     #enddef
     
 #endclass
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
-conf = { '/'           : { 'tools.staticdir.root'      : current_dir },
+conf = { '/'           : { 'tools.staticdir.root'      : current_dir,
+                           'tools.gzip.on'             : True,
+                           'tools.gzip.mime_types'     : ['text/html','text/plain','text/xml','text/css','text/javascript','application/javascript','application/json','application/rss+xml','application/atom+xml'],
+                           'tools.response_headers.on' : True,
+                           'tools.response_headers.headers' : [('Cache-Control','private, no-cache')]
+                         },
          '/riscos.css' : { 'tools.staticfile.on'       : True,
-                           'tools.staticfile.filename' : current_dir + os.sep + 'riscos.css'
+                           'tools.staticfile.filename' : current_dir + os.sep + 'riscos.css',
+                           'tools.expires.on'          : True,
+                           'tools.expires.secs'        : 31536000,
+                           'tools.expires.force'       : True
                          },
          '/riscos.js' : { 'tools.staticfile.on'        : True,
-                           'tools.staticfile.filename' : current_dir + os.sep + 'riscos.js'
+                           'tools.staticfile.filename' : current_dir + os.sep + 'riscos.js',
+                           'tools.expires.on'          : True,
+                           'tools.expires.secs'        : 31536000,
+                           'tools.expires.force'       : True
                          },
          '/riscos.xml' : { 'tools.staticfile.on'        : True,
                            'tools.staticfile.filename' : current_dir + os.sep + 'riscos.xml'
@@ -9516,14 +9032,30 @@ conf = { '/'           : { 'tools.staticdir.root'      : current_dir },
                            'tools.staticdir.dir'       : 'riscosxml'
                          },
          '/images'     : { 'tools.staticdir.on'        : True,
-                           'tools.staticdir.dir'       : 'images'
+                           'tools.staticdir.dir'       : 'images',
+                           'tools.expires.on'          : True,
+                           'tools.expires.secs'        : 86400,
+                           'tools.expires.force'       : True
                          },
          '/downloads'  : { 'tools.staticdir.on'        : True,
                            'tools.staticdir.dir'       : 'downloads'
                          },
          '/jquery-ui-1.8.21.custom' : { 'tools.staticdir.on'        : True,
-                                        'tools.staticdir.dir'       : current_dir + os.sep + 'jquery-ui-1.8.21.custom'
+                                        'tools.staticdir.dir'       : current_dir + os.sep + 'jquery-ui-1.8.21.custom',
+                                        'tools.expires.on'          : True,
+                                        'tools.expires.secs'        : 31536000,
+                                        'tools.expires.force'       : True
                                       }
        }
 
+# Mostly static pages still show the visitor's header, so rather than being cached they are revalidated by ETag
+for revalidatedPage in ['introduction','key','riscos_distributed_information_model','riscos_markup_language','how_you_can_help']:
+    conf['/'+revalidatedPage] = {'tools.etags.on' : True, 'tools.etags.autotags' : True}
+#endfor
+
+# Result pages are sent a row at a time rather than built up in full before the first byte goes out
+for streamedPage in ['view_watchlist','randomapp','generic_search','advanced_search','absolute','app','filetype','font','computer','peripheral','podule','book','magazine','project','event','video','dealer','developer','forum','categorisation','module','monitor','service','softwareinterrupt','starcommand','usergroup','utility','printer']:
+    conf['/'+streamedPage] = {'response.stream' : True}
+#endfor
+
 cherrypy.tree.mount(riscos(), '/riscos', config=conf)
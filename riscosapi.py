@@ -0,0 +1,162 @@
+# JSON Search API For The RISC OS Search Engine
+# Developed by Rebecca Shalfield for The RISC OS Community
+# Copyright (c) Rebecca Shalfield 2002-2013
+
+import cherrypy, json, re
+from bson import ObjectId
+
+class riscosapi:
+
+    def __init__(self, riscos):
+        '''Initialisation settings'''
+
+        # The site itself, for its collections, filter criteria and search index
+        self.riscos = riscos
+
+        # Results returned per call unless a smaller limit is asked for
+        self.defaultLimit = 32
+        self.maximumLimit = 100
+
+        # Query parameters mirroring the attributes of a user document read by get_filter_criteria
+        self.filterParameters = ['riscos_version','addressing_mode','arm_architecture','territory','start_year','end_year']
+    #enddef
+
+    def response(self, result, status=200):
+        cherrypy.response.status = status
+        cherrypy.response.headers['Content-Type'] = 'application/json'
+        return json.dumps(result, default=str, separators=(',',':'))
+    #enddef
+
+    def object_ids(self, docIds):
+        # In the order given, less duplicates and anything not an ObjectId
+        objectIds = []
+        seenObjectIds = set()
+        for docId in docIds:
+            try:
+                objectId = ObjectId(docId)
+                if not objectId in seenObjectIds:
+                    seenObjectIds.add(objectId)
+                    objectIds.append(objectId)
+                #endif
+            except:
+                True
+        #endfor
+        return objectIds
+    #enddef
+
+    def projection(self, fields):
+        # None returns whole documents, otherwise just the comma-separated attributes asked for
+        if fields:
+            return [field.strip() for field in fields.split(',') if field.strip()]
+        #endif
+        return None
+    #enddef
+
+    def load_documents(self, objectIds, fields):
+        # Documents in the order of objectIds, leaving out any that no longer exist
+        documentsById = {}
+        if objectIds:
+            for document in self.riscos.riscosCollection.find({'_id':{'$in':objectIds}}, self.projection(fields)):
+                documentsById[document['_id']] = document
+            #endfor
+        #endif
+        documents = []
+        for objectId in objectIds:
+            if documentsById.has_key(objectId):
+                documents.append(documentsById[objectId])
+            #endif
+        #endfor
+        return documents
+    #enddef
+
+    def get_limit(self, limit):
+        try:
+            return min(max(int(limit), 1), self.maximumLimit)
+        except:
+            return self.defaultLimit
+        #endtryexcept
+    #enddef
+
+    @cherrypy.expose
+    def search(self, search='', format='string', fields='', cursor='', limit=32, **filterSettings):
+        # Matching documents in _id order, a page at a time, resuming after the _id given as the cursor; the total
+        # is only counted for the first page, so later pages just read the next few documents from the _id index
+        if not search:
+            return self.response({'error':'No search given'}, 400)
+        #endif
+        filterDocument = {}
+        for parameter in self.filterParameters:
+            if filterSettings.has_key(parameter) and filterSettings[parameter]:
+                filterDocument[parameter] = filterSettings[parameter]
+            #endif
+        #endfor
+        # The site's filter quietly ignores a year it can't read, so the API reports it instead
+        for parameter in ['start_year','end_year']:
+            if filterDocument.has_key(parameter):
+                try:
+                    int(filterDocument[parameter])
+                except:
+                    return self.response({'error':'Invalid '+parameter}, 400)
+                #endtryexcept
+            #endif
+        #endfor
+        if format == 'string' and self.riscos.riscosspider.tokenise(search) and self.riscos.riscosspider.searchIndexCollection.find_one():
+            criteria = {'_id':{'$in':self.object_ids(self.riscos.riscosspider.search_index_lookup(search))}}
+        else:
+            if format == 'string':
+                search = re.escape(search)
+            #endif
+            try:
+                pattern = re.compile('(?i)'+search)
+            except:
+                return self.response({'error':'Invalid regular expression'}, 400)
+            #endtryexcept
+            clauses = []
+            for (externalAttribute,internalAttribute,key) in self.riscos.searchableAttributes:
+                if internalAttribute in ['relocatable_modules','module_dependencies','utilities']:
+                    clauses.append({internalAttribute+'.name':pattern})
+                else:
+                    clauses.append({internalAttribute:pattern})
+                #endif
+            #endfor
+            criteria = {'$or':clauses}
+        #endif
+        criteria = self.riscos.merge_filter_criteria(filterDocument, criteria)
+        result = {}
+        if cursor:
+            try:
+                criteria = {'$and':[criteria,{'_id':{'$gt':ObjectId(cursor)}}]}
+            except:
+                return self.response({'error':'Invalid cursor'}, 400)
+            #endtryexcept
+        else:
+            result['total'] = self.riscos.riscosCollection.find(criteria).count()
+        #endif
+        # One more than the limit, to tell whether there is a further page
+        limit = self.get_limit(limit)
+        documents = list(self.riscos.riscosCollection.find(criteria, self.projection(fields)).sort('_id', 1).limit(limit+1))
+        result['next_cursor'] = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            result['next_cursor'] = str(documents[-1]['_id'])
+        #endif
+        result['results'] = documents
+        return self.response(result)
+    #enddef
+
+    @cherrypy.expose
+    def record(self, doc_id='', fields=''):
+        documents = self.load_documents(self.object_ids([doc_id]), fields)
+        if not documents:
+            return self.response({'error':'No such record'}, 404)
+        #endif
+        return self.response(documents[0])
+    #enddef
+
+    @cherrypy.expose
+    def records(self, ids='', fields=''):
+        objectIds = self.object_ids(ids.split(','))[:self.maximumLimit]
+        return self.response({'results':self.load_documents(objectIds, fields)})
+    #enddef
+
+#endclass
@@ -0,0 +1,193 @@
+# In-Memory Autocomplete Suggestions For The RISC OS Search Engine
+# Developed by Rebecca Shalfield for The RISC OS Community
+# Copyright (c) Rebecca Shalfield 2002-2013
+
+import bisect, calendar, cherrypy, threading, time
+
+class riscosautocomplete:
+
+    def __init__(self, riscosCollection, searchIndexCollection, attributes):
+        '''Initialisation settings'''
+
+        self.riscosCollection = riscosCollection
+
+        # The spider stamps each search index entry with the time it was last updated
+        self.searchIndexCollection = searchIndexCollection
+
+        # Attributes, possibly dotted paths into subdocuments, for which suggestions are kept
+        self.attributes = []
+        for attribute in attributes:
+            if not attribute in self.attributes:
+                self.attributes.append(attribute)
+            #endif
+        #endfor
+        self.fields = []
+        for attribute in self.attributes:
+            if not attribute.split('.')[0] in self.fields:
+                self.fields.append(attribute.split('.')[0])
+            #endif
+        #endfor
+
+        # Per attribute, a sorted list of (lowercased value, value) for bisecting and a count of documents per value
+        self.keys = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+        self.lastRefresh = 0
+        self.lastRebuild = 0
+        self.refreshing = False
+        self.rebuildInterval = 86400
+        self.maximumScan = 1000
+    #enddef
+
+    def start(self):
+        # Build in the background so the engine does not wait on a full collection scan
+        thread = threading.Thread(target=self.refresh)
+        thread.setDaemon(True)
+        thread.start()
+    #enddef
+
+    def values(self, value, path):
+        # All non-empty strings found at a dotted path, descending into lists and subdocuments
+        values = []
+        if isinstance(value, list):
+            for item in value:
+                values += self.values(item, path)
+            #endfor
+        elif path:
+            if isinstance(value, dict) and value.has_key(path[0]):
+                values += self.values(value[path[0]], path[1:])
+            #endif
+        elif isinstance(value, basestring):
+            value = value.strip()
+            if value:
+                values.append(value)
+            #endif
+        #endif
+        return values
+    #enddef
+
+    def refresh(self):
+        # Called by both the start-up thread and the Monitor, so a refresh still running is left to finish
+        with self.lock:
+            if self.refreshing:
+                return
+            #endif
+            self.refreshing = True
+        #endwith
+        try:
+            epoch = int(time.time())
+            if not self.lastRebuild or epoch-self.lastRebuild >= self.rebuildInterval:
+                self.rebuild()
+            else:
+                self.update()
+            #endif
+        except:
+            # The Monitor would otherwise stop calling back for good
+            cherrypy.log('Unable to refresh autocomplete suggestions', 'RISCOS', traceback=True)
+        #endtryexcept
+        self.refreshing = False
+    #enddef
+
+    def rebuild(self):
+        # Recount every value from scratch, picking up any removed since the last rebuild
+        epoch = int(time.time())
+        counts = {}
+        for attribute in self.attributes:
+            counts[attribute] = {}
+        #endfor
+        for document in self.riscosCollection.find({}, self.fields):
+            for attribute in self.attributes:
+                for value in set(self.values(document, attribute.split('.'))):
+                    counts[attribute][value] = counts[attribute].get(value, 0) + 1
+                #endfor
+            #endfor
+        #endfor
+        keys = {}
+        for attribute in self.attributes:
+            keys[attribute] = sorted([(value.lower(), value) for value in counts[attribute]])
+        #endfor
+        with self.lock:
+            self.keys = keys
+            self.counts = counts
+        #endwith
+        self.lastRefresh = epoch
+        self.lastRebuild = epoch
+    #enddef
+
+    def update(self):
+        # Add the values of documents the spider has inserted or updated since the last refresh
+        epoch = int(time.time())
+        docIds = self.searchIndexCollection.find({'updated':{'$gte':self.lastRefresh}}).distinct('_id')
+        for i in range(0, len(docIds), 1000):
+            for document in self.riscosCollection.find({'_id':{'$in':docIds[i:i+1000]}}, self.fields):
+                # Values of a document inserted since the last refresh are counted again; those of an updated one
+                # may already have been, so only its new values are added until the next rebuild recounts them
+                inserted = calendar.timegm(document['_id'].generation_time.utctimetuple()) >= self.lastRefresh
+                with self.lock:
+                    for attribute in self.attributes:
+                        if not self.counts.has_key(attribute):
+                            continue
+                        #endif
+                        for value in set(self.values(document, attribute.split('.'))):
+                            if not self.counts[attribute].has_key(value):
+                                self.counts[attribute][value] = 1
+                                bisect.insort(self.keys[attribute], (value.lower(), value))
+                            elif inserted:
+                                self.counts[attribute][value] += 1
+                            #endif
+                        #endfor
+                    #endfor
+                #endwith
+            #endfor
+        #endfor
+        self.lastRefresh = epoch
+    #enddef
+
+    def suggest(self, attributes, term, limit=20):
+        # Values starting with the term, most common first; failing that, values merely containing it
+        term = term.strip().lower()
+        if not term:
+            return []
+        #endif
+        matches = {}
+        with self.lock:
+            for attribute in attributes:
+                if not self.keys.has_key(attribute):
+                    continue
+                #endif
+                keys = self.keys[attribute]
+                start = bisect.bisect_left(keys, (term,))
+                i = start
+                while i < len(keys) and i < start+self.maximumScan and keys[i][0].startswith(term):
+                    matches[keys[i][1]] = max(matches.get(keys[i][1], 0), self.counts[attribute][keys[i][1]])
+                    i += 1
+                #endwhile
+            #endfor
+            attributeKeys = {}
+            attributeCounts = {}
+            for attribute in attributes:
+                if self.keys.has_key(attribute):
+                    attributeKeys[attribute] = self.keys[attribute]
+                    attributeCounts[attribute] = self.counts[attribute]
+                #endif
+            #endfor
+        #endwith
+        if not matches:
+            # Scanned outside the lock, so a refresh inserting meanwhile can at worst skip or repeat a value
+            for attribute in attributeKeys.keys():
+                for (key,value) in attributeKeys[attribute]:
+                    if term in key:
+                        matches[value] = max(matches.get(value, 0), attributeCounts[attribute].get(value, 0))
+                        if len(matches) >= self.maximumScan:
+                            break
+                        #endif
+                    #endif
+                #endfor
+            #endfor
+        #endif
+        rankedMatches = sorted(matches.keys(), key=lambda value: (-matches[value], len(value), value.lower()))
+        return rankedMatches[:limit]
+    #enddef
+
+#endclass
@@ -0,0 +1,216 @@
+# Background Database Export For The RISC OS Search Engine
+# Developed by Rebecca Shalfield for The RISC OS Community
+# Copyright (c) Rebecca Shalfield 2002-2013
+
+import cherrypy, gzip, json, os, pymongo, re, socket, threading, time
+from xml.sax.saxutils import escape
+
+class riscosexport:
+
+    def __init__(self, riscos):
+        '''Initialisation settings'''
+
+        # The site itself, for its collections and riscos.xml rendering
+        self.riscos = riscos
+
+        # Snapshots are written beside the other downloads and only replace the previous one once complete
+        self.directory = riscos.path+os.sep+'downloads'
+        self.formats = {'json':'riscos.json.gz','xml':'riscos.xml.gz'}
+
+        # Documents read from the cursor and written out between checkpoints
+        self.batchSize = 1000
+
+        # Only one process writes a given .partial file, renewing its claim after each batch
+        self.owner = socket.gethostname()+':'+str(os.getpid())
+        self.leaseExpiry = 600
+
+        # Running exports are given this long to finish their current batch when the engine stops
+        self.stopTimeout = 60
+
+        # Characters that may not appear anywhere in an XML 1.0 document
+        self.invalidXmlCharacters = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+        self.threads = {}
+        self.lock = threading.Lock()
+        self.stopping = False
+    #enddef
+
+    def filename(self, format):
+        return self.directory+os.sep+self.formats[format]
+    #enddef
+
+    def get_progress(self, format):
+        # Progress of the current or last export, as recorded in 'stats' after each batch
+        return self.riscos.statsCollection.find_one({'_id':'export_'+format})
+    #enddef
+
+    def latest_snapshot(self, format):
+        # The name and modification time of the last completed export, if any
+        if os.path.exists(self.filename(format)):
+            return self.formats[format], int(os.path.getmtime(self.filename(format)))
+        #endif
+        return None, None
+    #enddef
+
+    def abandoned(self, progressDocument):
+        # A running export that was released on shutdown or whose owner has stopped renewing its claim
+        return progressDocument['status'] == 'running' and (not progressDocument.get('owner') or progressDocument.get('heartbeat', 0) < int(time.time())-self.leaseExpiry)
+    #enddef
+
+    def claimable(self):
+        # Criteria matching an export this process may take over
+        return [{'owner':None},{'owner':self.owner},{'heartbeat':{'$lt':int(time.time())-self.leaseExpiry}}]
+    #enddef
+
+    def start(self, format):
+        # Begin a fresh export unless one is already running, here or in another process
+        with self.lock:
+            if self.threads.has_key(format) and self.threads[format].isAlive():
+                return False
+            #endif
+            progressDocument = {'_id':'export_'+format,'status':'running','started':int(time.time()),'checkpoint':None,'exported':0,'size':0,'total':self.riscos.riscosCollection.count(),'owner':self.owner,'heartbeat':int(time.time())}
+            try:
+                claimed = self.riscos.statsCollection.find_and_modify({'_id':progressDocument['_id'],'$or':[{'status':{'$ne':'running'}}]+self.claimable()}, progressDocument, upsert=True, new=True)
+            except pymongo.errors.OperationFailure:
+                # Another process holds the running export
+                claimed = None
+            #endtryexcept
+            if not claimed:
+                return False
+            #endif
+            self.run_in_background(format)
+        #endwith
+        return True
+    #enddef
+
+    def resume(self):
+        # Pick up exports interrupted by a restart from their last checkpoint, unless another process already has
+        self.stopping = False
+        with self.lock:
+            for format in self.formats.keys():
+                if self.threads.has_key(format) and self.threads[format].isAlive():
+                    continue
+                #endif
+                claimed = self.riscos.statsCollection.find_and_modify({'_id':'export_'+format,'status':'running','$or':self.claimable()}, {'$set':{'owner':self.owner,'heartbeat':int(time.time())}})
+                if claimed:
+                    self.run_in_background(format)
+                #endif
+            #endfor
+        #endwith
+    #enddef
+
+    def stop(self):
+        # Running exports finish their current batch and release their claim, leaving the checkpoint for resume
+        self.stopping = True
+        for thread in self.threads.values():
+            thread.join(self.stopTimeout)
+        #endfor
+    #enddef
+
+    def run_in_background(self, format):
+        thread = threading.Thread(target=self.export, args=(format,))
+        thread.setDaemon(True)
+        thread.start()
+        self.threads[format] = thread
+    #enddef
+
+    def escaped(self, value):
+        # A copy of a document with every string safe to place in XML text or an attribute
+        if isinstance(value, dict):
+            return dict((key, self.escaped(item)) for (key, item) in value.items())
+        elif isinstance(value, list):
+            return [self.escaped(item) for item in value]
+        elif isinstance(value, basestring):
+            return escape(self.invalidXmlCharacters.sub('', value), {'"':'&quot;',"'":'&apos;'})
+        #endif
+        return value
+    #enddef
+
+    def save_progress(self, progressDocument):
+        # Record progress only while this process still owns the export, renewing its claim
+        progressDocument['heartbeat'] = int(time.time())
+        return self.riscos.statsCollection.find_and_modify({'_id':progressDocument['_id'],'owner':self.owner}, progressDocument)
+    #enddef
+
+    def export(self, format):
+        progressDocument = self.get_progress(format)
+        try:
+            self.write_export(format, progressDocument)
+        except:
+            cherrypy.log('Unable to export the database as '+format, 'RISCOS', traceback=True)
+            progressDocument['status'] = 'failed'
+            progressDocument['failed'] = int(time.time())
+            progressDocument['owner'] = None
+            try:
+                self.save_progress(progressDocument)
+            except:
+                True
+            #endtryexcept
+        #endtryexcept
+    #enddef
+
+    def write_export(self, format, progressDocument):
+        partialFilename = self.filename(format)+'.partial'
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        #endif
+        if progressDocument['checkpoint'] and os.path.exists(partialFilename):
+            # Discard anything written after the last checkpoint
+            ip = open(partialFilename, 'r+b')
+            ip.truncate(progressDocument['size'])
+            ip.close()
+        else:
+            progressDocument['checkpoint'] = None
+            progressDocument['exported'] = 0
+            op = gzip.open(partialFilename, 'wb')
+            if format == 'xml':
+                op.write(self.riscos.xml_prologue())
+            #endif
+            op.close()
+        #endif
+        while not self.stopping:
+            criteria = {}
+            if progressDocument['checkpoint']:
+                criteria['_id'] = {'$gt':progressDocument['checkpoint']}
+            #endif
+            documents = list(self.riscos.riscosCollection.find(criteria).sort('_id', 1).limit(self.batchSize))
+            # Each batch is appended as a gzip member of its own, so the file is valid at every checkpoint
+            op = gzip.open(partialFilename, 'ab')
+            for document in documents:
+                if format == 'json':
+                    op.write(json.dumps(document, default=str, separators=(',',':'))+'\n')
+                else:
+                    op.write(self.riscos.document_as_xml_elements(self.escaped(document)).replace('&nbsp;',' ').encode('iso-8859-1','xmlcharrefreplace'))
+                #endif
+            #endfor
+            if not documents and format == 'xml':
+                op.write('</riscos>\n')
+            #endif
+            op.close()
+            if documents:
+                progressDocument['checkpoint'] = documents[-1]['_id']
+                progressDocument['exported'] += len(documents)
+                progressDocument['size'] = os.path.getsize(partialFilename)
+            else:
+                if os.path.exists(self.filename(format)):
+                    os.remove(self.filename(format))
+                #endif
+                os.rename(partialFilename, self.filename(format))
+                progressDocument['status'] = 'complete'
+                progressDocument['completed'] = int(time.time())
+                progressDocument['owner'] = None
+            #endif
+            if not self.save_progress(progressDocument):
+                # Another process has taken over this export
+                return
+            #endif
+            if progressDocument['status'] == 'complete':
+                return
+            #endif
+        #endwhile
+        # Stopping, so leave the checkpoint for whichever process resumes first
+        progressDocument['owner'] = None
+        self.save_progress(progressDocument)
+    #enddef
+
+#endclass
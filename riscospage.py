@@ -0,0 +1,46 @@
+# Streamed Page Content For The RISC OS Search Engine
+# Developed by Rebecca Shalfield for The RISC OS Community
+# Copyright (c) Rebecca Shalfield 2002-2013
+
+class riscospage:
+
+    def __init__(self):
+        '''Initialisation settings'''
+
+        # Strings and generators in page order, adjacent strings only being joined into one chunk as it is written
+        self.parts = []
+    #enddef
+
+    def __iadd__(self, part):
+        self.parts.append(part)
+        return self
+    #enddef
+
+    def __iter__(self):
+        # Generators are only run as CherryPy writes the page, so each chunk goes out as soon as it is rendered
+        strings = []
+        for part in self.parts:
+            if isinstance(part, basestring):
+                strings.append(part)
+            else:
+                if strings:
+                    chunk = ''.join(strings)
+                    strings = []
+                    if chunk:
+                        yield chunk
+                    #endif
+                #endif
+                for chunk in part:
+                    if chunk:
+                        yield chunk
+                    #endif
+                #endfor
+            #endif
+        #endfor
+        chunk = ''.join(strings)
+        if chunk:
+            yield chunk
+        #endif
+    #enddef
+
+#endclass
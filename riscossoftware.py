@@ -2,7 +2,7 @@
 # Developed by Rebecca Shalfield for The RISC OS Community
 # Copyright (c) Rebecca Shalfield 2002-2013
 
-import re, os, pymongo, sys, time, zipfile
+import re, os, pymongo, riscosspider, sys, time, zipfile
 from pymongo import Connection
 from bson import ObjectId
 
@@ -116,6 +116,8 @@ class riscossoftware:
         self.dotdotslashPattern = re.compile('(/\w+/\.\./)')
         
         self.path = os.path.dirname(os.path.abspath(__file__))
+        
+        self.riscosspider = riscosspider.riscosspider()
     #enddef
     
     def ascii_to_bin(self,char):
@@ -144,7 +146,9 @@ class riscossoftware:
             osPath = osPath.replace(os.sep+'riscos'+os.sep+'riscos'+os.sep,os.sep+'riscos'+os.sep)
             if not os.path.exists(osPath):
                 print "Removing "+url+"..."
-                self.riscosCollection.remove({'url':url})
+                for docId in self.riscosCollection.find({'url':url}).distinct('_id'):
+                    self.riscosspider.remove_riscos_document(docId)
+                #endfor
             #endif
         #endfor
     #enddef
@@ -285,7 +289,7 @@ class riscossoftware:
                     existingDocument['utilities'] = utilities
                 #endif
                 try:
-                    self.riscosCollection.save(existingDocument)
+                    self.riscosspider.save_riscos_document(existingDocument)
                 except:
                     True
             else:
@@ -395,7 +399,7 @@ class riscossoftware:
                     subDocument['utilities'] = utilities
                 #endif
                 try:
-                    self.riscosCollection.insert(subDocument)
+                    self.riscosspider.insert_riscos_document(subDocument)
                 except:
                     True
             #endif
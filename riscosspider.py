@@ -2,10 +2,11 @@
 # Developed by Rebecca Shalfield for The RISC OS Community
 # Copyright (c) Rebecca Shalfield 2002-2013
 
-import hashlib, httplib, re, os, pymongo, socket, sys, time, urllib, urllib2, urlparse, zipfile
+import gzip, hashlib, httplib, json, re, os, pymongo, socket, sys, time, urllib, urllib2, urlparse, zipfile
 from pymongo import Connection
-from bson import ObjectId
-from random import randint
+from bson import ObjectId, json_util
+from StringIO import StringIO
+from random import randint, random
 from urllib2 import HTTPError
 from ssl import SSLError
 from lxml import etree
@@ -41,6 +42,165 @@ class riscosspider:
         # Connect to 'quarantine' collection
         self.quarantineCollection = db['quarantine']    
     
+        # Connect to 'search_index' collection
+        self.searchIndexCollection = db['search_index']
+        self.searchIndexCollection.ensure_index('tokens')
+        self.searchIndexCollection.ensure_index('updated')
+    
+        # Connect to 'filetypes' collection, a reverse index from filetype to the apps running or setting it
+        self.filetypesCollection = db['filetypes']
+        self.filetypesCollection.ensure_index('run.doc_id')
+        self.filetypesCollection.ensure_index('set.doc_id')
+    
+        # Connect to 'websites' collection, holding the home page (shortest titled URL) of each domain
+        self.websitesCollection = db['websites']
+    
+        # Connect to 'stats' collection, where the latest records list is kept up to date on insert
+        self.statsCollection = db['stats']
+        self.latestRecordsSize = 32
+        
+        # Most dated records examined when rebuilding the list, and the fields the list is made from
+        self.latestRecordsScanLimit = 1024
+        self.latestRecordsFields = ['application_name','application_version','date','directory','domain','embed','last_scanned','page_title','parent_url','relocatable_modules.name','url']
+        
+        # The spider and riscossoftware both update the list, each writing only if the other hasn't since it read it
+        self.latestRecordsAttempts = 3
+    
+        # Connect to 'changes' collection, the latest change to each riscos document numbered in sequence for mirrors to pull
+        self.changesCollection = db['changes']
+        self.changesCollection.ensure_index('doc_id')
+
+        # A record pulled from another mirror is the same as a local one, spidered separately, if these all match
+        self.identityAttributes = ['url','directory','riscos_xml','syndicated_feed']
+    
+        self.taxonomy = [['Anti-Virus','(?i)anti-virus'],
+                         ['Artificial Intelligence','Expert Systems','(?i)expert system|observess'],
+                         ['Artificial Intelligence','Programmming Languages','(?i)lisp|prolog'],
+                         ['Business','Accounting','(?i)tax|accounting'],
+                         ['Business','Personnel','(?i)personnel'],
+                         ['Business','Presentation Graphics','(?i)presentation|OHP'],
+                         ['Business','Project Planning','(?i)project planning'],
+                         ['Business','Spreadsheets','(?i)spreadsheet|eureka|resultz'],
+                         ['Business','Stock Control','(?i)stock control'],
+                         ['Business','Time Management','(?i)time management'],
+                         ['Command Line','(?i)command line|cli'],
+                         ['Compression/Archive','(?i)spark|sparkplug|zip'],
+                         ['Connectivity and Control','Communications','(?i)communication'],
+                         ['Connectivity and Control','Control','(?i)control'],
+                         ['Connectivity and Control','Robots','(?i)robot'],
+                         ['Connectivity and Control','Turtles','(?i)turtle'],
+                         ['Connectivity and Control','Networking','(?i)network'],
+                         ['Education','Administration','(?i)admin'],
+                         ['Education','Subjects','Art','(?i)art|paint|painting'],
+                         ['Education','Subjects','Business Studies','(?i)business studies'],
+                         ['Education','Subjects','Citizenship','(?i)citizenship'],
+                         ['Education','Subjects','Classics','(?i)classics'],
+                         ['Education','Subjects','Design and Technology','(?i)design|technology'],
+                         ['Education','Subjects','Drama','(?i)drama'],
+                         ['Education','Subjects','English','(?i)english'],
+                         ['Education','Subjects','Geography','(?i)geography'],
+                         ['Education','Subjects','History','(?i)history'],
+                         ['Education','Subjects','Humanities','(?i)humanity'],
+                         ['Education','Subjects','ICT','(?i)ICT'],
+                         ['Education','Subjects','Mathematics','(?i)mathematics|maths|lispcalc'],
+                         ['Education','Subjects','Modern Languages','(?i)modern language'],
+                         ['Education','Subjects','Modern Studies','(?i)modern studies'],
+                         ['Education','Subjects','Music','(?i)music|maestro'],
+                         ['Education','Subjects','Physical Education','(?i)physical education'],
+                         ['Education','Subjects','Religious Education','(?i)religious education|religion|bible'],
+                         ['Education','Subjects','Sciences','(?i)science|physics|biology|chemistry'],
+                         ['Education','Subjects','Technology','(?i)technology'],
+                         ['Emulation','(?i)emulator|emulation'],
+                         ['Freeware','(?i)freeware'],
+                         ['Graphics','Animation','(?i)animation|animate'],
+                         ['Graphics','Art','(?i)art'],
+                         ['Graphics','Computer-Aided Design','(?i)CAD|computer-aided design|draw'],
+                         ['Graphics','Conversion','(?i)changefsi'],
+                         ['Graphics','Data Presentation','(?i)data presentation'],
+                         ['Graphics','Graphics Libraries','(?i)graphics library'],
+                         ['Graphics','Image Processing','(?i)image processing'],
+                         ['Graphics','Ray Tracing','(?i)ray tracing'],
+                         ['Graphics','Scanning and Digitising','(?i)scanning|digitising'],
+                         ['Graphics','Video Post-Processing','(?i)video'],
+                         ['Information Storage and Retrieval','Database Management Systems','(?i)database management system|datapower'],
+                         ['Information Storage and Retrieval','Data Files','(?i)data file'],
+                         ['Information Storage and Retrieval','Full Text Database Systems','(?i)full text database system'],
+                         ['Information Storage and Retrieval','Hypermedia','(?i)hypermedia|magpie'],
+                         ['Information Storage and Retrieval','Library Management Systems','(?i)library management system'],
+                         ['Information Storage and Retrieval','Specialised Data Management Systems','(?i)specialised data management system'],
+                         ['Information Storage and Retrieval','Videotex Database Systems','(?i)videotex database system'],
+                         ['Information Storage and Retrieval','Classification Schemes','(?i)classification scheme'],
+                         ['Leisure and Entertainment','Games','(?i)game'],
+                         ['Leisure and Entertainment','Hobbies','(?i)hobby'],
+                         ['Medicine and Health','Health Administration','(?i)health admin'],
+                         ['Medicine and Health','Healthcare','(?i)healthcare'],
+                         ['Medicine and Health','Health Education','(?i)health education'],
+                         ['Medicine and Health','Medical Records','(?i)medical record'],
+                         ['Medicine and Health','Monitoring','(?i)health monitoring'],
+                         ['Medicine and Health','Therapeutics','(?i)therapeutic'],
+                         ['Medicine and Health','Psychology','(?i)psychology'],
+                         ['Medicine and Health','Nursing','(?i)nursing'],
+                         ['Network','Internet','Email','(?i)messenger|email client|pluto'],
+                         ['Network','Internet','FTP','(?i)ftpc'],
+                         ['Network','Internet','General','(?i)ping|sunfish'],
+                         ['Network','Internet','Usenet','(?i)newshound'],
+                         ['Network','Internet','Terminal','(?i)nettle'],
+                         ['Network','Internet','Web Broswer','(?i)netsurf|arcweb'],
+                         ['Network','Internet','Web Server','(?i)serviette'],
+                         ['Peripherals','CD-ROM','(?i)cd-rom'],
+                         ['Peripherals','DVD','(?i)dvd'],
+                         ['Peripherals','Expansion Cards','(?i)expansion card|podule'],
+                         ['Peripherals','Firmware','(?i)firmware'],
+                         ['Peripherals','Input Devices','(?i)input device|keyboard|mouse'],
+                         ['Peripherals','Keyboards','(?i)keyboard'],
+                         ['Peripherals','Memory','(?i)memory|ram'],
+                         ['Peripherals','Memory Cards','(?i)memory card'],
+                         ['Peripherals','Mice','(?i)mouse'],
+                         ['Peripherals','Network Cards','(?i)network card|NCI'],
+                         ['Peripherals','Output Devices','(?i)output device'],
+                         ['Peripherals','Printers','(?i)printer'],
+                         ['Peripherals','Storage Devices','(?i)storage device'],
+                         ['Peripherals','USB','(?i)usb'],
+                         ['Programming','Languages','ADA','ADA'],
+                         ['Programming','Languages','Assembler','(?i)assembler'],
+                         ['Programming','Languages','BBC BASIC','BBC BASIC'],
+                         ['Programming','Languages','C/C++','(?i)c/c\+\+|ansi c|desktop c'],
+                         ['Programming','Languages','COBOL','(?i)cobol'],
+                         ['Programming','Languages','Lisp','(?i)lisp'],
+                         ['Programming','Languages','Modula-2','(?i)module-2'],
+                         ['Programming','Languages','Pascal','(?i)pascal'],
+                         ['Programming','Languages','Prolog','(?i)prolog'],
+                         ['Programming','Languages','Python','(?i)python'],
+                         ['Programming','Languages','General','(?i)programming'],
+                         ['Publications','(?i)publication|arcscan'],
+                         ['Public Domain','(?i)public domain'],
+                         ['Science and Industry','Data Capture/Logging','(?i)data capture|data logging'],
+                         ['Science and Industry','Engineering','(?i)engineering'],
+                         ['Science and Industry','Industrial Applications','(?i)industrial'],
+                         ['Science and Industry','Scientific Research','(?i)scientific research'],
+                         ['Shareware','(?i)shareware'],
+                         ['Sound and Music','(?i)sound|music'],
+                         ['Text Processing','Desktop Publishing','(?i)desktop publishing|ovation|impression'],
+                         ['Text Processing','Fonts','(?i)font'],
+                         ['Text Processing','Spell Checkers and Word Finders','(?i)spell(?:ing)? check|word find'],
+                         ['Text Processing','Text Editors','(?i)text editor'],
+                         ['Text Processing','Word Processing','(?i)word processing|word processor|easiwriter'],
+                         ['Text Processing','Optical Character Recognition','(?i)optical character recognition|OCR'],
+                         ['Video','(?i)video'],
+                         ['General','CD-ROM Discs','(?i)CD-ROM'],
+                         ['General','Demos','(?i)demo'],
+                         ['General','Personal Productivity','(?i)personal productivity'],
+                         ['Upgrades','Firmware','(?i)firmware'],
+                         ['Utilities','(?i)utility']
+                        ]
+    
+        # The taxonomy's regexes compiled once, for matching against each document's !Help text at ingest
+        self.taxonomyPatterns = []
+        for taxonomyEntry in self.taxonomy:
+            self.taxonomyPatterns.append((taxonomyEntry[:-1],re.compile(taxonomyEntry[-1])))
+        #endfor
+        self.categorySeparator = ' > '
+    
         self.housekeepingTasksLastRan = []
     
         self.months = ['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec']
@@ -65,7 +225,9 @@ class riscosspider:
                                      ('Dealer','dealer'),
                                      ('Description','description'),
                                      ('Developer','developer'),
+                                     ('Domain','domain'),
                                      ('DTP Formats','dtp_formats'),
+                                     ('Error Message','error_message'),
                                      ('Event','event',),
                                      ('FAQ','question'),
                                      ('Filetypes Run','filetypes_run'),
@@ -77,6 +239,7 @@ class riscosspider:
                                      ('Help','help'),
                                      ('How-To','howto'),
                                      ('Identifier','identifier'),
+                                     ('Key Stage','key_stage'),
                                      ('licence','licence'),
                                      ('Magazine','magazine'),
                                      ('Maintainer','maintainer'),
@@ -98,6 +261,7 @@ class riscosspider:
                                      ('Purpose','purpose'),
                                      ('Relocatable Modules','relocatable_modules'),
                                      ('RISC OS Versions','riscos_versions'),
+                                     ('SoftWare Interrupt','software_interrupt'),
                                      ('* Command','star_command'),
                                      ('Source','source'),
                                      ('Spark File','spark_file'),
@@ -173,6 +337,7 @@ class riscosspider:
         self.sourcePattern = re.compile('Source: (.+)')
         self.sysVarPattern = re.compile('(?i)Set ([A-Za-z0-9]{3}\$(?:Dir|Path))')
         self.titlePattern = re.compile('<title>\s*(.*?)\s*</title>')
+        self.tokenPattern = re.compile('(?u)\w+')
         self.utilitySyntaxPattern = re.compile('\x00Syntax:\s([^\s])\s(.+?)\x00')
         self.utilityVersionPattern = re.compile('(\d+\.\d+\s\(\d\d\s\w\w\w\s\d\d\d\d\))')
         self.appVerFromTemplatesPattern = re.compile('\x0d(\d+\.\d+\s+\(\d\d-\w\w\w-\d\d\d?\d?\))\x0d')
@@ -414,7 +579,8 @@ class riscosspider:
             for document in self.riscosCollection.find({}):
                 searchCriteria = {}
                 for key in document.keys():
-                    if not key in ['last_scanned','next_scan','_id']:
+                    # Fields set at ingest, such as the random sample value, differ between otherwise identical documents
+                    if not key in ['last_scanned','next_scan','_id','rand','year','addressing_modes','min_riscos_versions','category_paths']:
                         searchCriteria[key] = document[key]
                     #endif                
                 #endfor
@@ -427,7 +593,7 @@ class riscosspider:
                         print ""
                     #endfor
                     print "Removing from riscos: "+document['url']
-                    self.riscosCollection.remove({'_id':ObjectId(document['_id'])})
+                    self.remove_riscos_document(document['_id'])
                     break
                 #endif
             #endfor
@@ -465,7 +631,7 @@ class riscosspider:
                     for otherDocument in self.riscosCollection.find({'directory':document['directory'],'application_version':str(highestVersion)}):
                         if float(otherDocument['application_version']) > float(document['application_version']):
                             document['superseded_by'] = otherDocument['_id']
-                            self.riscosCollection.save(document)
+                            self.save_riscos_document(document)
                             break
                         #endif
                     #endfor
@@ -481,7 +647,7 @@ class riscosspider:
                 count = self.riscosCollection.find({'_id':ObjectId(document['superseded_by'])}).count()
                 if not count:
                     del document['superseded_by']
-                    self.riscosCollection.save(document)
+                    self.save_riscos_document(document)
                 #endif
             #endif
         #endfor
@@ -536,7 +702,7 @@ class riscosspider:
     #enddef
     
     def housekeeping(self):
-        noOfTasks = 18
+        noOfTasks = 27
         if not self.housekeepingTasksLastRan:
             for i in range(noOfTasks):
                 self.housekeepingTasksLastRan.append(0)
@@ -593,11 +759,11 @@ class riscosspider:
                         (scheme,netloc,path,query,fragment) = urlparse.urlsplit(document['url'])
                         if not (document.has_key('domain') and document['domain']):
                             document['domain'] = netloc
-                            self.riscosCollection.save(document)
+                            self.save_riscos_document(document)
                         #endif
                     except ValueError:
                         print "Removing from riscos: "+document['url']
-                        self.riscosCollection.remove({'_id':ObjectId(document['_id'])})
+                        self.remove_riscos_document(document['_id'])
                     #endtryexcept 
                 elif document.has_key('riscos_xml') and document['riscos_xml']:
                     continue
@@ -605,7 +771,7 @@ class riscosspider:
                     continue
                 else:
                     print "Removing document with no url from riscos"
-                    self.riscosCollection.remove({'_id':ObjectId(document['_id'])})
+                    self.remove_riscos_document(document['_id'])
                 #endif
             #endfor
         elif selection == 3:
@@ -645,7 +811,7 @@ class riscosspider:
                         if results:
                             if self.url_in_riscos(results[0]):
                                 print 'Removing Living Archive '+document['url']+'...'
-                                self.riscosCollection.remove({'_id':ObjectId(document['_id'])})
+                                self.remove_riscos_document(document['_id'])
                             #endif
                         #endif
                     #endif
@@ -695,7 +861,7 @@ class riscosspider:
                                 self.insert_url_into_urls(normalisedUrl, parent_url, 0, 0, syndicated_feed, False, False)
                             #endif
                             print "Removing from riscos: "+document['url']
-                            self.riscosCollection.remove({'_id':ObjectId(document['_id'])})
+                            self.remove_riscos_document(document['_id'])
                             if counter >= 32:
                                 break
                             #endif
@@ -834,7 +1000,7 @@ class riscosspider:
                             self.insert_url_into_urls(normalisedUrl, parent_url, 0, 0, syndicated_feed, riscos_xml, False)
                         #endif
                         print "Removing from riscos: "+document['url']
-                        self.riscosCollection.remove({'_id':ObjectId(document['_id'])})
+                        self.remove_riscos_document(document['_id'])
                         if counter >= 32:
                             break
                         #endif
@@ -863,6 +1029,64 @@ class riscosspider:
                 executable = r'"C:\Program Files\MongoDB\bin\mongodump.exe" --verbose'+port+' --db riscos --out '+self.path+os.sep+'dbdump'+os.sep+year+month+day
                 (status,output) = self.getstatusoutput(executable)
             #endif                
+        elif selection == 18:
+            print str(selection)+": Rebuild search index"
+            self.rebuild_search_index()
+        elif selection == 19:
+            print str(selection)+": Set normalised filter attributes"
+            for document in self.riscosCollection.find({}):
+                originalDocument = dict(document)
+                self.set_filter_attributes(document)
+                if document != originalDocument:
+                    self.save_riscos_document(document)
+                #endif
+            #endfor
+        elif selection == 20:
+            print str(selection)+": Rebuild filetype index"
+            self.rebuild_filetype_index()
+        elif selection == 21:
+            print str(selection)+": Rebuild web sites"
+            self.rebuild_websites()
+        elif selection == 22:
+            print str(selection)+": Set random sample values"
+            for document in self.riscosCollection.find({'rand':{'$exists':False}},{'_id':1}):
+                self.riscosCollection.update({'_id':document['_id']},{'$set':{'rand':random()}})
+            #endfor
+        elif selection == 23:
+            print str(selection)+": Record changes for documents missing from the change feed"
+            recordedDocIds = set(self.changesCollection.find({}).distinct('doc_id'))
+            for docId in self.riscosCollection.find({}).distinct('_id'):
+                if not docId in recordedDocIds:
+                    self.record_change(docId)
+                #endif
+            #endfor
+        elif selection == 24:
+            print str(selection)+": Set taxonomy categories"
+            for document in self.riscosCollection.find({},['category_paths','help']):
+                originalCategoryPaths = document.get('category_paths')
+                self.set_categories(document)
+                if document.get('category_paths') != originalCategoryPaths:
+                    if document.has_key('category_paths'):
+                        self.riscosCollection.update({'_id':document['_id']},{'$set':{'category_paths':document['category_paths']}})
+                    else:
+                        self.riscosCollection.update({'_id':document['_id']},{'$unset':{'category_paths':1}})
+                    #endif
+                #endif
+            #endfor
+        elif selection == 25:
+            print str(selection)+": Record removals for documents from blacklisted domains"
+            for domain in self.blacklisted_domains.keys():
+                pattern = re.compile('^[a-z]+://'+re.escape(domain)+'(/|$)')
+                for document in self.riscosCollection.find({'$or':[{'url':pattern},{'parent_url':pattern}]},['_id']):
+                    changeDocument = self.changesCollection.find_one({'doc_id':document['_id']})
+                    if not changeDocument or changeDocument['operation'] != 'remove':
+                        self.record_change(document['_id'], 'remove')
+                    #endif
+                #endfor
+            #endfor
+        elif selection == 26:
+            print str(selection)+": Rebuild latest records"
+            self.rebuild_latest_records()
         #endif
         self.housekeepingTasksLastRan[selection] = int(time.time())
     #enddef
@@ -882,21 +1106,75 @@ class riscosspider:
     #enddef 
     
     def synchronise_mirrors(self):
+        # Pull each other mirror's change feed from the last sequence number applied and apply it locally
         for mirror in self.mirrors:
             if mirror != self.mirror:
-                req = urllib2.Request('http://'+mirror+'/synchronise')
-                req.add_unredirected_header('User-Agent', 'RISC OS Search Engine http://'+mirror)
-                try:
-                    urlp = urllib2.urlopen(req)
-                    data = urlp.read()
-                    urlp.close()
-                    print data
-                except:
-                    True
+                tokenDocument = self.statsCollection.find_one({'_id':'synchronise '+mirror})
+                if not tokenDocument:
+                    tokenDocument = {'_id':'synchronise '+mirror,'since':0}
+                #endif
+                more = True
+                while more:
+                    req = urllib2.Request('http://'+mirror+'/synchronise?since='+str(tokenDocument['since']))
+                    req.add_unredirected_header('User-Agent', 'RISC OS Search Engine http://'+mirror)
+                    req.add_header('Accept-Encoding', 'gzip')
+                    try:
+                        urlp = urllib2.urlopen(req)
+                        data = urlp.read()
+                        if urlp.info().get('Content-Encoding') == 'gzip':
+                            data = gzip.GzipFile(fileobj=StringIO(data)).read()
+                        #endif
+                        urlp.close()
+                        batch = json.loads(data, object_hook=json_util.object_hook)
+                    except:
+                        break
+                    #endtryexcept
+                    # Applied without recording them as local changes, so they don't echo back to the mirror
+                    for change in batch['changes']:
+                        if change['operation'] == 'remove':
+                            self.remove_riscos_document(change['doc_id'], False)
+                        else:
+                            self.synchronise_document(change['document'])
+                        #endif
+                    #endfor
+                    print 'Synchronised '+str(len(batch['changes']))+' changes from '+mirror
+                    tokenDocument['since'] = batch['next']
+                    self.statsCollection.save(tokenDocument)
+                    more = batch['more']
+                #endwhile
             #endif
         #endfor
     #enddef
     
+    def synchronise_document(self, document):
+        # Keep whichever copy of a record spidered by more than one mirror was scanned last, so every mirror keeps the same one
+        if document.has_key('url') and document['url']:
+            criteria = {'_id':{'$ne':document['_id']}}
+            for attribute in self.identityAttributes:
+                if document.has_key(attribute) and document[attribute]:
+                    criteria[attribute] = document[attribute]
+                else:
+                    criteria[attribute] = {'$in':[None,'']}
+                #endif
+            #endfor
+            duplicateDocuments = list(self.riscosCollection.find(criteria,['last_scanned']))
+            for duplicateDocument in duplicateDocuments:
+                if (duplicateDocument.get('last_scanned',0),str(duplicateDocument['_id'])) > (document.get('last_scanned',0),str(document['_id'])):
+                    # Including any copy of the other mirror's record taken before
+                    if self.riscosCollection.find_one({'_id':document['_id']},['_id']):
+                        self.remove_riscos_document(document['_id'])
+                    #endif
+                    return
+                #endif
+            #endfor
+            # Recorded as changes, so mirrors that copied the local duplicate drop it too
+            for duplicateDocument in duplicateDocuments:
+                self.remove_riscos_document(duplicateDocument['_id'])
+            #endfor
+        #endif
+        self.save_riscos_document(document, False)
+    #enddef
+
     def spider(self):
         document = ""
         url = ""
@@ -912,7 +1190,7 @@ class riscosspider:
                 for document in self.riscosCollection.find({oldAttribute:{'$exists':True}}):
                     document[newAttribute] = document[oldAttribute]
                     del document[oldAttribute]
-                    self.riscosCollection.save(document)
+                    self.save_riscos_document(document)
                 #endfor
             #endfor
         #endif
@@ -1341,7 +1619,7 @@ class riscosspider:
                 if newDocument.has_key('strike'):
                     del newDocument['strike']
                 #endif
-                self.riscosCollection.insert(newDocument)
+                self.insert_riscos_document(newDocument)
                 print "Inserting into riscos: "+newDocument['url']
                 self.urlsCollection.remove({'url':url})
                 print 'Removing from urls: '+url
@@ -1357,7 +1635,7 @@ class riscosspider:
                 if newDocument.has_key('strike'):
                     del newDocument['strike']
                 #endif                
-                self.riscosCollection.insert(newDocument)
+                self.insert_riscos_document(newDocument)
                 print "Inserting into riscos: "+newDocument['url']
                 self.urlsCollection.remove({'url':url})
                 print 'Removing from urls: '+url
@@ -1373,7 +1651,7 @@ class riscosspider:
                 if newDocument.has_key('strike'):
                     del newDocument['strike']
                 #endif
-                self.riscosCollection.insert(newDocument)
+                self.insert_riscos_document(newDocument)
                 print "Inserting into riscos: "+newDocument['url']
                 self.urlsCollection.remove({'url':url})
                 print 'Removing from urls: '+url
@@ -1440,7 +1718,7 @@ class riscosspider:
                                 if newDocument.has_key('strike'):
                                     del newDocument['strike']
                                 #endif
-                                self.riscosCollection.insert(newDocument)
+                                self.insert_riscos_document(newDocument)
                                 print "Inserting into riscos: "+newDocument['url']
                             #endif
                         except:
@@ -1453,7 +1731,7 @@ class riscosspider:
                         document['last_scanned'] = epoch
                         document['next_scan'] = self.calculate_next_scan_time(lastModified, epoch)
                         document['date'] = lastModified
-                        self.riscosCollection.save(document)
+                        self.save_riscos_document(document)
                     except:
                         True
                 #endif                
@@ -1463,7 +1741,7 @@ class riscosspider:
                         latestMessage = 'Indexing <a href="'+url+'" title="'+url+'">'+document['page_title']+'</a>'
                         document['last_scanned'] = epoch
                         document['next_scan'] = epoch + self.periodYear
-                        self.riscosCollection.save(document)
+                        self.save_riscos_document(document)
                     except:
                         True
                 else:
@@ -1471,13 +1749,13 @@ class riscosspider:
                         latestMessage = 'Indexing <a href="'+url+'">'+url+'</a>'
                         document['last_scanned'] = epoch
                         document['next_scan'] = epoch + self.periodYear
-                        self.riscosCollection.save(document)
+                        self.save_riscos_document(document)
                     except:
                         True
                 #endif
                 
                 if not self.url_pre_validation(document, data):
-                    self.riscosCollection.remove({'_id':ObjectId(document['_id'])})
+                    self.remove_riscos_document(document['_id'])
                     print 'Removing from riscos: '+document['url']
                     latestMessage = 'URL <a href="'+url+'">'+url+'</a> has failed pre-validation'
                     return latestMessage
@@ -1534,7 +1812,7 @@ class riscosspider:
                 #endif
 
                 if not self.url_post_validation(document['url'], data):
-                    self.riscosCollection.remove({'_id':ObjectId(document['_id'])})
+                    self.remove_riscos_document(document['_id'])
                     print 'Removing from riscos: '+document['url']
                     latestMessage = 'URL <a href="'+url+'">'+url+'</a> has failed post-validation'
                     return latestMessage
@@ -1547,7 +1825,7 @@ class riscosspider:
                         embedString = embedString.replace('&lt;','<')
                         embedString = embedString.replace('&gt;','>')
                         document['embed'] = embedString
-                        self.riscosCollection.save(document)
+                        self.save_riscos_document(document)
                     #endif
                 #endif
                 
@@ -1660,7 +1938,7 @@ class riscosspider:
     def process_riscos_xml_file(self, parent_url, xmlcode, lastModified):
         for riscosXmlDocument in self.riscosCollection.find({'parent_url':parent_url}):
             print 'Removing riscos.xml entry for '+riscosXmlDocument['parent_url']+'...'
-            self.riscosCollection.remove({'_id':ObjectId(riscosXmlDocument['_id'])})
+            self.remove_riscos_document(riscosXmlDocument['_id'])
         #endfor
         print 'Processing '+parent_url+'...'
 
@@ -3506,13 +3784,13 @@ class riscosspider:
         #endif
         newDocument['last_scanned'] = epoch
         newDocument['next_scan'] = epoch + self.periodMonth
-        self.riscosCollection.insert(newDocument)
+        self.insert_riscos_document(newDocument)
     #enddef
     
     def analyse_atom_feed(self, url, data):
         for atomFeedDocument in self.riscosCollection.find({'parent_url':url}):
             print 'Removing atom feed entry for '+atomFeedDocument['parent_url']+'...'
-            self.riscosCollection.remove({'_id':ObjectId(atomFeedDocument['_id'])})
+            self.remove_riscos_document(atomFeedDocument['_id'])
         #endfor
         if re.search('<feed(.*?)</feed>',data):
             epoch = int(time.time())
@@ -3570,7 +3848,7 @@ class riscosspider:
                         if newDocument.has_key('strike'):
                             del newDocument['strike']
                         #endif
-                        self.riscosCollection.insert(newDocument)
+                        self.insert_riscos_document(newDocument)
                     #endif
                 elif subElement.tag == 'logo':
                     iconUrl = subElement.text
@@ -3582,7 +3860,7 @@ class riscosspider:
     def analyse_rss_feed(self, url, data):
         for rssFeedDocument in self.riscosCollection.find({'parent_url':url}):
             print 'Removing rss feed entry for '+rssFeedDocument['parent_url']+'...'
-            self.riscosCollection.remove({'_id':ObjectId(rssFeedDocument['_id'])})
+            self.remove_riscos_document(rssFeedDocument['_id'])
         #endfor  
         epoch = int(time.time())
         data = data.replace('\n','')
@@ -3645,7 +3923,7 @@ class riscosspider:
                             #endif
                             newDocument['last_scanned'] = epoch
                             newDocument['next_scan'] = epoch + self.periodWeek
-                            self.riscosCollection.insert(newDocument)
+                            self.insert_riscos_document(newDocument)
                             if not self.url_in_a_collection(linkResults[0]) and not self.suspended_url(linkResults[0]) and not self.blacklisted_url(linkResults[0]):
                                 self.insert_url_into_urls(linkResults[0], "", 0, epoch, False, False, False)                 
                             #endif
@@ -3709,6 +3987,459 @@ class riscosspider:
         return contentRiscosRelated
     #enddef
     
+    def insert_riscos_document(self, document, recordChange=True):
+        self.set_filter_attributes(document)
+        self.set_categories(document)
+        self.set_random(document)
+        self.riscosCollection.insert(document)
+        self.index_document(document)
+        self.index_filetypes(document, False)
+        self.update_website(document)
+        self.update_latest_records(document)
+        if recordChange:
+            self.record_change(document['_id'])
+        #endif
+    #enddef
+    
+    def save_riscos_document(self, document, recordChange=True):
+        self.set_filter_attributes(document)
+        self.set_categories(document)
+        self.set_random(document)
+        self.riscosCollection.save(document)
+        self.index_document(document)
+        self.index_filetypes(document, True)
+        self.update_website(document)
+        self.update_latest_records(document)
+        if recordChange:
+            self.record_change(document['_id'])
+        #endif
+    #enddef
+    
+    def remove_riscos_document(self, docId, recordChange=True):
+        document = self.riscosCollection.find_one({'_id':ObjectId(docId)},['domain','url'])
+        self.riscosCollection.remove({'_id':ObjectId(docId)})
+        if document and document.has_key('domain') and document['domain'] and self.websitesCollection.find_one({'_id':document['domain'],'url':document.get('url')}):
+            # It was its domain's home page, so find the next shortest
+            self.rebuild_website(document['domain'])
+        #endif
+        self.searchIndexCollection.remove({'_id':ObjectId(docId)})
+        self.index_filetypes({'_id':ObjectId(docId)}, True)
+        # With no date it no longer qualifies, so is dropped from the latest records
+        self.update_latest_records({'_id':ObjectId(docId)})
+        if recordChange:
+            self.record_change(ObjectId(docId), 'remove')
+        #endif
+    #enddef
+    
+    def record_change(self, docId, operation='upsert'):
+        # Number the change with the next value in the sequence, replacing any earlier change to the same document
+        timestamp = int(time.time())
+        counterDocument = self.statsCollection.find_and_modify({'_id':'change_sequence'}, {'$inc':{'value':1}}, upsert=True, new=True)
+        self.changesCollection.remove({'doc_id':docId})
+        self.changesCollection.insert({'_id':counterDocument['value'],'doc_id':docId,'operation':operation,'timestamp':timestamp})
+    #enddef
+    
+    def set_categories(self, document):
+        # The path of every taxonomy category whose regex matches the !Help text, with each of its ancestors
+        categoryPaths = []
+        helpTexts = []
+        if document.has_key('help') and isinstance(document['help'], basestring):
+            helpTexts = [document['help']]
+        elif document.has_key('help') and isinstance(document['help'], list):
+            helpTexts = [helpText for helpText in document['help'] if isinstance(helpText, basestring)]
+        #endif
+        for (categories,pattern) in self.taxonomyPatterns:
+            for helpText in helpTexts:
+                if pattern.search(helpText):
+                    for i in range(1, len(categories)+1):
+                        categoryPath = self.categorySeparator.join(categories[:i])
+                        if not categoryPath in categoryPaths:
+                            categoryPaths.append(categoryPath)
+                        #endif
+                    #endfor
+                    break
+                #endif
+            #endfor
+        #endfor
+        if categoryPaths:
+            document['category_paths'] = categoryPaths
+        elif document.has_key('category_paths'):
+            del document['category_paths']
+        #endif
+    #enddef
+    
+    def set_random(self, document):
+        # Uniform value in [0,1) by which the web site picks random documents with one indexed lookup
+        if not document.has_key('rand'):
+            document['rand'] = random()
+        #endif
+    #enddef
+    
+    def set_filter_attributes(self, document):
+        # Normalised attributes allowing the user's filter to be applied within the search query itself
+        utilityModuleVersions = []
+        if document.has_key('module_dependencies') and isinstance(document['module_dependencies'], list):
+            for moduleDependency in document['module_dependencies']:
+                if isinstance(moduleDependency, dict) and moduleDependency.has_key('name') and moduleDependency['name'] == 'UtilityModule':
+                    if moduleDependency.has_key('version') and moduleDependency['version']:
+                        utilityModuleVersions.append(moduleDependency['version'])
+                    else:
+                        utilityModuleVersions.append('')
+                    #endif
+                #endif
+            #endfor
+        #endif
+        if utilityModuleVersions:
+            document['min_riscos_versions'] = utilityModuleVersions
+        elif document.has_key('min_riscos_versions'):
+            del document['min_riscos_versions']
+        #endif
+        
+        addressingModes = None
+        if document.has_key('relocatable_modules') and isinstance(document['relocatable_modules'], list):
+            for relocatableModule in document['relocatable_modules']:
+                if isinstance(relocatableModule, dict) and relocatableModule.has_key('addressing_mode'):
+                    if addressingModes == None:
+                        addressingModes = []
+                    #endif
+                    if relocatableModule['addressing_mode'] and not relocatableModule['addressing_mode'] in addressingModes:
+                        addressingModes.append(relocatableModule['addressing_mode'])
+                    #endif
+                #endif
+            #endfor
+        #endif
+        if addressingModes != None:
+            addressingModes.sort()
+            document['addressing_modes'] = addressingModes
+        elif document.has_key('addressing_modes'):
+            del document['addressing_modes']
+        #endif
+        
+        year = 0
+        if document.has_key('date') and document['date']:
+            try:
+                year = int(time.ctime(int(document['date']))[-4:])
+            except:
+                True
+        #endif
+        if year:
+            document['year'] = year
+        elif document.has_key('year'):
+            del document['year']
+        #endif
+        return document
+    #enddef
+    
+    def tokenise(self, value):
+        tokens = []
+        if isinstance(value, basestring):
+            for token in self.tokenPattern.findall(value.lower()):
+                if len(token) <= 64:
+                    tokens.append(token)
+                #endif
+            #endfor
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    # Only the name sub-field of relocatable_modules, module_dependencies and utilities is searchable
+                    if item.has_key('name') and item['name']:
+                        tokens += self.tokenise(item['name'])
+                    #endif
+                else:
+                    tokens += self.tokenise(item)
+                #endif
+            #endfor
+        #endif
+        return tokens
+    #enddef
+    
+    def index_document(self, document):
+        if document and document.has_key('_id'):
+            tokens = []
+            for (externalAttribute,internalAttribute) in self.searchableAttributes:
+                if document.has_key(internalAttribute) and document[internalAttribute]:
+                    tokens += self.tokenise(document[internalAttribute])
+                #endif
+            #endfor
+            tokens = list(set(tokens))
+            try:
+                if tokens:
+                    self.searchIndexCollection.save({'_id':document['_id'],'tokens':tokens,'updated':int(time.time())})
+                else:
+                    self.searchIndexCollection.remove({'_id':document['_id']})
+                #endif
+            except:
+                True
+        #endif
+    #enddef
+    
+    def search_index_lookup(self, search):
+        # Every token in search must be a prefix of a token within the document
+        docIds = []
+        tokens = list(set(self.tokenise(search)))
+        tokens.sort(key=len, reverse=True)
+        for token in tokens:
+            tokenDocIds = self.searchIndexCollection.find({'tokens':re.compile('^'+re.escape(token))}).distinct('_id')
+            if token == tokens[0]:
+                docIds = tokenDocIds
+            else:
+                docIds = list(set(docIds) & set(tokenDocIds))
+            #endif
+            if not docIds:
+                break
+            #endif
+        #endfor
+        return docIds
+    #enddef
+    
+    def rebuild_search_index(self):
+        for document in self.riscosCollection.find({}):
+            self.index_document(document)
+        #endfor
+        for indexDocument in self.searchIndexCollection.find({},{'_id':1}):
+            if not self.riscosCollection.find_one({'_id':indexDocument['_id']},{'_id':1}):
+                print 'Removing from search_index: '+str(indexDocument['_id'])
+                self.searchIndexCollection.remove({'_id':indexDocument['_id']})
+            #endif
+        #endfor
+    #enddef
+    
+    def filetype_references(self, document):
+        # (hex code, textual name, 'run' or 'set', app) for each filetype an app runs or sets
+        references = []
+        appName = ""
+        if document.has_key('directory') and document['directory']:
+            appName = document['directory']
+        elif document.has_key('application_name') and document['application_name']:
+            appName = document['application_name']
+        #endif
+        if appName:
+            for (attribute,key) in [('filetypes_run','run'),('filetypes_set','set')]:
+                if document.has_key(attribute) and isinstance(document[attribute], list):
+                    for filetype in document[attribute]:
+                        if isinstance(filetype, basestring) and filetype.strip():
+                            components = filetype.strip().split(' ',1)
+                            if len(components) == 2:
+                                references.append((components[0].upper(),components[1].strip(),key,appName))
+                            else:
+                                references.append((components[0].upper(),'',key,appName))
+                            #endif
+                        #endif
+                    #endfor
+                #endif
+            #endfor
+        #endif
+        return references
+    #enddef
+    
+    def index_filetypes(self, document, existing):
+        if document and document.has_key('_id'):
+            try:
+                if existing:
+                    # Drop the document's previous references before adding its current ones
+                    for key in ['run','set']:
+                        self.filetypesCollection.update({key+'.doc_id':document['_id']},{'$pull':{key:{'doc_id':document['_id']}}},multi=True)
+                    #endfor
+                    # Filetypes no app runs or sets any longer are dropped, as a rebuild would
+                    self.filetypesCollection.remove({'run.0':{'$exists':False},'set.0':{'$exists':False}})
+                #endif
+                for (hex,textual,key,appName) in self.filetype_references(document):
+                    addToSet = {key:{'doc_id':document['_id'],'directory':appName}}
+                    if textual:
+                        addToSet['names'] = textual
+                    #endif
+                    self.filetypesCollection.update({'_id':hex},{'$addToSet':addToSet},upsert=True)
+                #endfor
+            except:
+                print 'Failed to update filetype index for '+str(document['_id'])
+            #endtryexcept
+        #endif
+    #enddef
+    
+    def rebuild_filetype_index(self):
+        filetypeDocuments = {}
+        for document in self.riscosCollection.find({'$or':[{'filetypes_run':{'$exists':True,'$ne':[]}},{'filetypes_set':{'$exists':True,'$ne':[]}}]},['application_name','directory','filetypes_run','filetypes_set']):
+            for (hex,textual,key,appName) in self.filetype_references(document):
+                if not filetypeDocuments.has_key(hex):
+                    filetypeDocuments[hex] = {'_id':hex,'names':[],'run':[],'set':[]}
+                #endif
+                if textual and not textual in filetypeDocuments[hex]['names']:
+                    filetypeDocuments[hex]['names'].append(textual)
+                #endif
+                reference = {'doc_id':document['_id'],'directory':appName}
+                if not reference in filetypeDocuments[hex][key]:
+                    filetypeDocuments[hex][key].append(reference)
+                #endif
+            #endfor
+        #endfor
+        for filetypeDocument in filetypeDocuments.values():
+            self.filetypesCollection.save(filetypeDocument)
+        #endfor
+        for hex in self.filetypesCollection.find({}).distinct('_id'):
+            if not filetypeDocuments.has_key(hex):
+                self.filetypesCollection.remove({'_id':hex})
+            #endif
+        #endfor
+    #enddef
+    
+    def website_candidate(self, document):
+        # A titled page can become its domain's home page
+        if document.has_key('url') and document['url'] and document.has_key('page_title') and document['page_title'] and document.has_key('domain') and document['domain']:
+            if isinstance(document['url'], basestring) and isinstance(document['page_title'], basestring) and document['page_title'].strip():
+                return True
+            #endif
+        #endif
+        return False
+    #enddef
+    
+    def update_website(self, document):
+        # Replace the domain's home page if this page's URL is shorter, or refresh its title if it is the same page
+        if document and self.website_candidate(document):
+            try:
+                websiteDocument = self.websitesCollection.find_one({'_id':document['domain']})
+                if not websiteDocument or len(document['url']) < len(websiteDocument['url']) or document['url'] == websiteDocument['url']:
+                    self.websitesCollection.save({'_id':document['domain'],'url':document['url'],'page_title':document['page_title'].strip()})
+                #endif
+            except:
+                print 'Failed to update web site for '+document['domain']
+            #endtryexcept
+        #endif
+    #enddef
+    
+    def rebuild_website(self, domain):
+        # The shortest of the domain's remaining titled pages, or no entry at all if there are none
+        websiteDocument = None
+        for document in self.riscosCollection.find({"domain":domain,"url":{"$exists":True,"$ne":""},"page_title":{"$exists":True,"$ne":""}},['domain','page_title','url']):
+            if self.website_candidate(document):
+                if not websiteDocument or len(document['url']) < len(websiteDocument['url']):
+                    websiteDocument = {'_id':domain,'url':document['url'],'page_title':document['page_title'].strip()}
+                #endif
+            #endif
+        #endfor
+        if websiteDocument:
+            self.websitesCollection.save(websiteDocument)
+        else:
+            self.websitesCollection.remove({'_id':domain})
+        #endif
+    #enddef
+
+    def rebuild_websites(self):
+        # One pass over all titled pages, keeping the shortest URL per domain
+        websiteDocuments = {}
+        for document in self.riscosCollection.find({"url":{"$exists":True,"$ne":""},"page_title":{"$exists":True,"$ne":""},"domain":{"$exists":True,"$ne":""}},['domain','page_title','url']):
+            if self.website_candidate(document):
+                if not websiteDocuments.has_key(document['domain']) or len(document['url']) < len(websiteDocuments[document['domain']]['url']):
+                    websiteDocuments[document['domain']] = {'_id':document['domain'],'url':document['url'],'page_title':document['page_title'].strip()}
+                #endif
+            #endif
+        #endfor
+        for websiteDocument in websiteDocuments.values():
+            self.websitesCollection.save(websiteDocument)
+        #endfor
+        for domain in self.websitesCollection.find({}).distinct('_id'):
+            if not websiteDocuments.has_key(domain):
+                self.websitesCollection.remove({'_id':domain})
+            #endif
+        #endfor
+    #enddef
+    
+    def latest_record(self, document):
+        # The fields the home page's latest records panel displays, or None if the document does not qualify
+        if not document.has_key('date') or not isinstance(document['date'], (int,long,float)):
+            return None
+        #endif
+        # Ensure date last modified and last_scanned dates are at least two hours apart
+        if not document.has_key('last_scanned') or not isinstance(document['last_scanned'], (int,long,float)) or document['last_scanned'] <= document['date']+7200:
+            return None
+        #endif
+        if not document.has_key('url') or not document['url'] or document['url'].__contains__('/riscos/softwareunconfirmed/'):
+            return None
+        #endif
+        app = (document.has_key('directory') and document['directory']) or (document.has_key('application_name') and document['application_name'])
+        video = document.has_key('domain') and document['domain'] in ['www.youtube.com','m.youtube.com','uk.youtube.com'] and document.has_key('embed') and document['embed']
+        page = document.has_key('page_title') and document['page_title']
+        if not (app or video or page):
+            return None
+        #endif
+        latestRecord = {}
+        for attribute in ['_id','application_name','application_version','date','directory','domain','embed','page_title','parent_url','url']:
+            if document.has_key(attribute) and document[attribute]:
+                latestRecord[attribute] = document[attribute]
+            #endif
+        #endfor
+        modules = []
+        if app and document.has_key('relocatable_modules') and isinstance(document['relocatable_modules'], list):
+            for relocatableModule in document['relocatable_modules']:
+                if isinstance(relocatableModule, dict) and relocatableModule.has_key('name') and relocatableModule['name'] and not relocatableModule['name'] in modules:
+                    modules.append(relocatableModule['name'])
+                #endif
+            #endfor
+        #endif
+        latestRecord['modules'] = modules
+        return latestRecord
+    #enddef
+    
+    def update_latest_records(self, document):
+        # Keep the newest records by date, replacing any earlier entry for the same document
+        if document and document.has_key('_id'):
+            try:
+                latestRecord = self.latest_record(document)
+                for attempt in range(self.latestRecordsAttempts):
+                    latestRecordsDocument = self.statsCollection.find_one({'_id':'latest_records'})
+                    if not latestRecordsDocument:
+                        if latestRecord:
+                            self.rebuild_latest_records()
+                        #endif
+                        return
+                    #endif
+                    records = [record for record in latestRecordsDocument['records'] if record['_id'] != document['_id']]
+                    if latestRecord:
+                        if len(records) < self.latestRecordsSize or latestRecord['date'] > records[-1]['date']:
+                            records.append(latestRecord)
+                            records.sort(key=lambda record: -record['date'])
+                            records = records[:self.latestRecordsSize]
+                        #endif
+                    #endif
+                    if len(records) < len(latestRecordsDocument['records']) and len(records) < self.latestRecordsSize:
+                        # A record dropped out of a full list, so find the one that now takes its place
+                        self.rebuild_latest_records()
+                        return
+                    elif records == latestRecordsDocument['records']:
+                        return
+                    #endif
+                    # Only replace the list read above, trying again if another process has changed it meanwhile
+                    criteria = {'_id':'latest_records'}
+                    if latestRecordsDocument.has_key('version'):
+                        criteria['version'] = latestRecordsDocument['version']
+                    else:
+                        criteria['version'] = {'$exists':False}
+                    #endif
+                    if self.statsCollection.find_and_modify(criteria, {'$set':{'records':records},'$inc':{'version':1}}):
+                        return
+                    #endif
+                #endfor
+                print 'Gave up updating latest records for '+str(document['_id'])+' after '+str(self.latestRecordsAttempts)+' attempts'
+            except:
+                print 'Failed to update latest records for '+str(document['_id'])
+            #endtryexcept
+        #endif
+    #enddef
+    
+    def rebuild_latest_records(self):
+        # Walk back through the date index until enough qualifying records are found, giving up after so many
+        records = []
+        for document in self.riscosCollection.find({'date':{'$gt':0}}, self.latestRecordsFields).sort('date',pymongo.DESCENDING).limit(self.latestRecordsScanLimit):
+            latestRecord = self.latest_record(document)
+            if latestRecord:
+                records.append(latestRecord)
+                if len(records) >= self.latestRecordsSize:
+                    break
+                #endif
+            #endif
+        #endfor
+        self.statsCollection.find_and_modify({'_id':'latest_records'}, {'$set':{'records':records},'$inc':{'version':1}}, upsert=True)
+    #enddef
+    
     def update_apps(self, url, document, apps):
         epoch = int(time.time())
         for [absolutes,appDate,appDir,appName,appVer,armArchitectures,author,categories,copyright,description,dtpFormats,filetypesRun,filetypesSet,fonts,help,licence,maintainer,monitorDefinitionFiles,packageName,packageSection,packageVersion,printerDefinitionFiles,priority,programmingLanguages,relocatableModules,relocatableModulesDependantUpon,riscOsVers,source,territories,systemVariables,toolboxRequired,utilities] in apps:
@@ -3817,7 +4548,7 @@ class riscosspider:
                     existingDocument['utilities'] = utilities
                 #endif
                 try:
-                    self.riscosCollection.save(existingDocument)
+                    self.save_riscos_document(existingDocument)
                 except:
                     True
             else:
@@ -3929,7 +4660,7 @@ class riscosspider:
                     subDocument['utilities'] = utilities
                 #endif
                 try:
-                    self.riscosCollection.insert(subDocument)
+                    self.insert_riscos_document(subDocument)
                     print "Inserting into riscos: "+subDocument['url']
                 except:
                     True
@@ -0,0 +1,74 @@
+# Shared Set-Up For The RISC OS Search Engine Tests
+# Developed by Rebecca Shalfield for The RISC OS Community
+# Copyright (c) Rebecca Shalfield 2002-2013
+
+# The tests run against a scratch database on the local MongoDB, dropped before and after each test
+
+import os, sys, unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymongo, riscosspider
+from pymongo import Connection
+
+class DatabaseTestCase(unittest.TestCase):
+
+    databaseName = 'riscos_test'
+
+    def setUp(self):
+        self.connection = None
+        for port in [27017,27021]:
+            try:
+                self.connection = Connection('localhost', port)
+                break
+            except:
+                True
+            #endtryexcept
+        #endfor
+        if not self.connection:
+            self.skipTest('MongoDB is not running')
+        #endif
+        self.connection.drop_database(self.databaseName)
+        self.db = self.connection[self.databaseName]
+    #enddef
+
+    def tearDown(self):
+        self.connection.drop_database(self.databaseName)
+        self.connection.disconnect()
+    #enddef
+
+    def scratch_connection(self, host, port):
+        return {'riscos':self.db}
+    #enddef
+
+    def spider(self):
+        # A spider whose collections are all within the scratch database, seeded so it doesn't add its own start URL
+        self.db['urls'].insert({'url':'http://www.riscosopen.org/'})
+        originalConnection = riscosspider.Connection
+        riscosspider.Connection = self.scratch_connection
+        try:
+            spider = riscosspider.riscosspider()
+        finally:
+            riscosspider.Connection = originalConnection
+        #endtryexcept
+        spider.riscosCollection.remove({})
+        spider.urlsCollection.remove({})
+        return spider
+    #enddef
+
+    def site(self):
+        # The web site, likewise within the scratch database; riscos.py builds one on import, so it is only imported once connections are redirected
+        self.db['urls'].insert({'url':'http://www.riscosopen.org/'})
+        originalConnections = (pymongo.Connection,riscosspider.Connection)
+        pymongo.Connection = riscosspider.Connection = self.scratch_connection
+        try:
+            import riscos
+            riscos.Connection = self.scratch_connection
+            site = riscos.riscos()
+        finally:
+            (pymongo.Connection,riscosspider.Connection) = originalConnections
+        #endtryexcept
+        site.urlsCollection.remove({})
+        return site
+    #enddef
+
+#endclass
@@ -0,0 +1,75 @@
+# Tests For The RISC OS Search Engine Web Site
+# Developed by Rebecca Shalfield for The RISC OS Community
+# Copyright (c) Rebecca Shalfield 2002-2013
+
+import cherrypy, unittest
+from bson import ObjectId
+from riscostest import DatabaseTestCase
+
+class UserVisitsTest(DatabaseTestCase):
+
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.website = self.site()
+        cherrypy.request.userDocuments = {}
+        self.userId = ObjectId()
+        self.website.usersCollection.insert({'_id':self.userId,'session_id':'session','last_visit':1000,'watchlist':[]})
+    #enddef
+
+    def stored(self):
+        return self.website.usersCollection.find_one({'_id':self.userId})
+    #enddef
+
+    def test_visit_details_are_written_when_flushed(self):
+        userDocument = self.website.get_user_document('session_id', 'session')
+        userDocument['last_visit'] = 2000
+        userDocument['ip_address'] = '10.0.0.1'
+        self.website.save_user_document(userDocument)
+        self.assertEqual(self.stored()['last_visit'], 1000)
+        self.assertFalse(self.stored().has_key('ip_address'))
+        self.website.flush_user_visits()
+        self.assertEqual(self.stored()['last_visit'], 2000)
+        self.assertEqual(self.stored()['ip_address'], '10.0.0.1')
+        self.assertEqual(self.website.userVisits, {})
+    #enddef
+
+    def test_other_changes_are_written_at_once_with_any_pending_visit(self):
+        userDocument = self.website.get_user_document('session_id', 'session')
+        userDocument['last_visit'] = 2000
+        self.website.save_user_document(userDocument)
+        userDocument['watchlist'] = ['4f0000000000000000000000']
+        self.website.save_user_document(userDocument)
+        self.assertEqual(self.stored()['watchlist'], ['4f0000000000000000000000'])
+        self.assertEqual(self.stored()['last_visit'], 2000)
+        self.assertEqual(self.website.userVisits, {})
+    #enddef
+
+#endclass
+
+class StatisticsTest(DatabaseTestCase):
+
+    def test_materialised_counts_match_live_counts(self):
+        website = self.site()
+        for document in [{'directory':'!Draw','authors':['Acorn','Castle'],'fonts':['Trinity','Homerton'],'relocatable_modules':[{'name':'DrawFile'},{'name':'FPEmulator'}],'utilities':[{'name':'Squash'}]},
+                         {'directory':'!Paint','authors':['Acorn'],'fonts':'Corpus','relocatable_modules':[{'name':'FPEmulator'},{'version':'1.00'}],'absolutes':['!RunImage']},
+                         {'directory':'!Edit','authors':'Castle','relocatable_modules':{'name':'DrawFile'},'zip_file':'http://www.riscos.com/edit.zip'},
+                         {'page_title':'RISC OS','authors':'','fonts':[],'filetypes_run':['FFF Text','FEB Obey']}]:
+            website.riscosCollection.insert(document)
+        #endfor
+        counts = dict((row['label'],row['count']) for row in website.materialise_statistics()['rows'])
+        for (label,attribute,type,icon,criteria) in website.statisticsRows:
+            if type == 'string':
+                liveCount = website.riscosCollection.find(criteria).count()
+            else:
+                liveCount = len(website.riscosCollection.find(criteria).distinct(attribute))
+            #endif
+            self.assertEqual(counts[label], liveCount, label)
+        #endfor
+        self.assertEqual(counts['Authors'], 2)
+    #enddef
+
+#endclass
+
+if __name__ == '__main__':
+    unittest.main()
+#endif
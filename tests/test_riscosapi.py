@@ -0,0 +1,35 @@
+# Tests For The JSON Search API For The RISC OS Search Engine
+# Developed by Rebecca Shalfield for The RISC OS Community
+# Copyright (c) Rebecca Shalfield 2002-2013
+
+import calendar, json, unittest
+from riscostest import DatabaseTestCase
+
+class SearchFilterTest(DatabaseTestCase):
+
+    def setUp(self):
+        DatabaseTestCase.setUp(self)
+        self.website = self.site()
+        for year in [1995,2005]:
+            self.website.riscosspider.insert_riscos_document({'url':'http://www.riscos.com/draw'+str(year)+'.html','page_title':'Draw '+str(year),'date':calendar.timegm((year,6,1,0,0,0))})
+        #endfor
+    #enddef
+
+    def titles(self, response):
+        return [document['page_title'] for document in json.loads(response)['results']]
+    #enddef
+
+    def test_year_alone_filters_results(self):
+        self.assertEqual(self.titles(self.website.api.search('draw', start_year='2000', end_year='2010')), ['Draw 2005'])
+        self.assertEqual(self.titles(self.website.api.search('draw', end_year='2000')), ['Draw 1995'])
+    #enddef
+
+    def test_invalid_year_is_rejected(self):
+        self.assertEqual(json.loads(self.website.api.search('draw', start_year='last')), {'error':'Invalid start_year'})
+    #enddef
+
+#endclass
+
+if __name__ == '__main__':
+    unittest.main()
+#endif
@@ -0,0 +1,23 @@
+# Tests For Spidering For The RISC OS Search Engine
+# Developed by Rebecca Shalfield for The RISC OS Community
+# Copyright (c) Rebecca Shalfield 2002-2013
+
+import unittest
+from riscostest import DatabaseTestCase
+
+class RemoveRiscosDuplicatesTest(DatabaseTestCase):
+
+    def test_identical_documents_with_different_random_values_collapse_to_one(self):
+        spider = self.spider()
+        for (rand,lastScanned) in [(0.25,1000),(0.75,2000)]:
+            spider.riscosCollection.insert({'url':'http://www.riscos.com/','page_title':'RISC OS','domain':'www.riscos.com','rand':rand,'last_scanned':lastScanned})
+        #endfor
+        spider.remove_riscos_duplicates()
+        self.assertEqual(spider.riscosCollection.find({'url':'http://www.riscos.com/'}).count(), 1)
+    #enddef
+
+#endclass
+
+if __name__ == '__main__':
+    unittest.main()
+#endif